@@ -1,15 +1,47 @@
 import streamlit as st
-import io
+import asyncio
+import os
 import random
 
 from randomizer.randomizer.randomizer import Z1Randomizer
 from randomizer.randomizer.flags import Flags, FlagsEnum
+from randomizer.randomizer.generation_pool import GenerationPool, GenerationPoolFullError
+from randomizer.randomizer.patch_cache import MemoryPatchCache, PatchCache
+from randomizer.randomizer.seed_pool import SeedPool
+
+@st.cache_resource
+def get_patch_cache():
+    # Shared by every session so a seed that's already been generated is never generated again.
+    return MemoryPatchCache()
+
+# Seeds that take longer than this to generate are given up on.
+GENERATION_TIMEOUT_SECONDS = 60
+
+@st.cache_resource
+def get_generation_pool():
+    # Shared by every session, so that a burst of visitors can't start more work than it can handle.
+    return GenerationPool()
+
+@st.cache_resource
+def get_seed_pool():
+    # Seeds kept ready by `z1randomizer.py --fill_seed_pool`, if the app has been pointed at them.
+    filename = os.environ.get('ZR_SEED_POOL')
+    return SeedPool(filename) if filename else None
 
-flags = Flags()
 if 'seed' not in st.session_state:
   st.session_state.seed=12345
 
 st.set_page_config(page_title="Zelda \"Re-Randomizer\"", layout="wide")
+
+# Flags can be shared with a link like ?flags=1FZZ.  They're read after set_page_config, which has
+# to be the first Streamlit command, since a bad flag string is shown with st.error.
+flags = Flags()
+if 'flags' in st.query_params:
+    try:
+        flags = Flags.FromFlagString(st.query_params['flags'])
+    except ValueError as e:
+        st.error(str(e))
+
 st.image("https://streamlit.io/images/brand/streamlit-mark-color.png", width=78)
 st.write(
     """
@@ -46,9 +78,8 @@ with col4:
     seed = st.number_input('Seed:', min_value=1, max_value=999999999999999, step=1,
                            format="%d", label_visibility="collapsed", value=st.session_state.seed)
 with col5:
-  if st.button('Generate Random Seed'):
-    st.session_state.seed = random.randint(1000000, 999999999)
-    st.rerun()  # Rerun the app to update the number input
+  # Handled below, once the flags are known.
+  generate_random_seed = st.button('Generate Random Seed')
 
 for flag_name, display_name, help_text in FlagsEnum.get_flag_list():
     is_checked = flags.get(flag_name)
@@ -63,6 +94,21 @@ for flag_name, display_name, help_text in FlagsEnum.get_flag_list():
         flags.set(flag_name, checkbox)
         #is_checked = flags.get(flag_name)
 
+st.caption("Flag string: %s" % flags.ToFlagString())
+
+if generate_random_seed:
+    seed_pool = get_seed_pool()
+    pooled_seed = seed_pool.Take(uploaded_file.getvalue(), flags) if seed_pool else None
+    if pooled_seed is None:
+        st.session_state.seed = random.randint(1000000, 999999999)
+    else:
+        # The seed's patch is already generated, so put it where Randomize! will look for it.
+        (st.session_state.seed, patch) = pooled_seed
+        get_patch_cache().Put(
+            PatchCache.GetKey(PatchCache.GetRomSha1(uploaded_file.getvalue()),
+                              st.session_state.seed, flags), patch)
+    st.rerun()  # Rerun the app to update the number input
+
 if st.button('Randomize!'):
     try:
         seed = int(seed)
@@ -72,20 +118,37 @@ if st.button('Randomize!'):
         
     output_filename = uploaded_file.name[:-4] + '_zora_%d.nes' % seed
 
-    z1randomizer = Z1Randomizer(uploaded_file, seed, flags)
-  
-    patch = z1randomizer.GetPatch()
-    output_rom_data = io.BytesIO(uploaded_file.getvalue())
-    for address in patch.GetAddresses():
-        output_rom_data.seek(address)
-        output_rom_data.write(bytes(patch.GetData(address)))
+    progress = st.empty()
+    progress.text("Generating seed %d..." % seed)
+    def show_progress(num_attempts):
+        progress.text("Generating seed %d... (tried %d item placements)" % (seed, num_attempts))
+    try:
+        patch = asyncio.run(get_generation_pool().Generate(
+            uploaded_file.getvalue(), seed, flags, timeout=GENERATION_TIMEOUT_SECONDS,
+            cache=get_patch_cache(), progress_callback=show_progress))
+    except GenerationPoolFullError:
+        progress.empty()
+        st.error('The randomizer is busy generating other seeds right now. Please try again in a minute.')
+        st.stop()
+    except TimeoutError:
+        progress.empty()
+        st.error('Seed %d took too long to generate. Please try another seed.' % seed)
+        st.stop()
+    progress.empty()
+    output_rom_data = Z1Randomizer(uploaded_file, seed, flags).GenerateRom(patch)
 
     st.download_button(
         label="Download randomized ROM file (%s)" % output_filename,
-        data=output_rom_data,
+        data=bytes(output_rom_data),
         file_name=output_filename,
         mime="application/octet-stream",
     ) 
+    st.download_button(
+        label="Download IPS patch (%s)" % (output_filename[:-4] + '.ips'),
+        data=patch.ToIps(),
+        file_name=output_filename[:-4] + '.ips',
+        mime="application/octet-stream",
+    )
 
 
 def junk():
@@ -0,0 +1,233 @@
+"""Times each stage of seed generation and writes the results as JSON.
+
+Run from the top of the repository, e.g.:
+
+  python -m benchmarks.run_benchmarks --output before.json
+  python -m benchmarks.run_benchmarks --output after.json --compare before.json
+
+By default this uses the ROM from synthetic_rom.py, so the numbers are comparable between
+machines and commits but not to a real ROM.  Use --rom to time a real one instead.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.synthetic_rom import BuildSyntheticRom
+from randomizer.randomizer.batch_validator import BatchValidator
+from randomizer.randomizer.data_table import DataTable
+from randomizer.randomizer.flags import Flags
+from randomizer.randomizer.item_randomizer import ItemRandomizer
+from randomizer.randomizer.randomizer import Z1Randomizer
+from randomizer.randomizer.validator import Validator
+from rom_reader import RomReader
+
+# Number of shuffles checked by each timed call of BatchValidator.AreSeedsValid.
+NUM_BATCH_VALIDATOR_PLACEMENTS = 1000
+
+# Flags to change from the defaults (everything on) for each preset.
+PRESETS: Dict[str, Dict[str, bool]] = {
+    'default': {},
+    'cli': {
+        'shuffle_minor_dungeon_items': False,
+        'avoid_required_hard_combat': False,
+        'randomize_level_text': False,
+        'select_swap': False,
+    },
+    'no_extra_shuffles': {
+        'progressive_items': False,
+        'shuffle_white_sword': False,
+        'shuffle_magical_sword': False,
+        'shuffle_letter': False,
+        'shuffle_armos_item': False,
+        'shuffle_shop_items': False,
+        'shuffle_minor_dungeon_items': False,
+    },
+}
+
+
+def GetFlags(preset: str) -> Flags:
+  flags = Flags()
+  for (flag, value) in PRESETS[preset].items():
+    flags.set(flag, value)
+  return flags
+
+
+def Summarize(seconds: List[float]) -> Dict[str, float]:
+  return {
+      'runs': len(seconds),
+      'mean_seconds': statistics.mean(seconds),
+      'median_seconds': statistics.median(seconds),
+      'min_seconds': min(seconds),
+      'max_seconds': max(seconds),
+  }
+
+
+def TimeCalls(function: Callable[[], None], setup: Callable[[], None],
+              num_runs: int) -> Dict[str, float]:
+  """Times num_runs calls of function, each after an untimed call of setup."""
+  seconds: List[float] = []
+  for _ in range(num_runs):
+    setup()
+    start_time = time.perf_counter()
+    function()
+    seconds.append(time.perf_counter() - start_time)
+  return Summarize(seconds)
+
+
+def BenchmarkPreset(rom_data: bytes, preset: str, num_runs: int,
+                    num_seeds: int) -> Dict[str, object]:
+  flags = GetFlags(preset)
+  rng = random.Random(0)
+  data_table = DataTable(RomReader(rom_data))
+  item_randomizer = ItemRandomizer(data_table, flags, rng, quiet=True)
+  validator = Validator(data_table, flags, quiet=True)
+
+  def DoNothing() -> None:
+    pass
+
+  def ReadItems() -> None:
+    item_randomizer.ResetState()
+    item_randomizer.ReadItemsAndLocationsFromTable()
+
+  def ResetAndReadItems() -> None:
+    data_table.ResetToVanilla()
+    ReadItems()
+
+  # A fresh item randomizer for each run of read_items_and_locations, since later reads only
+  # restore the pool saved by the first one.
+  fresh_item_randomizers: List[ItemRandomizer] = []
+
+  def MakeFreshItemRandomizer() -> None:
+    data_table.ResetToVanilla()
+    fresh_item_randomizers[:] = [ItemRandomizer(data_table, flags, rng, quiet=True)]
+
+  def ReadItemsWithFreshItemRandomizer() -> None:
+    fresh_item_randomizers[0].ReadItemsAndLocationsFromTable()
+
+  def WriteValidItems() -> None:
+    while True:
+      ResetAndReadItems()
+      item_randomizer.ShuffleItems()
+      if item_randomizer.HasValidItemConfiguration():
+        break
+    item_randomizer.WriteItemsAndLocationsToTable()
+
+  operations = {
+      'reset_to_vanilla': TimeCalls(data_table.ResetToVanilla, DoNothing, num_runs),
+      'read_items_and_locations': TimeCalls(ReadItemsWithFreshItemRandomizer,
+                                            MakeFreshItemRandomizer, num_runs),
+      'restore_item_pool': TimeCalls(ReadItems, data_table.ResetToVanilla, num_runs),
+      'shuffle_items': TimeCalls(item_randomizer.item_shuffler.ShuffleItems, ResetAndReadItems,
+                                 num_runs),
+      'is_seed_valid': TimeCalls(validator.IsSeedValid, WriteValidItems, num_runs),
+      'data_table_get_patch': TimeCalls(data_table.GetPatch, DoNothing, num_runs),
+  }
+
+  placements = []
+  for _ in range(NUM_BATCH_VALIDATOR_PLACEMENTS):
+    while True:
+      ResetAndReadItems()
+      item_randomizer.ShuffleItems()
+      if item_randomizer.HasValidItemConfiguration():
+        break
+    placements.append(item_randomizer.GetPlacement())
+  data_table.ResetToVanilla()
+  batch_validator = BatchValidator(data_table, flags, item_randomizer.GetLocations())
+
+  def ValidateBatch() -> None:
+    batch_validator.AreSeedsValid(placements)
+
+  operations['batch_validator_are_seeds_valid'] = TimeCalls(ValidateBatch, DoNothing,
+                                                            max(1, num_runs // 10))
+
+  seconds: List[float] = []
+  num_attempts: List[int] = []
+  for seed in range(num_seeds):
+    (_, stats) = Z1Randomizer(rom_data, seed, flags, quiet=True).GetPatchWithStats()
+    seconds.append(stats.total_seconds)
+    num_attempts.append(stats.num_attempts)
+  operations['get_patch'] = Summarize(seconds)
+  operations['get_patch']['mean_attempts'] = statistics.mean(num_attempts)
+  return {'flag_string': flags.ToFlagString(), 'operations': operations}
+
+
+def GetGitCommit() -> Optional[str]:
+  try:
+    return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                          check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def PrintComparison(baseline: Dict, results: Dict) -> None:
+  for (preset, preset_results) in results['presets'].items():
+    if preset not in baseline['presets']:
+      continue
+    for (operation, summary) in preset_results['operations'].items():
+      baseline_summary = baseline['presets'][preset]['operations'].get(operation)
+      if baseline_summary is None:
+        continue
+      print('%-18s %-26s %10.1fus -> %10.1fus  (%.2fx)' %
+            (preset, operation, baseline_summary['median_seconds'] * 1e6,
+             summary['median_seconds'] * 1e6,
+             baseline_summary['median_seconds'] / summary['median_seconds']))
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__,
+                                   formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--rom', type=str, default=None,
+                      help='ROM to benchmark with instead of the synthetic one')
+  parser.add_argument('--presets', type=str, nargs='+', choices=list(PRESETS),
+                      default=list(PRESETS), help='Flag presets to benchmark')
+  parser.add_argument('--num_runs', type=int, default=200,
+                      help='Number of times to time each stage')
+  parser.add_argument('--num_seeds', type=int, default=20,
+                      help='Number of seeds to generate end to end')
+  parser.add_argument('--output', type=str, default=None,
+                      help='File to write the JSON results to instead of stdout')
+  parser.add_argument('--compare', type=str, default=None,
+                      help='Earlier JSON results to print a comparison against')
+  args = parser.parse_args()
+  logging.basicConfig(level=logging.WARNING)
+
+  if args.rom:
+    with open(args.rom, 'rb') as f:
+      rom_data = f.read()
+  else:
+    rom_data = BuildSyntheticRom()
+
+  results = {
+      'git_commit': GetGitCommit(),
+      'python_version': platform.python_version(),
+      'rom_sha1': hashlib.sha1(rom_data).hexdigest(),
+      'synthetic_rom': args.rom is None,
+      'num_runs': args.num_runs,
+      'num_seeds': args.num_seeds,
+      'presets': {
+          preset: BenchmarkPreset(rom_data, preset, args.num_runs, args.num_seeds)
+          for preset in args.presets
+      },
+  }
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2, sort_keys=True)
+  else:
+    json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    print()
+  if args.compare:
+    with open(args.compare) as f:
+      PrintComparison(json.load(f), results)
+
+
+if __name__ == '__main__':
+  main()
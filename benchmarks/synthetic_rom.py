@@ -0,0 +1,181 @@
+"""Builds a small synthetic first quest ROM image for benchmarking.
+
+Only the tables that the randomizer reads are filled in, following the layout documented in
+rom_reader.py, data_table.py and room_table.py, so no copyrighted ROM is needed.  Every level is a
+straight column of seven rooms going north from its entrance, with an item staircase off of one of
+them.  Levels 1-8 end with a heart container and triforce, and level 9 ends with the beast and the
+kidnapped.  The overworld has the level entrances on their vanilla screens and a handful of caves.
+
+Those levels are easy to get through, so for exercising the validator an obstacle seed can be given
+to put randomly chosen doors, enemies, room types and drops in the levels' rooms as well.
+"""
+import random
+from typing import Dict, List, Optional
+
+from randomizer.randomizer.constants import Enemy, Item, RoomType, WallType
+from rom_reader import (ARMOS_ITEM_ADDRESS, COAST_ITEM_ADDRESS,
+                        LEVEL_1_TO_6_FIRST_QUEST_DATA_LOCATION, LEVEL_1_TO_6_POINTER_LOCATION,
+                        LEVEL_7_TO_9_FIRST_QUEST_DATA_LOCATION, LEVEL_7_TO_9_POINTER_LOCATION,
+                        NES_HEADER_OFFSET, OVERWORLD_DATA_LOCATION, OVERWORLD_POINTER_LOCATION,
+                        VARIOUS_DATA_LOCATION)
+
+ROM_SIZE = 0x20000
+LEVEL_TABLE_SIZE = 0x80
+LEVEL_INFO_SIZE = 0xFC
+START_ROOM_OFFSET = 0x2F
+STAIRWAY_LIST_OFFSET = 0x34
+CAVE_ITEM_DATA_LOCATION = 0x18600
+CAVE_PRICE_DATA_LOCATION = 0x1863C
+NUM_CAVES = 20
+NUM_ROOMS_PER_LEVEL = 7
+
+# Overworld screen number for each destination (a level number, or 0x10 plus a cave number).
+OVERWORLD_DESTINATIONS = {
+    0x37: 1, 0x3D: 2, 0x74: 3, 0x45: 4, 0x0B: 5, 0x22: 6, 0x42: 7, 0x6D: 8, 0x05: 9,
+    0x77: 0x10, 0x0A: 0x12, 0x21: 0x13, 0x0E: 0x18, 0x1A: 0x1A, 0x04: 0x1D, 0x0C: 0x1E,
+    0x1C: 0x1F, 0x1F: 0x20, 0x24: 0x24, 0x5E: 0x25
+}
+# The three items sold or given away in each cave.  All other caves are empty.
+CAVE_ITEMS = {
+    0x00: [Item.OVERWORLD_NO_ITEM, Item.WOOD_SWORD, Item.OVERWORLD_NO_ITEM],
+    0x02: [Item.OVERWORLD_NO_ITEM, Item.WHITE_SWORD, Item.OVERWORLD_NO_ITEM],
+    0x03: [Item.OVERWORLD_NO_ITEM, Item.MAGICAL_SWORD, Item.OVERWORLD_NO_ITEM],
+    0x08: [Item.OVERWORLD_NO_ITEM, Item.LETTER, Item.OVERWORLD_NO_ITEM],
+    0x0A: [Item.BLUE_POTION, Item.OVERWORLD_NO_ITEM, Item.RED_POTION],
+    0x0D: [Item.MAGICAL_SHIELD, Item.BAIT, Item.BLUE_CANDLE],
+    0x0E: [Item.MAGICAL_SHIELD, Item.BOMBS, Item.WOOD_ARROWS],
+    0x0F: [Item.MAGICAL_SHIELD, Item.BAIT, Item.SINGLE_HEART],
+    0x10: [Item.MAGICAL_SHIELD, Item.BLUE_RING, Item.SINGLE_HEART],
+}
+CAVE_PRICES = [0, 10, 0]
+# The (room item, item staircase item) in each level.
+LEVEL_MAJOR_ITEMS = {
+    1: (Item.BOW, Item.WOODEN_BOOMERANG),
+    2: (Item.MAGICAL_BOOMERANG, Item.FIVE_RUPEES),
+    3: (Item.RAFT, Item.FIVE_RUPEES),
+    4: (Item.LADDER, Item.FIVE_RUPEES),
+    5: (Item.RECORDER, Item.FIVE_RUPEES),
+    6: (Item.WAND, Item.FIVE_RUPEES),
+    7: (Item.RED_CANDLE, Item.FIVE_RUPEES),
+    8: (Item.BOOK, Item.MAGICAL_KEY),
+    9: (Item.SILVER_ARROWS, Item.RED_RING),
+}
+# Index of the room in each level's column that has a staircase down to the item staircase.
+STAIRCASE_ROOM_INDEX = 4
+# The room table uses item 0x03 for rooms without an item.
+NO_ROOM_ITEM = 0x03
+# What rooms can be given when an obstacle seed is used.  Doubled entries are more likely.
+OBSTACLE_WALL_TYPES = [
+    WallType.OPEN_DOOR, WallType.OPEN_DOOR, WallType.SHUTTER_DOOR, WallType.WALK_THROUGH_WALL_1,
+    WallType.BOMB_HOLE
+]
+OBSTACLE_ENEMIES = [
+    Enemy.STALFOS, Enemy.STALFOS, Enemy.NOTHING, Enemy.POLS_VOICE, Enemy.TRIPLE_DODONGO,
+    Enemy.HUNGRY_GORIYA, Enemy.SINGLE_DIGDOGGER, Enemy.BLUE_DARKNUT, Enemy.BLUE_WIZZROBE,
+    Enemy.BLUE_KEESE, Enemy.BLUE_GOHMA
+]
+OBSTACLE_ROOM_TYPES = [
+    RoomType.PLAIN_ROOM, RoomType.PLAIN_ROOM, RoomType.CIRCLE_MOAT_ROOM,
+    RoomType.POINTLESS_MOAT_ROOM, RoomType.CHEVY_ROOM, RoomType.NSU, RoomType.TURNSTILE_ROOM,
+    RoomType.SINGLE_BLOCK_ROOM, RoomType.VERTICAL_CHUTE_ROOM, RoomType.FOUR_TALL_ROOM,
+    RoomType.FOUR_FIREBALL_ROOM
+]
+# Level room table 5 value for a room whose item only appears once its enemies are defeated.
+DROP_BITS = 0x05
+
+
+def BuildSyntheticRom(obstacle_seed: Optional[int] = None) -> bytes:
+  rng = random.Random(obstacle_seed) if obstacle_seed is not None else None
+  rom = bytearray(NES_HEADER_OFFSET + ROM_SIZE)
+  rom[0:4] = b'NES\x1a'
+  rom[4] = 8  # Number of 16 KB PRG ROM banks
+  rom[6] = 0x12
+  _Write(rom, OVERWORLD_POINTER_LOCATION, [0x00, 0x84])
+  _Write(rom, LEVEL_1_TO_6_POINTER_LOCATION, [0x00, 0x87])
+  _Write(rom, LEVEL_7_TO_9_POINTER_LOCATION, [0x00, 0x8A])
+
+  # The destination is kept in the upper six bits of overworld table 1.
+  for (screen_num, destination) in OVERWORLD_DESTINATIONS.items():
+    _Write(rom, OVERWORLD_DATA_LOCATION + LEVEL_TABLE_SIZE + screen_num, [destination << 2])
+  for cave_num in range(NUM_CAVES):
+    _Write(rom, CAVE_ITEM_DATA_LOCATION + 3 * cave_num,
+           CAVE_ITEMS.get(cave_num, [Item.OVERWORLD_NO_ITEM] * 3))
+    _Write(rom, CAVE_PRICE_DATA_LOCATION + 3 * cave_num,
+           CAVE_PRICES if cave_num in CAVE_ITEMS else [0, 0, 0])
+  _Write(rom, ARMOS_ITEM_ADDRESS, [Item.POWER_BRACELET])
+  _Write(rom, COAST_ITEM_ADDRESS, [Item.HEART_CONTAINER])
+
+  for level_num in range(1, 10):
+    _WriteLevel(rom, level_num, rng)
+  return bytes(rom)
+
+
+def _Write(rom: bytearray, address: int, values: List[int]) -> None:
+  start = NES_HEADER_OFFSET + address
+  rom[start:start + len(values)] = bytes(values)
+
+
+def _WriteLevel(rom: bytearray, level_num: int, rng: Optional[random.Random]) -> None:
+  if level_num <= 6:
+    level_block_address = LEVEL_1_TO_6_FIRST_QUEST_DATA_LOCATION
+    column = (level_num - 1) * 2
+  else:
+    level_block_address = LEVEL_7_TO_9_FIRST_QUEST_DATA_LOCATION
+    column = (level_num - 7) * 2
+
+  def WriteRoom(room_num: int, room_data: List[int]) -> None:
+    for (table_num, value) in enumerate(room_data):
+      _Write(rom, level_block_address + table_num * LEVEL_TABLE_SIZE + room_num, [value])
+
+  (room_item, staircase_item) = LEVEL_MAJOR_ITEMS[level_num]
+  if level_num < 9:
+    room_items = [NO_ROOM_ITEM, Item.MAP, Item.COMPASS, Item.KEY, room_item,
+                  Item.HEART_CONTAINER, Item.TRIFORCE]
+  else:
+    room_items = [NO_ROOM_ITEM, Item.MAP, Item.COMPASS, room_item, Item.BOMBS,
+                  Item.TRIFORCE_OF_POWER, NO_ROOM_ITEM]
+  enemies: Dict[int, Enemy] = {0: Enemy.NOTHING}
+  north_walls: Dict[int, WallType] = {NUM_ROOMS_PER_LEVEL - 1: WallType.SOLID_WALL}
+  room_types: Dict[int, RoomType] = {STAIRCASE_ROOM_INDEX: RoomType.NARROW_STAIR_ROOM}
+  if level_num == 9:
+    enemies[5] = Enemy.THE_BEAST
+    north_walls[5] = WallType.SHUTTER_DOOR
+    enemies[6] = Enemy.THE_KIDNAPPED
+  if level_num == 3:
+    room_types[2] = RoomType.CIRCLE_MOAT_ROOM
+
+  start_room_num = 0x70 + column
+  for (index, item) in enumerate(room_items):
+    north_wall = north_walls.get(index, WallType.OPEN_DOOR)
+    south_wall = WallType.SOLID_WALL if index == 0 else WallType.OPEN_DOOR
+    enemy = enemies.get(index, Enemy.STALFOS)
+    room_type = room_types.get(index, RoomType.PLAIN_ROOM)
+    drop_bits = 0
+    # The entrance, the staircase room and the beast's and kidnapped's rooms are left alone.
+    if rng is not None and index not in enemies and index not in room_types:
+      if north_wall == WallType.OPEN_DOOR:
+        north_wall = rng.choice(OBSTACLE_WALL_TYPES)
+      south_wall = rng.choice(OBSTACLE_WALL_TYPES)
+      enemy = rng.choice(OBSTACLE_ENEMIES)
+      room_type = rng.choice(OBSTACLE_ROOM_TYPES)
+      drop_bits = rng.choice([0, 0, DROP_BITS])
+    WriteRoom(start_room_num - 0x10 * index, [
+        (north_wall << 5) | (south_wall << 2),
+        (WallType.SOLID_WALL << 5) | (WallType.SOLID_WALL << 2),
+        enemy & 0x3F,
+        room_type | (0x80 if enemy & 0x40 else 0),
+        item,
+        drop_bits,
+    ])
+
+  # Both exits of an item staircase lead back to the room it's reached from.
+  staircase_room_num = column + 1
+  staircase_entry_room_num = start_room_num - 0x10 * STAIRCASE_ROOM_INDEX
+  WriteRoom(staircase_room_num, [
+      staircase_entry_room_num, staircase_entry_room_num, 0, RoomType.ITEM_STAIRCASE,
+      staircase_item
+  ])
+
+  level_info_address = VARIOUS_DATA_LOCATION + level_num * LEVEL_INFO_SIZE
+  _Write(rom, level_info_address + START_ROOM_OFFSET, [start_room_num])
+  _Write(rom, level_info_address + STAIRWAY_LIST_OFFSET, [staircase_room_num] + [0xFF] * 9)
@@ -0,0 +1,180 @@
+from typing import Dict, List, Optional, Tuple
+import logging as log
+import random
+
+from .constants import Item, LevelNum, Range, RoomType
+from .data_table import DataTable
+from .flags import Flags
+from .location import Location
+from .validator import Validator
+
+# Number used for the overworld caves in the per-level location and item lists.
+OVERWORLD_LEVEL_NUM = 10
+# Items the validator ignores, used to mark locations that don't have an item placed yet.
+ROOM_PLACEHOLDER_ITEM = Item.TRIFORCE_OF_POWER
+CAVE_PLACEHOLDER_ITEM = Item.OVERWORLD_NO_ITEM
+TAKE_ANY_CAVE_NUMBER = 2
+ARMOS_VIRTUAL_CAVE_NUMBER = 0x14
+COAST_VIRTUAL_CAVE_NUMBER = 0x15
+# Items that the validator's logic checks for.  Anything else can go anywhere.
+PROGRESSION_ITEMS = [
+    Item.WOOD_SWORD, Item.WHITE_SWORD, Item.MAGICAL_SWORD, Item.WAND, Item.BLUE_CANDLE,
+    Item.RED_CANDLE, Item.BOW, Item.WOOD_ARROWS, Item.SILVER_ARROWS, Item.RECORDER, Item.RAFT,
+    Item.LADDER, Item.POWER_BRACELET, Item.BAIT, Item.LETTER, Item.BLUE_RING, Item.RED_RING,
+    Item.WOODEN_BOOMERANG, Item.MAGICAL_BOOMERANG, Item.HEART_CONTAINER, Item.TRIFORCE
+]
+
+# (level number, index into that level's location list)
+Slot = Tuple[LevelNum, int]
+
+
+def IsProgressionItem(item: Item) -> bool:
+  return item in PROGRESSION_ITEMS
+
+
+class AssumedFill():
+  """Places items so that the seed is beatable, instead of shuffling and checking afterwards.
+
+  Progression items are placed one at a time.  Each goes into a random empty location that the
+  validator can reach while assuming that every progression item not placed yet is already in
+  the inventory.  Since whatever is placed later is reachable without the earlier items, this
+  keeps every progression item reachable, and the remaining items can then go anywhere.
+
+  Items for a specific level (triforces, heart containers and, with minor dungeon items shuffled,
+  maps and compasses) stay in that level, just as with ItemShuffler.ShuffleItems.
+  """
+
+  def __init__(self, data_table: DataTable, flags: Flags, validator: Validator,
+               rng: random.Random) -> None:
+    self.data_table = data_table
+    self.flags = flags
+    self.validator = validator
+    self.rng = rng
+
+  def Fill(self, locations: Dict[LevelNum, List[Location]], shuffled_items: List[Item],
+           level_items: Dict[LevelNum, List[Item]]) -> Optional[Dict[LevelNum, List[Item]]]:
+    """Returns the items for each level, in the same order as that level's locations.
+
+    shuffled_items can go in any level, while level_items only go in their own level.  Returns
+    None if some progression item couldn't be placed anywhere reachable.
+    """
+    self.locations = locations
+    self.placed_items: Dict[Slot, Item] = {}
+    # How many more items from shuffled_items each level has room for.
+    self.free_slots = {
+        level_num: len(locations[level_num]) - len(level_items[level_num])
+        for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS
+    }
+    assert sum(self.free_slots.values()) == len(shuffled_items)
+    for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS:
+      for location in locations[level_num]:
+        self._WriteItem(location, None)
+
+    level_specific_items: List[Tuple[Item, Optional[LevelNum]]] = []
+    for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS:
+      level_specific_items.extend((item, level_num) for item in level_items[level_num])
+    self.rng.shuffle(level_specific_items)
+    pool_items: List[Tuple[Item, Optional[LevelNum]]] = [(item, None) for item in shuffled_items]
+    self.rng.shuffle(pool_items)
+
+    # The validator can't see what's at the armos and coast locations, so they get items it
+    # doesn't care about while there are some left.
+    for (level_num, index) in self._GetAllEmptySlots():
+      if not self._IsHiddenFromValidator(self.locations[level_num][index]):
+        continue
+      for entry in pool_items:
+        if not IsProgressionItem(entry[0]):
+          pool_items.remove(entry)
+          self._PlaceItem((level_num, index), entry[0], None)
+          break
+
+    # Items with fewer places they can go are placed first: those tied to a level, then
+    # progressive upgrades (which can't go in shops), then the rest.  The sort keeps the random
+    # order within each group.
+    pool_items.sort(key=lambda entry: not entry[0].IsProgressiveUpgradeItem())
+    items_to_place = level_specific_items + pool_items
+    progression_items = [entry for entry in items_to_place if IsProgressionItem(entry[0])]
+    other_items = [entry for entry in items_to_place if not IsProgressionItem(entry[0])]
+    progression_items.reverse()
+    while progression_items:
+      (item, level_num) = progression_items.pop()
+      assumed_items = [assumed_item for (assumed_item, _) in progression_items]
+      reachable_location_ids = self.validator.GetReachableLocationIds(assumed_items)
+      slots = [
+          slot for slot in self._GetEmptySlots(item, level_num)
+          if self.locations[slot[0]][slot[1]].GetUniqueIdentifier() in reachable_location_ids
+      ]
+      if not slots:
+        log.info("Couldn't find a reachable location for %s", item)
+        return None
+      self._PlaceItem(self.rng.choice(slots), item, level_num)
+
+    for (item, level_num) in other_items:
+      slots = self._GetEmptySlots(item, level_num)
+      if not slots:
+        return None
+      self._PlaceItem(self.rng.choice(slots), item, level_num)
+
+    return {
+        level_num: [
+            self.placed_items[(level_num, index)] for index in range(len(locations[level_num]))
+        ] for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS
+    }
+
+  def _GetAllEmptySlots(self) -> List[Slot]:
+    return [(level_num, index)
+            for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS
+            for index in range(len(self.locations[level_num]))
+            if (level_num, index) not in self.placed_items]
+
+  def _IsHiddenFromValidator(self, location: Location) -> bool:
+    # The validator reads the armos and coast items from the ROM rather than the data table.
+    return location.IsCavePosition() and location.GetCaveNum() in [
+        ARMOS_VIRTUAL_CAVE_NUMBER, COAST_VIRTUAL_CAVE_NUMBER
+    ]
+
+  def _GetEmptySlots(self, item: Item, item_level_num: Optional[LevelNum]) -> List[Slot]:
+    slots: List[Slot] = []
+    for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS:
+      if item_level_num is None and self.free_slots[level_num] == 0:
+        continue
+      if item_level_num is not None and item_level_num != level_num:
+        continue
+      for (index, location) in enumerate(self.locations[level_num]):
+        if (level_num, index) not in self.placed_items and self._CanPlace(item, location):
+          slots.append((level_num, index))
+    return slots
+
+  def _CanPlace(self, item: Item, location: Location) -> bool:
+    # Same restriction as ItemShuffler.HasValidItemConfiguration
+    if (self.flags.progressive_items and location.IsShopPosition() and
+        item.IsProgressiveUpgradeItem()):
+      return False
+    if not IsProgressionItem(item):
+      return True
+    if self._IsHiddenFromValidator(location):
+      return False
+    # The validator doesn't count heart containers from the take any cave.
+    if (item == Item.HEART_CONTAINER and location.IsCavePosition() and
+        location.GetCaveNum() == TAKE_ANY_CAVE_NUMBER):
+      return False
+    # Nor a magical sword lying in a room that isn't a drop room (see Room.HasItem).
+    if item == Item.MAGICAL_SWORD and location.IsLevelRoom():
+      room = self.data_table.GetRoom(location.GetLevelNum(), location.GetRoomNum())
+      if room.GetType() != RoomType.ITEM_STAIRCASE and (room.HasStaircase() or
+                                                         not room.HasDropBitSet()):
+        return False
+    return True
+
+  def _PlaceItem(self, slot: Slot, item: Item, item_level_num: Optional[LevelNum]) -> None:
+    (level_num, index) = slot
+    self.placed_items[slot] = item
+    if item_level_num is None:
+      self.free_slots[level_num] -= 1
+    self._WriteItem(self.locations[level_num][index], item)
+
+  def _WriteItem(self, location: Location, item: Optional[Item]) -> None:
+    if location.IsLevelRoom():
+      self.data_table.SetRoomItem(location, ROOM_PLACEHOLDER_ITEM if item is None else item)
+    else:
+      self.data_table.SetCaveItem(location, CAVE_PLACEHOLDER_ITEM if item is None else item)
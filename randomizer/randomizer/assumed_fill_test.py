@@ -0,0 +1,65 @@
+from typing import Dict, List
+
+from absl.testing import absltest
+
+from benchmarks.synthetic_rom import BuildSyntheticRom
+from rom_reader import ARMOS_ITEM_ADDRESS, COAST_ITEM_ADDRESS, NES_HEADER_OFFSET, RomReader
+from .constants import Item, LevelNum, Range
+from .data_table import DataTable
+from .flags import Flags
+from .randomizer import ASSUMED_FILL_PLACEMENT, Z1Randomizer
+from .validator import Validator
+
+SEEDS = [1, 2, 3, 4, 5]
+# The synthetic ROMs to fill, by the obstacle seed they're built with (see synthetic_rom.py).
+ROM_OBSTACLE_SEEDS = {'plain': None, 'obstacles': 1}
+
+
+def _GetLevelItems(data_table: DataTable) -> Dict[LevelNum, List[Item]]:
+  return {
+      level_num: [
+          data_table.GetRoom(level_num, room_num).GetItem()
+          for room_num in data_table.GetLevelGraph(level_num).GetRoomNums()
+      ] for level_num in Range.VALID_LEVEL_NUMBERS
+  }
+
+
+class AssumedFillTest(absltest.TestCase):
+
+  def _CheckSeeds(self, flags: Flags) -> None:
+    for (rom_name, obstacle_seed) in ROM_OBSTACLE_SEEDS.items():
+      rom_data = BuildSyntheticRom(obstacle_seed)
+      for seed in SEEDS:
+        with self.subTest(rom=rom_name, seed=seed):
+          z1randomizer = Z1Randomizer(rom_data, seed, flags, quiet=True,
+                                      placement=ASSUMED_FILL_PLACEMENT)
+          randomized_rom = z1randomizer.GenerateRom()
+          # The validator always reads the armos and coast items from the input ROM (see
+          # DataTable.GetCaveItem), so they're put back to check what it checked.
+          for address in (ARMOS_ITEM_ADDRESS, COAST_ITEM_ADDRESS):
+            randomized_rom[NES_HEADER_OFFSET + address] = rom_data[NES_HEADER_OFFSET + address]
+          data_table = DataTable(RomReader(bytes(randomized_rom)))
+          self.assertTrue(Validator(data_table, flags, quiet=True).IsSeedValid())
+
+          for (level_num, items) in _GetLevelItems(data_table).items():
+            if level_num in range(1, 9):
+              self.assertEqual(1, items.count(Item.TRIFORCE), 'level %d' % level_num)
+              self.assertIn(Item.HEART_CONTAINER, items, 'level %d' % level_num)
+            else:
+              self.assertNotIn(Item.TRIFORCE, items)
+            if flags.shuffle_minor_dungeon_items:
+              self.assertEqual(1, items.count(Item.MAP), 'level %d' % level_num)
+              self.assertEqual(1, items.count(Item.COMPASS), 'level %d' % level_num)
+
+  def testPlacementsAreBeatableWithDefaultFlags(self):
+    self._CheckSeeds(Flags())
+
+  def testPlacementsAreBeatableWithoutMinorDungeonItems(self):
+    flags = Flags()
+    flags.set('shuffle_minor_dungeon_items', False)
+    flags.set('progressive_items', False)
+    self._CheckSeeds(flags)
+
+
+if __name__ == '__main__':
+  absltest.main()
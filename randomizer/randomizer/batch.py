@@ -0,0 +1,77 @@
+import concurrent.futures
+import logging as log
+from typing import Iterable, Iterator, Optional, Tuple
+
+from .flags import Flags
+from .patch import Patch
+from .patch_cache import PatchCache
+from .randomizer import SAMPLER_PLACEMENT, GenerationBudgetExceeded, Z1Randomizer
+
+# The input ROM for the current worker process.  Set once by _InitWorker so that the ROM is
+# only sent to each worker a single time rather than once per seed.
+_worker_rom_data = b''
+
+
+def _InitWorker(rom_data: bytes) -> None:
+  global _worker_rom_data
+  _worker_rom_data = rom_data
+
+
+def _GeneratePatch(seed: int, flags: Flags, placement: str, max_attempts: Optional[int],
+                   max_seconds: Optional[float]) -> Tuple[int, Patch]:
+  z1randomizer = Z1Randomizer(_worker_rom_data, seed, flags, quiet=True, placement=placement,
+                              max_attempts=max_attempts, max_seconds=max_seconds)
+  return (seed, z1randomizer.GetPatch())
+
+
+def GeneratePatches(rom_data: bytes,
+                    seeds: Iterable[int],
+                    flags: Flags,
+                    max_workers: Optional[int] = None,
+                    placement: str = SAMPLER_PLACEMENT,
+                    cache: Optional[PatchCache] = None,
+                    max_attempts: Optional[int] = None,
+                    max_seconds: Optional[float] = None) -> Iterator[Tuple[int, Optional[Patch]]]:
+  """Generates a patch for each seed, fanning the work out across a pool of processes.
+
+  Yields (seed, patch) tuples in the order they finish, which is not necessarily the order of
+  the seeds passed in.  max_workers defaults to the number of CPUs on the machine.  If a cache is
+  given, seeds found in it are yielded first without being generated, and new patches are put in
+  it as they finish.
+
+  max_attempts and max_seconds are the budget for each seed (see Z1Randomizer).  A seed that runs
+  out of budget is logged and yielded with a patch of None, and the other seeds carry on.
+  """
+  rom_data = bytes(rom_data)
+  seeds_to_generate = []
+  cache_keys = {}
+  for seed in seeds:
+    if cache is not None:
+      cache_keys[seed] = PatchCache.GetKey(PatchCache.GetRomSha1(rom_data), seed, flags, placement)
+      patch = cache.Get(cache_keys[seed])
+      if patch is not None:
+        yield (seed, patch)
+        continue
+    seeds_to_generate.append(seed)
+  if not seeds_to_generate:
+    return
+  executor = concurrent.futures.ProcessPoolExecutor(
+      max_workers=max_workers, initializer=_InitWorker, initargs=(rom_data,))
+  try:
+    futures = {
+        executor.submit(_GeneratePatch, seed, flags, placement, max_attempts, max_seconds): seed
+        for seed in seeds_to_generate
+    }
+    for future in concurrent.futures.as_completed(futures):
+      try:
+        (seed, patch) = future.result()
+      except GenerationBudgetExceeded as e:
+        log.warning(str(e))
+        yield (futures[future], None)
+        continue
+      if cache is not None:
+        cache.Put(cache_keys[seed], patch)
+      yield (seed, patch)
+  finally:
+    # If the caller stops consuming results early, don't keep generating seeds nobody wants.
+    executor.shutdown(wait=True, cancel_futures=True)
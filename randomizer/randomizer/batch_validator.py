@@ -0,0 +1,402 @@
+from typing import Dict, List, Optional, Tuple
+import itertools
+import numpy as np
+
+from constants import Direction
+from .assumed_fill import TAKE_ANY_CAVE_NUMBER
+from .constants import Enemy, Item, LevelNum, Range
+from .data_table import (CAVE_NUMBER_REPRESENTING_ARMOS_ITEM, CAVE_NUMBER_REPRESENTING_COAST_ITEM,
+                         OVERWORLD_BLOCK_TYPE_BITS, DataTable)
+from .flags import Flags
+from .location import Location
+from .requirement import NO_REQUIREMENT, VIRTUAL_ITEM_BIT_OFFSET, Requirement
+from .validator import BLOCK_TYPE_REQUIREMENTS, RoomState, Validator
+
+# The items for each level (and 10 for the overworld caves), in the same order as the locations.
+Placement = Dict[LevelNum, List[Item]]
+
+# Inventory columns: one per item bit, as in Inventory.GetItemMask.
+NUM_INVENTORY_COLUMNS = VIRTUAL_ITEM_BIT_OFFSET + 2
+BEAST_DEFEATED_COLUMN = VIRTUAL_ITEM_BIT_OFFSET
+KIDNAPPED_RESCUED_COLUMN = VIRTUAL_ITEM_BIT_OFFSET + 1
+# Item counts are kept for each real item, then for a triforce from each level (so that the
+# triforces can be counted by level like Inventory does), then for everything that's ignored.
+FIRST_TRIFORCE_COUNT = Item.RED_POTION + 1
+IGNORED_COUNT = FIRST_TRIFORCE_COUNT + 10
+NUM_COUNTS = IGNORED_COUNT + 1
+# Items that Inventory.AddItem ignores, plus keys since nothing checks for them.
+IGNORED_ITEMS = [
+    Item.OVERWORLD_NO_ITEM, Item.MAP, Item.COMPASS, Item.MAGICAL_SHIELD, Item.BOMBS,
+    Item.FIVE_RUPEES, Item.RUPEE, Item.SINGLE_HEART, Item.TRIFORCE_OF_POWER, Item.KEY
+]
+# Finding a second one of these gives the upgrade (see Inventory._AddToItems).
+UPGRADES = {
+    Item.WOOD_SWORD: Item.WHITE_SWORD,
+    Item.BLUE_RING: Item.RED_RING,
+    Item.BLUE_CANDLE: Item.RED_CANDLE,
+    Item.WOOD_ARROWS: Item.SILVER_ARROWS,
+}
+NUM_STARTING_HEARTS = 3
+NUM_TRIFORCES_FOR_LEVEL_9 = 8
+
+
+def _Pack(values: np.ndarray) -> np.ndarray:
+  """Packs the last axis of a boolean array, one candidate per bit, into 64-bit words."""
+  num_candidates = values.shape[-1]
+  num_words = (num_candidates + 63) // 64
+  padded = np.zeros(values.shape[:-1] + (num_words * 64,), dtype=bool)
+  padded[..., :num_candidates] = values
+  return np.packbits(padded, axis=-1, bitorder='little').view(np.uint64)
+
+
+def _Unpack(words: np.ndarray, num_candidates: int) -> np.ndarray:
+  values = np.unpackbits(words.view(np.uint8), axis=-1, bitorder='little')
+  return values[..., :num_candidates].astype(bool)
+
+
+class _OrReducer():
+  """ORs rows of values into rows of a target array, where several values can go to the same row."""
+
+  def __init__(self, target_rows: List[int]) -> None:
+    self.order = np.argsort(np.array(target_rows, dtype=np.intp), kind='stable')
+    sorted_rows = np.array(target_rows, dtype=np.intp)[self.order]
+    (self.target_rows, self.starts) = np.unique(sorted_rows, return_index=True)
+
+  def OrInto(self, target: np.ndarray, values: np.ndarray) -> None:
+    if len(self.order):
+      target[self.target_rows] |= np.bitwise_or.reduceat(values[self.order], self.starts, axis=0)
+
+
+class BatchValidator(Validator):
+  """Checks many item placements at once, accepting every one that Validator.IsSeedValid would.
+
+  Everything that doesn't depend on where the items are is worked out once: every (level, room,
+  entry direction) state that the validator could visit, the requirements on the moves between
+  them, and where each item is picked up.  Then all of the candidates are searched together.
+  Anything that's true or false for each candidate is a row of bits with one bit per candidate,
+  so that e.g. following every move in every level for 64 candidates is a handful of NumPy
+  operations on 64-bit words.  Inventories are a candidates x items boolean matrix, worked out from
+  which locations have been reached each time the search in the levels runs out of moves.
+
+  Unlike the validator, this doesn't give up after 100 sweeps.  It also follows rooms from every
+  direction they can be entered from, where the validator only visits each room from the first
+  one, so it can accept a placement that the validator would reject (but never the other way
+  round).  That's fine for screening placements, since the validator checks the ones accepted.
+  """
+
+  def __init__(self, data_table: DataTable, flags: Flags,
+               locations: Dict[LevelNum, List[Location]]) -> None:
+    """locations are the locations that placements will have items for.
+
+    Items elsewhere are taken from the data table as it is now, which should be vanilla.
+    """
+    super().__init__(data_table, flags, quiet=True)
+    self.requirement_nums: Dict[Requirement, int] = {}
+    # Item locations that the validator can see, and the spot in the ROM data each one reads.
+    self.location_nums: Dict[int, int] = {}
+    self.location_cells: List[int] = []
+    # The level each location is in (0 for caves) and whether it's in the take any cave.
+    self.location_level_nums: List[int] = []
+    self.location_is_take_any: List[bool] = []
+    self.cell_nums: Dict[Tuple[object, int], int] = {}
+    self.vanilla_cell_items: List[Item] = []
+    self._FindRoomStates()
+    self._FindCaves()
+    self._FindPlacedCells(locations)
+    self._CompileRequirements()
+
+  def _GetRequirementNum(self, requirement: Requirement) -> int:
+    if requirement not in self.requirement_nums:
+      self.requirement_nums[requirement] = len(self.requirement_nums)
+    return self.requirement_nums[requirement]
+
+  def _GetLocationNum(self, location: Location) -> int:
+    location_id = location.GetUniqueIdentifier()
+    if location_id not in self.location_nums:
+      self.location_nums[location_id] = len(self.location_cells)
+      if location.IsLevelRoom():
+        cell = (self.data_table.GetRoomTable(location.GetLevelNum()), location.GetRoomNum())
+        item = self.data_table.GetRoomItem(location)
+      else:
+        cell = ('cave', location.GetUniqueIdentifier())
+        item = self.data_table.GetCaveItem(location)
+      if cell not in self.cell_nums:
+        self.cell_nums[cell] = len(self.vanilla_cell_items)
+        self.vanilla_cell_items.append(item)
+      self.location_cells.append(self.cell_nums[cell])
+      self.location_level_nums.append(location.GetLevelNum() if location.IsLevelRoom() else 0)
+      self.location_is_take_any.append(location.IsCavePosition() and
+                                       location.GetCaveNum() == TAKE_ANY_CAVE_NUMBER)
+    return self.location_nums[location_id]
+
+  def _FindRoomStates(self) -> None:
+    """Finds every room state that's reachable when ignoring requirements, as _VisitRoom would."""
+    state_nums: Dict[RoomState, int] = {}
+    states: List[RoomState] = []
+    self.level_entrance_states: Dict[LevelNum, int] = {}
+    for level_num in Range.VALID_LEVEL_NUMBERS:
+      state = (level_num, self.data_table.GetLevelStartRoomNumber(level_num),
+               self.data_table.GetLevelEntranceDirection(level_num))
+      if state not in state_nums:
+        state_nums[state] = len(states)
+        states.append(state)
+      self.level_entrance_states[level_num] = state_nums[state]
+
+    move_sources: List[int] = []
+    move_destinations: List[int] = []
+    move_requirement_nums: List[int] = []
+    # These are for each state, in order.
+    self.room_item_locations: List[int] = []
+    self.room_item_requirement_nums: List[int] = []
+    # Rooms where HasItem is false when the item is Item.MAGICAL_SWORD (or Item.NO_ITEM).
+    self.room_item_needs_drop: List[bool] = []
+    self.beast_states: List[int] = []
+    self.kidnapped_states: List[int] = []
+    stairway_states: List[int] = []
+    stairway_locations: List[int] = []
+
+    def AddMove(state_num: int, next_state: RoomState, requirement: Requirement) -> None:
+      if next_state[1] not in Range.VALID_ROOM_NUMBERS:
+        return
+      if next_state not in state_nums:
+        state_nums[next_state] = len(states)
+        states.append(next_state)
+      move_sources.append(state_num)
+      move_destinations.append(state_nums[next_state])
+      move_requirement_nums.append(self._GetRequirementNum(requirement))
+
+    state_num = 0
+    while state_num < len(states):
+      (level_num, room_num, entry_direction) = states[state_num]
+      room = self.data_table.GetRoom(level_num, room_num)
+      level_graph = self.data_table.GetLevelGraph(level_num)
+      item_requirement = self._GetRequirementNum(
+          self._GetRoomItemRequirement(entry_direction, room))
+      self.room_item_locations.append(
+          self._GetLocationNum(Location.LevelRoom(level_num, room_num)))
+      self.room_item_requirement_nums.append(item_requirement)
+      self.room_item_needs_drop.append(room.HasStaircase() or not room.HasDropBitSet())
+      if room.HasTheBeast():
+        self.beast_states.append(state_num)
+      if room.GetEnemy() == Enemy.THE_KIDNAPPED:
+        self.kidnapped_states.append(state_num)
+      for (_, next_room_num, needs) in level_graph.GetExits(room_num, entry_direction):
+        AddMove(state_num, (level_num, next_room_num, Direction(-1 * entry_direction)),
+                self._GetMoveRequirement(room, needs))
+      (item_staircase_room_nums, transport_room_num) = level_graph.GetStairways(room_num)
+      for stairway_room_num in item_staircase_room_nums:
+        stairway_states.append(state_num)
+        stairway_locations.append(
+            self._GetLocationNum(Location.LevelRoom(level_num, stairway_room_num)))
+      if transport_room_num is not None:
+        AddMove(state_num, (level_num, transport_room_num, Direction.NO_DIRECTION),
+                NO_REQUIREMENT)
+      state_num += 1
+
+    self.num_states = len(states)
+    self.move_sources = np.array(move_sources, dtype=np.intp)
+    self.move_reducer = _OrReducer(move_destinations)
+    self.move_requirement_nums = np.array(move_requirement_nums, dtype=np.intp)
+    self.room_item_reducer = _OrReducer(self.room_item_locations)
+    self.stairway_states = np.array(stairway_states, dtype=np.intp)
+    self.stairway_reducer = _OrReducer(stairway_locations)
+
+  def _FindCaves(self) -> None:
+    self.destination_requirements: Dict[int, List[int]] = {}
+    for (block_type, bit) in OVERWORLD_BLOCK_TYPE_BITS.items():
+      requirement_num = self._GetRequirementNum(BLOCK_TYPE_REQUIREMENTS[block_type])
+      for destination in self.data_table.GetOverworldDestinationsForBlockTypes(bit):
+        self.destination_requirements.setdefault(destination, []).append(requirement_num)
+    self.cave_destinations: List[int] = []
+    self.cave_requirements: List[int] = []
+    self.cave_heart_requirements: List[int] = []
+    cave_location_caves: List[int] = []
+    cave_locations: List[int] = []
+    for destination in sorted(self.destination_requirements):
+      if destination in Range.VALID_LEVEL_NUMBERS:
+        continue
+      cave_num = destination - 0x10
+      self.cave_destinations.append(destination)
+      self.cave_requirements.append(
+          self._GetRequirementNum(self.CAVE_ITEM_REQUIREMENTS.get(cave_num, NO_REQUIREMENT)))
+      self.cave_heart_requirements.append(self.CAVE_HEART_REQUIREMENTS.get(cave_num, 0))
+      for position_num in Range.VALID_CAVE_POSITION_NUMBERS:
+        cave_location_caves.append(len(self.cave_destinations) - 1)
+        cave_locations.append(
+            self._GetLocationNum(Location(cave_num=cave_num, position_num=position_num)))
+    self.cave_location_caves = np.array(cave_location_caves, dtype=np.intp)
+    self.cave_locations = np.array(cave_locations, dtype=np.intp)
+
+  def _FindPlacedCells(self, locations: Dict[LevelNum, List[Location]]) -> None:
+    # Which entry of a flattened placement goes in which cell, for the ones the validator sees.
+    self.placed_entries: List[int] = []
+    self.placed_cells: List[int] = []
+    self.placement_level_nums = [
+        level_num for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS if level_num in locations
+    ]
+    entry_num = 0
+    for level_num in self.placement_level_nums:
+      for location in locations[level_num]:
+        # The validator reads the armos and coast items from the ROM, not the data table.
+        if not (location.IsCavePosition() and location.GetCaveNum() in [
+            CAVE_NUMBER_REPRESENTING_ARMOS_ITEM, CAVE_NUMBER_REPRESENTING_COAST_ITEM
+        ]):
+          cell = self._GetCell(location)
+          if cell is not None:
+            self.placed_entries.append(entry_num)
+            self.placed_cells.append(cell)
+        entry_num += 1
+    self.num_placement_entries = entry_num
+
+  def _GetCell(self, location: Location) -> Optional[int]:
+    if location.IsLevelRoom():
+      return self.cell_nums.get(
+          (self.data_table.GetRoomTable(location.GetLevelNum()), location.GetRoomNum()))
+    return self.cell_nums.get(('cave', location.GetUniqueIdentifier()))
+
+  def _CompileRequirements(self) -> None:
+    requirements = sorted(self.requirement_nums, key=self.requirement_nums.get)
+    masks = sorted({mask for requirement in requirements for mask in requirement})
+    mask_nums = {mask: mask_num for (mask_num, mask) in enumerate(masks)}
+    # Which inventory columns satisfy each mask, and which masks make up each requirement.
+    self.mask_columns = np.zeros((NUM_INVENTORY_COLUMNS, len(masks)), dtype=np.float32)
+    for (mask_num, mask) in enumerate(masks):
+      for column in range(NUM_INVENTORY_COLUMNS):
+        if mask & (1 << column):
+          self.mask_columns[column, mask_num] = 1
+    self.requirement_masks = np.zeros((len(masks), len(requirements)), dtype=np.float32)
+    for (requirement_num, requirement) in enumerate(requirements):
+      for mask in requirement:
+        self.requirement_masks[mask_nums[mask], requirement_num] = 1
+
+    # Inventory.AddItem adds most items as themselves.
+    self.count_for_item = np.full(Range.VALID_ITEM_NUMBERS.stop, IGNORED_COUNT, dtype=np.intp)
+    for item in range(FIRST_TRIFORCE_COUNT):
+      self.count_for_item[item] = item
+    # Triforces are counted by level instead (see _GetCountIndices).
+    for item in IGNORED_ITEMS + [Item.TRIFORCE]:
+      self.count_for_item[item] = IGNORED_COUNT
+
+  def AreSeedsValid(self, placements: List[Placement]) -> List[bool]:
+    """Returns whether IsSeedValid would accept each placement after it's written to the table."""
+    num_candidates = len(placements)
+    if not num_candidates:
+      return []
+    location_items = self._GetLocationItems(placements)
+    count_indices = self._GetCountIndices(location_items)
+    counts = np.zeros((num_candidates, NUM_COUNTS), dtype=np.intp)
+    room_item_ok = _Pack(~(np.array(self.room_item_needs_drop)[:, None] &
+                           (location_items[self.room_item_locations] == Item.NO_ITEM)))
+
+    num_words = room_item_ok.shape[-1]
+    reached = np.zeros((self.num_states, num_words), dtype=np.uint64)
+    taken = np.zeros((len(self.location_cells), num_words), dtype=np.uint64)
+    beast_defeated = np.zeros(num_words, dtype=np.uint64)
+    kidnapped_rescued = np.zeros(num_words, dtype=np.uint64)
+    while True:
+      inventory = self._GetInventory(counts, _Unpack(beast_defeated, num_candidates),
+                                     _Unpack(kidnapped_rescued, num_candidates))
+      (requirement_ok, destination_ok, cave_ok, triforce_ok) = self._CheckInventory(
+          inventory, counts)
+      for (level_num, state_num) in self.level_entrance_states.items():
+        level_ok = destination_ok.get(level_num)
+        if level_ok is None:
+          continue
+        if level_num == 9:
+          level_ok = level_ok & triforce_ok
+        reached[state_num] |= level_ok
+
+      self._FollowMoves(reached, requirement_ok)
+
+      new_taken = taken.copy()
+      room_item_taken = reached & requirement_ok[self.room_item_requirement_nums] & room_item_ok
+      self.room_item_reducer.OrInto(new_taken, room_item_taken)
+      self.stairway_reducer.OrInto(new_taken, reached[self.stairway_states])
+      if len(self.cave_locations):
+        new_taken[self.cave_locations] |= cave_ok[self.cave_location_caves]
+      new_beast_defeated = beast_defeated.copy()
+      for state_num in self.beast_states:
+        new_beast_defeated |= (reached[state_num] &
+                               requirement_ok[self.room_item_requirement_nums[state_num]])
+      new_kidnapped_rescued = kidnapped_rescued.copy()
+      for state_num in self.kidnapped_states:
+        new_kidnapped_rescued |= reached[state_num]
+
+      if (np.array_equal(new_taken, taken) and np.array_equal(new_beast_defeated, beast_defeated)
+          and np.array_equal(new_kidnapped_rescued, kidnapped_rescued)):
+        break
+      self._CountItems(counts, count_indices, _Unpack(new_taken & ~taken, num_candidates))
+      (taken, beast_defeated, kidnapped_rescued) = (new_taken, new_beast_defeated,
+                                                    new_kidnapped_rescued)
+    return [bool(value) for value in _Unpack(kidnapped_rescued, num_candidates)]
+
+  def _GetLocationItems(self, placements: List[Placement]) -> np.ndarray:
+    """Returns the item at each location for each candidate, as a locations x candidates array."""
+    placed_items = np.fromiter(
+        itertools.chain.from_iterable(placement[level_num] for placement in placements
+                                      for level_num in self.placement_level_nums),
+        dtype=np.intp, count=len(placements) * self.num_placement_entries).reshape(
+            len(placements), self.num_placement_entries)
+    cell_items = np.tile(np.array(self.vanilla_cell_items, dtype=np.intp), (len(placements), 1))
+    cell_items[:, self.placed_cells] = placed_items[:, self.placed_entries]
+    return cell_items[:, self.location_cells].T
+
+  def _GetCountIndices(self, location_items: np.ndarray) -> np.ndarray:
+    """Returns where in a flattened candidates x NUM_COUNTS matrix each location adds one."""
+    counts = self.count_for_item[location_items]
+    level_nums = np.array(self.location_level_nums)[:, None]
+    counts = np.where((location_items == Item.TRIFORCE) & (level_nums > 0),
+                      FIRST_TRIFORCE_COUNT + level_nums, counts)
+    # Inventory ignores the take any cave's heart container.
+    counts = np.where((location_items == Item.HEART_CONTAINER) &
+                      np.array(self.location_is_take_any)[:, None], IGNORED_COUNT, counts)
+    return np.arange(location_items.shape[1]) * NUM_COUNTS + counts
+
+  def _GetInventory(self, counts: np.ndarray, beast_defeated: np.ndarray,
+                    kidnapped_rescued: np.ndarray) -> np.ndarray:
+    """Returns a candidates x NUM_INVENTORY_COLUMNS boolean matrix of what's in each inventory."""
+    inventory = np.zeros((counts.shape[0], NUM_INVENTORY_COLUMNS), dtype=bool)
+    inventory[:, :FIRST_TRIFORCE_COUNT] = counts[:, :FIRST_TRIFORCE_COUNT] > 0
+    # Inventory can give a magical sword instead of a wood sword when there's already a white
+    # sword, but there's no difference since every requirement a wood sword meets includes the
+    # white sword.
+    for (item, upgrade) in UPGRADES.items():
+      inventory[:, upgrade] |= counts[:, item] > 1
+    inventory[:, BEAST_DEFEATED_COLUMN] = beast_defeated
+    inventory[:, KIDNAPPED_RESCUED_COLUMN] = kidnapped_rescued
+    return inventory
+
+  def _CountItems(self, counts: np.ndarray, count_indices: np.ndarray, taken: np.ndarray) -> None:
+    """Adds the items at the given locations x candidates to the candidates x NUM_COUNTS counts."""
+    counts += np.bincount(count_indices[taken], minlength=counts.size).reshape(counts.shape)
+
+  def _CheckInventory(
+      self, inventory: np.ndarray, counts: np.ndarray
+  ) -> Tuple[np.ndarray, Dict[int, np.ndarray], np.ndarray, np.ndarray]:
+    """Returns bits for which candidates meet each requirement, can get to each destination, can
+    get the items in each cave, and have enough triforces for level 9."""
+    missing_masks = (inventory.astype(np.float32) @ self.mask_columns) == 0
+    requirement_ok = _Pack(((missing_masks.astype(np.float32) @ self.requirement_masks) == 0).T)
+
+    destination_ok: Dict[int, np.ndarray] = {}
+    for (destination, requirement_nums) in self.destination_requirements.items():
+      destination_ok[destination] = np.bitwise_or.reduce(requirement_ok[requirement_nums], axis=0)
+
+    num_hearts = NUM_STARTING_HEARTS + counts[:, Item.HEART_CONTAINER]
+    cave_ok = requirement_ok[self.cave_requirements] & _Pack(
+        num_hearts[None, :] >= np.array(self.cave_heart_requirements)[:, None])
+    for (cave_index, destination) in enumerate(self.cave_destinations):
+      cave_ok[cave_index] &= destination_ok[destination]
+
+    num_triforces = (counts[:, FIRST_TRIFORCE_COUNT:IGNORED_COUNT] > 0).sum(axis=1)
+    triforce_ok = _Pack(num_triforces >= NUM_TRIFORCES_FOR_LEVEL_9)
+    return (requirement_ok, destination_ok, cave_ok, triforce_ok)
+
+  def _FollowMoves(self, reached: np.ndarray, requirement_ok: np.ndarray) -> None:
+    """Marks every room state that can be reached from the ones already reached."""
+    while True:
+      moves = reached[self.move_sources] & requirement_ok[self.move_requirement_nums]
+      previously_reached = reached.copy()
+      self.move_reducer.OrInto(reached, moves)
+      if np.array_equal(reached, previously_reached):
+        return
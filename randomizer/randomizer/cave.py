@@ -3,7 +3,7 @@ from .constants import Item, Range
 
 
 class Cave(object):
-  def __init__(self, raw_data: List[int]) -> None:
+  def __init__(self, raw_data: memoryview) -> None:
     self.raw_data = raw_data
 
   def GetItemAtPosition(self, position_num: int) -> Item:
@@ -24,10 +24,10 @@ class Cave(object):
 
   def GetItemData(self) -> List[int]:
     assert len(self.raw_data[0:3]) == 3
-    return self.raw_data[0:3]
+    return list(self.raw_data[0:3])
 
   def GetPriceData(self) -> List[int]:
     assert len(self.raw_data[3:6]) == 3
-    if self.raw_data[3:6] == [0x00, 0x0A, 0x00]:
+    if list(self.raw_data[3:6]) == [0x00, 0x0A, 0x00]:
       return [0x00, 0x1E, 0x00]
-    return self.raw_data[3:6]
+    return list(self.raw_data[3:6])
@@ -1,10 +1,12 @@
 import logging
-from typing import Dict, List
+from typing import Dict, FrozenSet, List, Set
 from .constants import CaveNum, Item, LevelNum, Range, RoomNum
 from constants import OVERWORLD_BLOCK_TYPES, ENTRANCE_DIRECTION_MAP, Direction
 from .room import Room
+from .room_table import RoomTable
 from .location import Location
 from .cave import Cave
+from .level_graph import LevelGraph
 from .patch import Patch
 from rom_reader import RomReader
 
@@ -24,6 +26,18 @@ COAST_ITEM_ADDRESS = 0x1788A + NES_FILE_OFFSET
 COMPASS_ROOM_NUMBER_ADDRESS = 0x1942C + NES_FILE_OFFSET
 SPECIAL_DATA_LEVEL_OFFSET = 0xFC
 
+# One bit per overworld block type, for looking up every destination that can be reached with a
+# given set of capabilities at once.
+OVERWORLD_BLOCK_TYPE_BITS = {
+    "Open": 0x01,
+    "Bomb": 0x02,
+    "Ladder+Bomb": 0x04,
+    "Candle": 0x08,
+    "Recorder": 0x10,
+    "Raft": 0x20,
+    "Power Bracelet": 0x40,
+}
+
 
 class DataTable():
 
@@ -36,19 +50,36 @@ class DataTable():
     self.level_info: List[List[int]] = []
     self._ReadLevelInfo() 
     
-    self.level_1_to_6_rooms: List[Room] = []
-    self.level_7_to_9_rooms: List[Room] = []
+    # The rooms and caves are parsed only once.  Rooms live in a RoomTable per level block and
+    # each Cave is a view into a buffer, so resetting to vanilla just copies the vanilla bytes
+    # back into them.
+    self.level_1_to_6_room_table = RoomTable(self.level_1_to_6_raw_data)
+    self.level_7_to_9_room_table = RoomTable(self.level_7_to_9_raw_data)
+    self.level_1_to_6_rooms = self._ReadDataForLevelGrid(self.level_1_to_6_room_table)
+    self.level_7_to_9_rooms = self._ReadDataForLevelGrid(self.level_7_to_9_room_table)
+    self.overworld_cave_data = bytearray()
     self.overworld_caves: List[Cave] = []
+    self._ReadDataForOverworldCaves()
+    self.vanilla_overworld_cave_data = bytes(self.overworld_cave_data)
     self.triforce_locations: Dict[LevelNum, RoomNum] = {}
+    # The overworld is never modified, so which destinations are behind which block types can be
+    # worked out up front.
+    self.overworld_destinations_by_block_type: Dict[str, FrozenSet[int]] = {}
+    self._ReadOverworldDestinations()
+    self.overworld_destinations_by_block_type_mask: Dict[int, List[int]] = {}
+    # Neither is the layout of the levels, so how their rooms connect is worked out up front, too.
+    self.level_graphs: Dict[LevelNum, LevelGraph] = {}
+    self._BuildLevelGraphs()
 
   def ResetToVanilla(self) -> None:
-    self.level_1_to_6_rooms = self._ReadDataForLevelGrid(self.level_1_to_6_raw_data)
-    self.level_7_to_9_rooms = self._ReadDataForLevelGrid(self.level_7_to_9_raw_data)
-    self._ReadDataForOverworldCaves()
+    # Staircase room numbers only depend on the level layout, so they don't need to be reset.
+    self.level_1_to_6_room_table.ResetToVanilla()
+    self.level_7_to_9_room_table.ResetToVanilla()
+    self.overworld_cave_data[:] = self.vanilla_overworld_cave_data
     self.triforce_locations = {}
 
-  def GetAvailableOverworldCaves(self, block_type) -> int:
-    tbr = set()
+  def _ReadOverworldDestinations(self) -> None:
+    destinations: Dict[str, set] = {block_type: set() for block_type in OVERWORLD_BLOCK_TYPE_BITS}
     for screen_num in range(0, 0x80):
       # Skip any screens that aren't "Secret in 1st Quest"
       if (self.overworld_raw_data[screen_num + 5*0x80] & 0x80) > 0:
@@ -57,10 +88,43 @@ class DataTable():
       destination = self.overworld_raw_data[screen_num + 1*0x80] >> 2
       if destination == 0:
         continue
-      if OVERWORLD_BLOCK_TYPES[screen_num] != block_type:
-        continue
-      tbr.add(destination)
-    return list(tbr)
+      destinations[OVERWORLD_BLOCK_TYPES[screen_num]].add(destination)
+    self.overworld_destinations_by_block_type = {
+        block_type: frozenset(destination_set)
+        for (block_type, destination_set) in destinations.items()
+    }
+
+  def _BuildLevelGraphs(self) -> None:
+    # Levels sharing a grid are read in order, and each room belongs to the first to reach it.
+    level_1_to_6_visited_room_nums: Set[RoomNum] = set()
+    level_7_to_9_visited_room_nums: Set[RoomNum] = set()
+    for level_num in Range.VALID_LEVEL_NUMBERS:
+      logging.debug("Reading staircase room data for level %d ", level_num)
+      if level_num in [7, 8, 9]:
+        (rooms, visited_room_nums) = (self.level_7_to_9_rooms, level_7_to_9_visited_room_nums)
+      else:
+        (rooms, visited_room_nums) = (self.level_1_to_6_rooms, level_1_to_6_visited_room_nums)
+      level_graph = LevelGraph(level_num, rooms, RoomNum(self.GetLevelStartRoomNumber(level_num)),
+                               self.GetLevelStaircaseRoomNumberList(level_num), visited_room_nums)
+      for (room_num, staircase_room_num) in level_graph.GetRoomStaircases().items():
+        rooms[room_num].SetStaircaseRoomNumber(staircase_room_num)
+      self.level_graphs[level_num] = level_graph
+
+  def GetLevelGraph(self, level_num: LevelNum) -> LevelGraph:
+    return self.level_graphs[level_num]
+
+  def GetAvailableOverworldCaves(self, block_type: str) -> List[int]:
+    return list(self.overworld_destinations_by_block_type[block_type])
+
+  def GetOverworldDestinationsForBlockTypes(self, block_type_mask: int) -> List[int]:
+    """Returns the destinations behind any of the block types in the OVERWORLD_BLOCK_TYPE_BITS mask."""
+    if block_type_mask not in self.overworld_destinations_by_block_type_mask:
+      destinations: set = set()
+      for (block_type, bit) in OVERWORLD_BLOCK_TYPE_BITS.items():
+        if block_type_mask & bit:
+          destinations |= self.overworld_destinations_by_block_type[block_type]
+      self.overworld_destinations_by_block_type_mask[block_type_mask] = list(destinations)
+    return self.overworld_destinations_by_block_type_mask[block_type_mask]
  
   def _ReadLevelInfo(self):
     self.is_z1r = True
@@ -72,33 +136,34 @@ class DataTable():
             continue
         self.is_z1r = False
 
-  def _ReadDataForLevelGrid(self, level_data: List[int]) -> List[Room]:
-    rooms: List[Room] = []
-    for room_num in Range.VALID_ROOM_NUMBERS:
-      room_data: List[int] = []
-      for byte_num in range(0, NUM_BYTES_OF_DATA_PER_ROOM):
-        room_data.append(level_data[byte_num * LEVEL_TABLE_SIZE + room_num])
-      rooms.append(Room(room_data))
-    return rooms
+  def _ReadDataForLevelGrid(self, room_table: RoomTable) -> List[Room]:
+    return [Room(room_table, RoomNum(room_num)) for room_num in Range.VALID_ROOM_NUMBERS]
 
   def _ReadDataForOverworldCaves(self) -> None:
-    self.overworld_caves = []
     for cave_num in Range.VALID_CAVE_NUMBERS:
       if cave_num == CAVE_NUMBER_REPRESENTING_ARMOS_ITEM:
-        self.overworld_caves.append(Cave([0x3F, Item.POWER_BRACELET, 0x7F, 0x00, 0x00, 0x00]))
+        self.overworld_cave_data.extend([0x3F, Item.POWER_BRACELET, 0x7F, 0x00, 0x00, 0x00])
       elif cave_num == CAVE_NUMBER_REPRESENTING_COAST_ITEM:
-        self.overworld_caves.append(Cave([0x3F, Item.HEART_CONTAINER, 0x7F, 0x00, 0x00, 0x00]))
+        self.overworld_cave_data.extend([0x3F, Item.HEART_CONTAINER, 0x7F, 0x00, 0x00, 0x00])
       else:
         assert cave_num in range(0, 0x14)
-        cave_data: List[int] = []
-        for cave_item_byte_num in range(0, 3):
-          cave_data.append(self.overworld_cave_raw_data[(3 * cave_num) + cave_item_byte_num])
-        for cave_price_byte_num in range(0, 3):
-          cave_data.append(
-              self.overworld_cave_raw_data[0x3C + (3 * cave_num) + cave_price_byte_num])
-        self.overworld_caves.append(Cave(cave_data))
+        self.overworld_cave_data.extend(
+            self.overworld_cave_raw_data[3 * cave_num:3 * cave_num + 3])
+        self.overworld_cave_data.extend(
+            self.overworld_cave_raw_data[0x3C + 3 * cave_num:0x3C + 3 * cave_num + 3])
+    overworld_cave_data_view = memoryview(self.overworld_cave_data)
+    self.overworld_caves = [
+        Cave(overworld_cave_data_view[6 * cave_num:6 * cave_num + 6])
+        for cave_num in Range.VALID_CAVE_NUMBERS
+    ]
     assert len(self.overworld_caves) == 22  # 0-19 are actual caves, 20-21 are for the armos/coast
 
+  def GetRoomTable(self, level_num: LevelNum) -> RoomTable:
+    assert level_num in Range.VALID_LEVEL_NUMBERS
+    if level_num in [7, 8, 9]:
+      return self.level_7_to_9_room_table
+    return self.level_1_to_6_room_table
+
   def GetRoom(self, level_num: LevelNum, room_num: RoomNum) -> Room:
     assert level_num in Range.VALID_LEVEL_NUMBERS
     assert room_num in Range.VALID_ROOM_NUMBERS
@@ -109,16 +174,11 @@ class DataTable():
 
   def GetRoomItem(self, location: Location) -> Item:
     assert location.IsLevelRoom()
-    if location.GetLevelNum() in [7, 8, 9]:
-      return self.level_7_to_9_rooms[location.GetRoomNum()].GetItem()
-    return self.level_1_to_6_rooms[location.GetRoomNum()].GetItem()
+    return self.GetRoomTable(location.GetLevelNum()).GetItem(location.GetRoomNum())
 
   def SetRoomItem(self, location: Location, item: Item) -> None:
     assert location.IsLevelRoom()
-    if location.GetLevelNum() in [7, 8, 9]:
-      self.level_7_to_9_rooms[location.GetRoomNum()].SetItem(item)
-    else:
-      self.level_1_to_6_rooms[location.GetRoomNum()].SetItem(item)
+    self.GetRoomTable(location.GetLevelNum()).SetItem(location.GetRoomNum(), item)
 
   def GetCaveItem(self, location: Location) -> Item:
     assert location.IsCavePosition()
@@ -141,10 +201,8 @@ class DataTable():
 
   def ClearAllVisitMarkers(self) -> None:
     logging.debug("Clearing Visit markers")
-    for room in self.level_1_to_6_rooms:
-      room.ClearVisitMark()
-    for room in self.level_7_to_9_rooms:
-      room.ClearVisitMark()
+    self.level_1_to_6_room_table.ClearVisitMarks()
+    self.level_7_to_9_room_table.ClearVisitMarks()
 
   # Gets the Room number of the start screen for a level.
   #def GetLevelStartRoomNumber(self, level_num: LevelNum) -> RoomNum:
@@ -152,8 +210,8 @@ class DataTable():
   #  return self.LEVEL_START_ROOM_NUMBERS[level_num - 1]
     
   def GetLevelStartRoomNumber(self, level_num: int) -> int:
-      logging.debug("Level %d start room is %x" % 
-                      (level_num, self.level_info[level_num][START_ROOM_OFFSET]))
+      logging.debug("Level %d start room is %x",
+                    level_num, self.level_info[level_num][START_ROOM_OFFSET])
       return self.level_info[level_num][START_ROOM_OFFSET]
 
   def GetLevelEntranceDirection(self, level_num: int) -> Direction:
@@ -198,21 +256,18 @@ class DataTable():
   def GetPatch(self) -> Patch:
     patch = Patch()
     patch += self._GetPatchForLevelGrid(LEVEL_1_TO_6_DATA_START_ADDRESS,
-                                        self.level_1_to_6_rooms)
+                                        self.level_1_to_6_room_table)
     patch += self._GetPatchForLevelGrid(LEVEL_7_TO_9_DATA_START_ADDRESS,
-                                        self.level_7_to_9_rooms)
+                                        self.level_7_to_9_room_table)
     patch += self._GetPatchForOverworldCaveData()
     return patch
 
-  def _GetPatchForLevelGrid(self, start_address: int, rooms: List[Room]) -> Patch:
+  def _GetPatchForLevelGrid(self, start_address: int, room_table: RoomTable) -> Patch:
     patch = Patch()
-    for room_num in Range.VALID_ROOM_NUMBERS:
-      room_data = rooms[room_num].GetRomData()
-      assert len(room_data) == NUM_BYTES_OF_DATA_PER_ROOM
-
-      for table_num in range(0, NUM_BYTES_OF_DATA_PER_ROOM):
-        patch.AddData(start_address + table_num * LEVEL_TABLE_SIZE + room_num,
-                      [room_data[table_num]])
+    # The room table has the same layout as the ROM, so all six tables go in as one block.
+    room_data = room_table.GetData()
+    assert len(room_data) == NUM_BYTES_OF_DATA_PER_ROOM * LEVEL_TABLE_SIZE
+    patch.AddData(start_address, room_data)
     # Write Triforce room location to update where the compass displays it in levels 1-8.
     # The room the compass points to in level 9 doesn't change.
     for level_num in range(1, 9):
@@ -1,4 +1,13 @@
 from enum import Enum
+import hashlib
+
+# Version of the flag string format.  Bump this if flags are ever reordered or removed; new flags
+# can be added to the end of FlagsEnum without a new version.
+FLAG_STRING_VERSION = '1'
+# Crockford's base32 alphabet, which leaves out letters that are easily confused with digits.
+FLAG_STRING_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+FLAG_STRING_ALIASES = {'O': '0', 'I': '1', 'L': '1'}
+FLAG_STRING_BITS_PER_CHAR = 5
 
 class FlagsEnum(Enum):
     PROGRESSIVE_ITEMS = (
@@ -78,6 +87,10 @@ class FlagsEnum(Enum):
         self.display_name = display_name
         self.help_text = help_text
 
+    def __reduce_ex__(self, protocol):
+        # Members are looked up by name when unpickled since their values are tuples.
+        return getattr, (self.__class__, self.name)
+
     @classmethod
     def get_flag_list(cls):
         return [(flag.value.lower(), flag.display_name, flag.help_text) for flag in cls]
@@ -88,7 +101,12 @@ class Flags:
         self.flags = {flag.value: flag for flag in FlagsEnum}
 
     def __getattr__(self, flag_value):
-        return self.flags[flag_value]
+        # Look in __dict__ directly so that unpickling (which probes for attributes before
+        # self.flags exists) doesn't recurse.
+        flags = self.__dict__.get('flags', {})
+        if flag_value not in flags:
+            raise AttributeError(flag_value)
+        return flags[flag_value]
 
     def get(self, flag_value):
         return self.flags[flag_value]
@@ -99,4 +117,50 @@ class Flags:
         else:
             raise KeyError(f"Flag '{flag_value}' not found.")
 
+    def ToFlagString(self) -> str:
+        """Returns a short string encoding every flag, e.g. for sharing or as a cache key.
+
+        The string is a version character followed by the flags packed as bits, in FlagsEnum
+        order, and written in base32.
+        """
+        bits = 0
+        for (flag_num, flag) in enumerate(FlagsEnum):
+            if self.flags[flag.value]:
+                bits |= 1 << flag_num
+        num_chars = -(-len(FlagsEnum) // FLAG_STRING_BITS_PER_CHAR)
+        chars = [
+            FLAG_STRING_ALPHABET[(bits >> (char_num * FLAG_STRING_BITS_PER_CHAR)) & 0x1F]
+            for char_num in reversed(range(num_chars))
+        ]
+        return FLAG_STRING_VERSION + ''.join(chars)
+
+    @classmethod
+    def FromFlagString(cls, flag_string: str) -> 'Flags':
+        flag_string = flag_string.strip().upper()
+        if not flag_string or flag_string[0] != FLAG_STRING_VERSION:
+            raise ValueError(f"Unsupported flag string '{flag_string}'.")
+        bits = 0
+        for char in flag_string[1:]:
+            char = FLAG_STRING_ALIASES.get(char, char)
+            if char not in FLAG_STRING_ALPHABET:
+                raise ValueError(f"Invalid character '{char}' in flag string.")
+            bits = (bits << FLAG_STRING_BITS_PER_CHAR) | FLAG_STRING_ALPHABET.index(char)
+        if bits >> len(FlagsEnum):
+            raise ValueError(f"Flag string '{flag_string}' has unknown flags set.")
+        flags = cls()
+        for (flag_num, flag) in enumerate(FlagsEnum):
+            flags.set(flag.value, bits & (1 << flag_num) > 0)
+        return flags
+
+    def GetHash(self) -> str:
+        """Returns a hash of the flags that is the same across runs and machines."""
+        return hashlib.sha1(self.ToFlagString().encode('ascii')).hexdigest()[:12]
+
+    # Flags can be changed with set(), so they aren't hashable.  Key anything on ToFlagString() or
+    # GetHash() instead.
+    def __eq__(self, other):
+        if not isinstance(other, Flags):
+            return NotImplemented
+        return self.ToFlagString() == other.ToFlagString()
+
         
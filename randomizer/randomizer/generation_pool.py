@@ -0,0 +1,178 @@
+import asyncio
+import concurrent.futures
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from .flags import Flags
+from .generation_stats import STAGE_VALIDATE, GenerationStats
+from .patch import Patch
+from .patch_cache import PatchCache
+from .randomizer import SAMPLER_PLACEMENT, GenerationBudgetExceeded, Z1Randomizer
+
+# Called with the number of item placements tried so far, from the thread awaiting the result.
+ProgressCallback = Callable[[int], None]
+
+# Where worker processes send (job id, number of attempts) progress updates.  Set by _InitWorker.
+_worker_progress_queue: Optional[multiprocessing.Queue] = None
+
+
+class GenerationPoolFullError(Exception):
+  """Raised instead of queueing a seed when the pool already has as many as it's allowed."""
+
+
+def _InitWorker(progress_queue: multiprocessing.Queue) -> None:
+  global _worker_progress_queue
+  _worker_progress_queue = progress_queue
+
+
+def _GeneratePatch(job_id: int, rom_data: bytes, seed: int, flags: Flags, placement: str,
+                   deadline: Optional[float], report_progress: bool) -> Patch:
+
+  def OnStage(stage: str, stats: GenerationStats) -> None:
+    if report_progress and stage == STAGE_VALIDATE and _worker_progress_queue is not None:
+      _worker_progress_queue.put((job_id, stats.num_attempts))
+
+  # The pool can't stop a seed that a worker has already started, so it stops itself once the
+  # time left before the deadline (including any time spent waiting for a worker) runs out.
+  max_seconds = max(0.0, deadline - time.time()) if deadline is not None else None
+  z1randomizer = Z1Randomizer(rom_data, seed, flags, quiet=True, placement=placement,
+                              max_seconds=max_seconds)
+  return z1randomizer.GetPatchWithStats(OnStage)[0]
+
+
+class GenerationPool():
+  """Generates seeds for asyncio code in a shared pool of worker processes.
+
+  At most max_pending seeds can be generating or waiting for a worker at once, across every
+  caller.  That includes seeds that callers have stopped waiting for, until a worker is done with
+  them.  Past that, Generate raises GenerationPoolFullError right away instead of queueing more
+  work, so that a busy front end can turn requests away.  Awaiting Generate can be cancelled and
+  can time out.  A seed that hasn't started yet is dropped, and one that has stops itself at its
+  deadline.  Generate can be called from any thread with its own event loop, e.g. one per session.
+  """
+
+  def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None) -> None:
+    """max_workers defaults to the number of CPUs, and max_pending to twice max_workers."""
+    self.max_workers = max_workers or os.cpu_count() or 1
+    self.max_pending = max_pending if max_pending is not None else 2 * self.max_workers
+    self.lock = threading.Lock()
+    self.num_pending = 0
+    self.job_ids = itertools.count()
+    self.progress_callbacks: Dict[int, Tuple[asyncio.AbstractEventLoop, ProgressCallback]] = {}
+    self.executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+    self.progress_queue: Optional[multiprocessing.Queue] = None
+    self.progress_thread: Optional[threading.Thread] = None
+
+  def _GetExecutor(self) -> concurrent.futures.ProcessPoolExecutor:
+    # The worker processes are only started once there's a seed to generate.
+    with self.lock:
+      if self.executor is None:
+        self.progress_queue = multiprocessing.Queue()
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_InitWorker,
+            initargs=(self.progress_queue,))
+        self.progress_thread = threading.Thread(target=self._ForwardProgress,
+                                                args=(self.progress_queue,), daemon=True)
+        self.progress_thread.start()
+      return self.executor
+
+  def _ForwardProgress(self, progress_queue: multiprocessing.Queue) -> None:
+    while True:
+      update = progress_queue.get()
+      if update is None:
+        return
+      (job_id, num_attempts) = update
+      # The callback is scheduled while holding the lock, since Generate removes it (under the
+      # lock) before returning, and so before its loop can be closed.  Scheduling on a closed loop
+      # raises RuntimeError, which would stop progress updates for every later seed.
+      with self.lock:
+        loop_and_callback = self.progress_callbacks.get(job_id)
+        if loop_and_callback is not None:
+          (loop, callback) = loop_and_callback
+          if not loop.is_closed():
+            loop.call_soon_threadsafe(callback, num_attempts)
+
+  def _ReleaseSlot(self) -> None:
+    with self.lock:
+      self.num_pending -= 1
+
+  def GetNumPending(self) -> int:
+    return self.num_pending
+
+  def IsFull(self) -> bool:
+    return self.num_pending >= self.max_pending
+
+  async def Generate(self,
+                     rom_data: bytes,
+                     seed: int,
+                     flags: Flags,
+                     placement: str = SAMPLER_PLACEMENT,
+                     timeout: Optional[float] = None,
+                     cache: Optional[PatchCache] = None,
+                     progress_callback: Optional[ProgressCallback] = None) -> Patch:
+    """Returns the patch for the seed, the same as Z1Randomizer.GetPatch would.
+
+    Raises GenerationPoolFullError if the pool is full, or TimeoutError if the seed takes longer
+    than timeout seconds.  If a cache is given, it's checked first and the new patch is put in it.
+    """
+    rom_data = bytes(rom_data)
+    cache_key = None
+    if cache is not None:
+      cache_key = PatchCache.GetKey(PatchCache.GetRomSha1(rom_data), seed, flags, placement)
+      patch = cache.Get(cache_key)
+      if patch is not None:
+        return patch
+
+    with self.lock:
+      if self.num_pending >= self.max_pending:
+        raise GenerationPoolFullError("Already generating %d seeds" % self.num_pending)
+      self.num_pending += 1
+    job_id = next(self.job_ids)
+    try:
+      if progress_callback is not None:
+        with self.lock:
+          self.progress_callbacks[job_id] = (asyncio.get_running_loop(), progress_callback)
+      deadline = time.time() + timeout if timeout is not None else None
+      try:
+        future = self._GetExecutor().submit(_GeneratePatch, job_id, rom_data, seed, flags,
+                                            placement, deadline, progress_callback is not None)
+      except BaseException:
+        self._ReleaseSlot()
+        raise
+      # The slot is only free once a worker is done with the seed, which can be after this
+      # caller has stopped waiting for it.
+      future.add_done_callback(lambda _: self._ReleaseSlot())
+      try:
+        patch = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+      except (asyncio.TimeoutError, GenerationBudgetExceeded):
+        # Before Python 3.11, asyncio.TimeoutError isn't a TimeoutError.
+        raise TimeoutError("Seed %d took longer than %s seconds" % (seed, timeout))
+      finally:
+        # Drops the seed if it's still waiting for a worker, e.g. when cancelled.
+        future.cancel()
+    finally:
+      with self.lock:
+        self.progress_callbacks.pop(job_id, None)
+
+    if cache is not None and cache_key is not None:
+      cache.Put(cache_key, patch)
+    return patch
+
+  def Shutdown(self) -> None:
+    with self.lock:
+      (executor, progress_queue, progress_thread) = (self.executor, self.progress_queue,
+                                                     self.progress_thread)
+      self.executor = None
+      self.progress_queue = None
+      self.progress_thread = None
+    if executor is not None:
+      executor.shutdown(wait=True, cancel_futures=True)
+    if progress_queue is not None and progress_thread is not None:
+      # Wait for the progress thread to stop, so it isn't left reading from a closed queue.
+      progress_queue.put(None)
+      progress_thread.join()
+      progress_queue.close()
@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+# Names of the stages of generating a seed, in the order they first happen.
+STAGE_READ_DATA = 'read_data'
+STAGE_SHUFFLE = 'shuffle'
+STAGE_WRITE_ITEMS = 'write_items'
+STAGE_VALIDATE = 'validate'
+STAGE_BUILD_PATCH = 'build_patch'
+
+
+class GenerationStats():
+  """Counters and timings collected while generating a seed.
+
+  If a stage callback is given, it's called with the stage name and these stats each time a stage
+  finishes, e.g. to export metrics while a slow seed is still being generated.
+  """
+
+  def __init__(self,
+               stage_callback: Optional[Callable[[str, 'GenerationStats'], None]] = None) -> None:
+    self.stage_callback = stage_callback
+    self.cache_hit = False
+    # Number of item placements handed to the validator.
+    self.num_attempts = 0
+    # Number of shuffles thrown away by ItemRandomizer.HasValidItemConfiguration.
+    self.num_shuffle_retries = 0
+    # Validator sweeps over the whole map, summed over all attempts.
+    self.num_validator_iterations = 0
+    # Total seconds spent in each stage, summed over all attempts.
+    self.stage_seconds: Dict[str, float] = {}
+    self.total_seconds = 0.0
+    # Number of shuffles and placements thrown away for each reason, e.g. by the validator.
+    self.rejection_reasons: Dict[str, int] = {}
+    self.start_time = time.perf_counter()
+
+  def AddRejection(self, reason: str) -> None:
+    self.rejection_reasons[reason] = self.rejection_reasons.get(reason, 0) + 1
+
+  def GetElapsedSeconds(self) -> float:
+    """Returns the wall-clock time since these stats were created, unlike total_seconds."""
+    return time.perf_counter() - self.start_time
+
+  @contextmanager
+  def TimeStage(self, stage: str) -> Iterator[None]:
+    start_time = time.perf_counter()
+    try:
+      yield
+    finally:
+      seconds = time.perf_counter() - start_time
+      self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+      self.total_seconds += seconds
+      if self.stage_callback is not None:
+        self.stage_callback(stage, self)
+
+  def ToDict(self) -> Dict:
+    return {
+        'cache_hit': self.cache_hit,
+        'num_attempts': self.num_attempts,
+        'num_shuffle_retries': self.num_shuffle_retries,
+        'num_validator_iterations': self.num_validator_iterations,
+        'rejection_reasons': dict(self.rejection_reasons),
+        'stage_seconds': dict(self.stage_seconds),
+        'total_seconds': self.total_seconds,
+    }
@@ -2,27 +2,33 @@ from typing import List, Set, Tuple
 
 from .constants import Direction, Item, LevelNum, RoomNum
 from .location import Location
+from .requirement import IsSatisfied, ItemBit, Requirement
 
 import logging as log
 
 class Inventory(object):
-  def __init__(self) -> None:
+  def __init__(self, quiet: bool = False) -> None:
+    self.quiet = quiet
     self.items: Set[Item]
+    self.item_mask: int
     self.item_locations: Set[int]
     self.locations_where_keys_were_used: Set[Tuple[LevelNum, RoomNum, Direction]]
     self.num_heart_containers: int
     self.num_keys: int
     self.levels_with_triforce_obtained: List[int]
+    self.num_assumed_triforces: int
     self.still_making_progress_bit: bool
     self.Reset()
 
   def Reset(self) -> None:
     self.items = set()
+    self.item_mask = 0
     self.item_locations = set()
     self.locations_where_keys_were_used = set()
     self.num_heart_containers = 3
     self.num_keys = 0
     self.levels_with_triforce_obtained = []
+    self.num_assumed_triforces = 0
     self.still_making_progress_bit = False
   
   def ToString(self) -> str:
@@ -60,46 +66,64 @@ class Inventory(object):
       if item_location.IsCavePosition() and item_location.GetCaveNum() == 2:
         return
       self.num_heart_containers += 1
-      if item_location.IsLevelRoom():
-        log.debug("Found Heart Container in level %d. Now have %d HCs" % 
-                  (int(item_location.GetLevelNum()), self.num_heart_containers))
+      if self.quiet:
+        pass
+      elif item_location.IsLevelRoom():
+        log.debug("Found Heart Container in level %d. Now have %d HCs",
+                  int(item_location.GetLevelNum()), self.num_heart_containers)
       else:
-        log.debug("Found Heart Container in cave %d. Now have %d HCs" % 
-                  (int(item_location.GetCaveNum()), self.num_heart_containers))
+        log.debug("Found Heart Container in cave %d. Now have %d HCs",
+                  int(item_location.GetCaveNum()), self.num_heart_containers)
       assert self.num_heart_containers <= 16
       return
     elif item == Item.TRIFORCE:
       level_num = int(item_location.GetLevelNum())
       if int(level_num) not in self.levels_with_triforce_obtained:
         self.levels_with_triforce_obtained.append(level_num)
-        log.debug("Found triforce in level %d. Now have %d tringles" % 
-                  (level_num, len(self.levels_with_triforce_obtained)))        
+        if not self.quiet:
+          log.debug("Found triforce in level %d. Now have %d tringles",
+                    level_num, len(self.levels_with_triforce_obtained))
       return
     elif item == Item.KEY:
       self.num_keys += 1
       return
 
-    log.debug("Found %s" % item)
+    if not self.quiet:
+      log.debug("Found %s", item)
+    self._AddToItems(item)
 
+  def AddAssumedItem(self, item: Item) -> None:
+    """Adds an item that hasn't been placed anywhere yet, to check what it would make reachable."""
+    if item == Item.HEART_CONTAINER:
+      self.num_heart_containers += 1
+    elif item == Item.TRIFORCE:
+      self.num_assumed_triforces += 1
+    elif item == Item.KEY:
+      self.num_keys += 1
+    else:
+      self._AddToItems(item)
+
+  def _AddToItems(self, item: Item) -> None:
     if item == Item.WOOD_SWORD and Item.WOOD_SWORD in self.items:
-      self.items.add(Item.WHITE_SWORD)
+      item = Item.WHITE_SWORD
     elif item == Item.WOOD_SWORD and Item.WHITE_SWORD in self.items:
-      self.items.add(Item.MAGICAL_SWORD)
+      item = Item.MAGICAL_SWORD
     elif item == Item.BLUE_RING and Item.BLUE_RING in self.items:
-      self.items.add(Item.RED_RING)
+      item = Item.RED_RING
     elif item == Item.BLUE_CANDLE and Item.BLUE_CANDLE in self.items:
-      self.items.add(Item.RED_CANDLE)
+      item = Item.RED_CANDLE
     elif item == Item.WOOD_ARROWS and Item.WOOD_ARROWS in self.items:
-      self.items.add(Item.SILVER_ARROWS)
-    else:
-      self.items.add(item)
+      item = Item.SILVER_ARROWS
+    self.items.add(item)
+    self.item_mask |= ItemBit(item)
 
   def GetHeartCount(self) -> int:
     return self.num_heart_containers
 
   def GetTriforceCount(self) -> int:
-    log.debug("Triforce check. Currently have: %s" % self.levels_with_triforce_obtained)
-    return len(self.levels_with_triforce_obtained)
+    if not self.quiet:
+      log.debug("Triforce check. Currently have: %s", self.levels_with_triforce_obtained)
+    return len(self.levels_with_triforce_obtained) + self.num_assumed_triforces
 
   def HasKey(self) -> bool:
     return self.Has(Item.MAGICAL_KEY) or self.num_keys > 0
@@ -114,6 +138,12 @@ class Inventory(object):
     self.locations_where_keys_were_used.add((level_num, room_num, exit_direction))
 
   # Methods to check what's in the inventory
+  def GetItemMask(self) -> int:
+    return self.item_mask
+
+  def Satisfies(self, requirement: Requirement) -> bool:
+    return IsSatisfied(requirement, self.item_mask)
+
   def Has(self, item: Item) -> bool:
     return item in self.items
 
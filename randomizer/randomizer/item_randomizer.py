@@ -1,28 +1,38 @@
-from typing import DefaultDict, List, Tuple, Iterable
+from typing import DefaultDict, Dict, List, Optional, Tuple, Iterable
 from collections import defaultdict
-from random import shuffle
 import logging as log
+import random
 
-from .constants import Direction, Item, LevelNum, Range, RoomNum, RoomType, WallType
+from .assumed_fill import AssumedFill
+from .constants import Item, LevelNum, Range
 from .data_table import DataTable
 from .location import Location
 from .flags import Flags
+from .validator import Validator
 
+# Why HasValidItemConfiguration rejected a shuffle (see GetRejectionReason).
+REJECTION_PROGRESSIVE_ITEM_IN_SHOP = 'progressive_item_in_shop'
+REJECTION_LADDER_IN_CAVE_25 = 'ladder_in_cave_25'
 
 class ItemRandomizer():
-  def __init__(self, data_table: DataTable, flags: Flags) -> None:
+  def __init__(self,
+               data_table: DataTable,
+               flags: Flags,
+               rng: random.Random,
+               quiet: bool = False) -> None:
     self.data_table = data_table
     self.flags = flags
-    self.item_shuffler = ItemShuffler(flags)
+    self.quiet = quiet
+    self.item_shuffler = ItemShuffler(flags, rng, quiet)
   
   def _GetOverworldItemLocation(self, item: Item):
-    log.debug("_GetOverworldItemLocation for %s" % item)
+    log.debug("_GetOverworldItemLocation for %s", item)
     for cave_num in Range.VALID_CAVE_NUMBERS:
       for position_num in Range.VALID_CAVE_POSITION_NUMBERS:
         maybe_location = Location(cave_num=cave_num, position_num=position_num)
         if self.data_table.GetCaveItem(maybe_location) == item:
-          log.debug("_GetOverworldItemLocation Found it at cave %d pos %d" % 
-                      (maybe_location.GetCaveNum(),maybe_location.GetPositionNum()))
+          log.debug("_GetOverworldItemLocation Found it at cave %d pos %d",
+                    maybe_location.GetCaveNum(), maybe_location.GetPositionNum())
           return maybe_location
     log.warning("_GetOverworldItemLocation Couldn't find it :(")
     return None
@@ -56,71 +66,58 @@ class ItemRandomizer():
     self.item_shuffler.ResetState()
 
   def ReadItemsAndLocationsFromTable(self) -> None:
+    # The locations and items only depend on the ROM and flags, so they're only actually read
+    # from the (vanilla) table the first time.  After that, the pool read then is restored.
+    if self.item_shuffler.RestorePool():
+      return
     for level_num in Range.VALID_LEVEL_NUMBERS:
       self._ReadItemsAndLocationsForUndergroundLevel(level_num)
     for location in self._GetOverworldItemsToShuffle():
       item_num = self.data_table.GetCaveItem(location)
       self.item_shuffler.AddLocationAndItem(location, item_num)
+    self.item_shuffler.SavePool()
 
   def _ReadItemsAndLocationsForUndergroundLevel(self, level_num: LevelNum) -> None:
-    log.debug("Reading staircase room data for level %d " % level_num)
-    for staircase_room_num in self.data_table.GetLevelStaircaseRoomNumberList(level_num):
-      self._ParseStaircaseRoom(level_num, staircase_room_num)
-    level_start_room_num = self.data_table.GetLevelStartRoomNumber(level_num)
-    log.debug("Traversing level %d.  Start room is %x. " % (level_num, level_start_room_num))
-    self._ReadItemsAndLocationsRecursively(level_num, level_start_room_num)
-
-  def _ParseStaircaseRoom(self, level_num: LevelNum, staircase_room_num: RoomNum) -> None:
-    staircase_room = self.data_table.GetRoom(level_num, staircase_room_num)
-
-    if staircase_room.GetType() == RoomType.ITEM_STAIRCASE:
-      log.debug("  Found item staircase %x in L%d " % (staircase_room_num, level_num))
-      assert staircase_room.GetLeftExit() == staircase_room.GetRightExit()
-      self.data_table.GetRoom(
-          level_num, staircase_room.GetLeftExit()).SetStaircaseRoomNumber(staircase_room_num)
-    elif staircase_room.GetType() == RoomType.TRANSPORT_STAIRCASE:
-      log.debug("  Found transport staircase %x in L%d " % (staircase_room_num, level_num))
-      assert staircase_room.GetLeftExit() != staircase_room.GetRightExit()
-      for associated_room_num in [staircase_room.GetLeftExit(), staircase_room.GetRightExit()]:
-        self.data_table.GetRoom(level_num,
-                                associated_room_num).SetStaircaseRoomNumber(staircase_room_num)
-    else:
-      log.fatal("Room in staircase room number list (%x) didn't have staircase type (%x)." %
-                    (staircase_room_num, staircase_room.GetType()))
-
-  def _ReadItemsAndLocationsRecursively(self, level_num: LevelNum, room_num: RoomNum) -> None:
-    if room_num not in Range.VALID_ROOM_NUMBERS:
-      return  # No escaping back into the overworld! :)
-    room = self.data_table.GetRoom(level_num, room_num)
-    if room.IsMarkedAsVisited():
-      return
-    room.MarkAsVisited()
-
-    item = room.GetItem()
-    if item not in [Item.NO_ITEM, Item.TRIFORCE_OF_POWER]:
+    for room_num in self.data_table.GetLevelGraph(level_num).GetRoomNums():
+      item = self.data_table.GetRoom(level_num, room_num).GetItem()
+      if item not in [Item.NO_ITEM, Item.TRIFORCE_OF_POWER]:
         if not item.IsMinorDungeonItem() or self.flags.shuffle_minor_dungeon_items:
           self.item_shuffler.AddLocationAndItem(Location.LevelRoom(level_num, room_num), item)
- 
-    # Staircase cases (bad pun intended)
-    if room.GetType() == RoomType.ITEM_STAIRCASE:
-      return  # Dead end, no need to traverse further.
-    elif room.GetType() == RoomType.TRANSPORT_STAIRCASE:
-      for upstairs_room in [room.GetLeftExit(), room.GetRightExit()]:
-        self._ReadItemsAndLocationsRecursively(level_num, upstairs_room)
-      return
-    # Regular (non-staircase) room case.  Check all four cardinal directions, plus "down".
-    for direction in (Direction.WEST, Direction.NORTH, Direction.EAST, Direction.SOUTH):
-      if room.GetWallType(direction) != WallType.SOLID_WALL:
-        self._ReadItemsAndLocationsRecursively(level_num, RoomNum(room_num + direction))
-    if room.HasStaircase():
-      self._ReadItemsAndLocationsRecursively(level_num, room.GetStaircaseRoomNumber())
 
   def ShuffleItems(self) -> None:
     self.item_shuffler.ShuffleItems()
 
+  def PlaceItemsWithAssumedFill(self, validator: Validator) -> bool:
+    """An alternative to ShuffleItems that only makes beatable placements (see AssumedFill).
+
+    Returns False if the placement got stuck, in which case it can be tried again.
+    """
+    return self.item_shuffler.FillItems(self.data_table, validator)
+
   def HasValidItemConfiguration(self) -> bool:
     return self.item_shuffler.HasValidItemConfiguration()
 
+  def GetRejectionReason(self) -> Optional[str]:
+    """Returns why the last call to HasValidItemConfiguration returned False, if it did."""
+    return self.item_shuffler.rejection_reason
+
+  def GetRejectedLocationAndItem(self) -> Optional[Tuple[Location, Item]]:
+    """Returns the item placement that the last call to HasValidItemConfiguration rejected."""
+    return self.item_shuffler.rejected_location_and_item
+
+  def GetLocations(self) -> Dict[LevelNum, List[Location]]:
+    return {
+        level_num: list(self.item_shuffler.per_level_item_location_lists[level_num])
+        for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS
+    }
+
+  def GetPlacement(self) -> Dict[LevelNum, List[Item]]:
+    """Returns the items placed by the last shuffle, in the same order as GetLocations."""
+    return {
+        level_num: list(self.item_shuffler.per_level_item_lists[level_num])
+        for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS
+    }
+
   def WriteItemsAndLocationsToTable(self) -> None:
     for (location, item_num) in self.item_shuffler.GetAllLocationAndItemData():
       if location.IsLevelRoom():
@@ -132,11 +129,34 @@ class ItemRandomizer():
 
 
 class ItemShuffler():
-  def __init__(self, flags) -> None:
+  def __init__(self, flags, rng: random.Random, quiet: bool = False) -> None:
     self.flags = flags
+    self.rng = rng
+    self.quiet = quiet
     self.item_num_list: List[Item] = []
     self.per_level_item_location_lists: DefaultDict[LevelNum, List[Location]] = defaultdict(list)
     self.per_level_item_lists: DefaultDict[LevelNum, List[Item]] = defaultdict(list)
+    # Copies of item_num_list and per_level_item_location_lists from right after they were read.
+    self.pool: Optional[Tuple[List[Item], Dict[LevelNum, List[Location]]]] = None
+    self.rejection_reason: Optional[str] = None
+    self.rejected_location_and_item: Optional[Tuple[Location, Item]] = None
+
+  def SavePool(self) -> None:
+    self.pool = (list(self.item_num_list), {
+        level_num: list(locations)
+        for (level_num, locations) in self.per_level_item_location_lists.items()
+    })
+
+  def RestorePool(self) -> bool:
+    """Puts back the items and locations saved by SavePool.  Returns False if there aren't any."""
+    if self.pool is None:
+      return False
+    (item_num_list, per_level_item_location_lists) = self.pool
+    self.ResetState()
+    self.item_num_list.extend(item_num_list)
+    for (level_num, locations) in per_level_item_location_lists.items():
+      self.per_level_item_location_lists[level_num] = list(locations)
+    return True
 
   def ResetState(self):
     self.item_num_list.clear()
@@ -148,8 +168,9 @@ class ItemShuffler():
       return
     level_num = location.GetLevelNum() if location.IsLevelRoom() else 10
     self.per_level_item_location_lists[level_num].append(location)
-    log.debug("Location %d:  %s" %
-              (len(self.per_level_item_location_lists[level_num]),location.ToString()))
+    if not self.quiet and log.getLogger().isEnabledFor(log.DEBUG):
+      log.debug("Location %d:  %s",
+                len(self.per_level_item_location_lists[level_num]), location.ToString())
     
     if item_num in [Item.MAP, Item.COMPASS, Item.TRIFORCE, Item.HEART_CONTAINER]:
       return
@@ -170,18 +191,24 @@ class ItemShuffler():
       #  item_num = Item.WOODEN_BOOMERANG
 
     self.item_num_list.append(item_num)
-    log.debug("Item #%d: %s. From %s" % (len(self.item_num_list), item_num, location.ToString()))
+    if not self.quiet and log.getLogger().isEnabledFor(log.DEBUG):
+      log.debug("Item #%d: %s. From %s", len(self.item_num_list), item_num, location.ToString())
+
+  def _GetLevelSpecificItems(self, level_num: LevelNum) -> List[Item]:
+    items: List[Item] = []
+    # Levels 1-8 get a tringle, map, and compass.  Level 9 only gets a map and compass.
+    if level_num in Range.VALID_LEVEL_NUMBERS and self.flags.shuffle_minor_dungeon_items:
+      items.extend([Item.MAP, Item.COMPASS])
+    if level_num in range(1, 9):
+      items.append(Item.TRIFORCE)
+      items.append(Item.HEART_CONTAINER)
+    return items
 
   def ShuffleItems(self) -> None:
     self.item_num_list.append(Item.HEART_CONTAINER)
-    shuffle(self.item_num_list)
+    self.rng.shuffle(self.item_num_list)
     for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS:
-      # Levels 1-8 get a tringle, map, and compass.  Level 9 only gets a map and compass.
-      if level_num in Range.VALID_LEVEL_NUMBERS and self.flags.shuffle_minor_dungeon_items:
-        self.per_level_item_lists[level_num] = [Item.MAP, Item.COMPASS]
-      if level_num in range(1, 9):
-        self.per_level_item_lists[level_num].append(Item.TRIFORCE)
-        self.per_level_item_lists[level_num].append(Item.HEART_CONTAINER)
+      self.per_level_item_lists[level_num] = self._GetLevelSpecificItems(level_num)
 
       num_locations_needing_an_item = len(self.per_level_item_location_lists[level_num]) - len(
           self.per_level_item_lists[level_num])
@@ -191,17 +218,38 @@ class ItemShuffler():
         num_locations_needing_an_item = num_locations_needing_an_item - 1
 
       if level_num in range(1, 10):  # Technically this could be for OW and caves too
-        shuffle(self.per_level_item_lists[level_num])
+        self.rng.shuffle(self.per_level_item_lists[level_num])
     assert not self.item_num_list
 
+  def FillItems(self, data_table: DataTable, validator: Validator) -> bool:
+    self.item_num_list.append(Item.HEART_CONTAINER)
+    level_items: Dict[LevelNum, List[Item]] = {
+        level_num: self._GetLevelSpecificItems(level_num)
+        for level_num in Range.VALID_LEVEL_AND_CAVE_NUMBERS
+    }
+    item_lists = AssumedFill(data_table, self.flags, validator, self.rng).Fill(
+        self.per_level_item_location_lists, self.item_num_list, level_items)
+    if item_lists is None:
+      return False
+    self.item_num_list.clear()
+    self.per_level_item_lists.clear()
+    self.per_level_item_lists.update(item_lists)
+    return True
+
   def HasValidItemConfiguration(self):
+    self.rejection_reason = None
+    self.rejected_location_and_item = None
     for level_num in range(0, 11):
       for location, item in zip(self.per_level_item_location_lists[level_num],
                                     self.per_level_item_lists[level_num]):
         if (self.flags.progressive_items and location.IsShopPosition() and
             item.IsProgressiveUpgradeItem()):
+            self.rejection_reason = REJECTION_PROGRESSIVE_ITEM_IN_SHOP
+            self.rejected_location_and_item = (location, item)
             return False
         if location.IsCavePosition() and location.GetCaveNum() == 0x25 and item == Item.LADDER:
+            self.rejection_reason = REJECTION_LADDER_IN_CAVE_25
+            self.rejected_location_and_item = (location, item)
             return False
     return True   
 
@@ -0,0 +1,179 @@
+from typing import Dict, List, Optional, Set, Tuple
+import logging as log
+
+from .constants import Direction, Enemy, LevelNum, Range, RoomNum, RoomType, WallType
+from .room import Room
+
+# What it takes to go through an exit, as bits that can be combined.
+EXIT_NEEDS_LADDER = 0x01
+EXIT_NEEDS_BAIT = 0x02
+# Shutter doors open once the enemies in the room are defeated ...
+EXIT_NEEDS_ENEMIES_DEFEATED = 0x04
+# ... except for the one in front of the kidnapped, which opens once the beast is defeated.
+EXIT_NEEDS_BEAST_DEFEATED = 0x08
+
+# An (exit direction, room number on the other side, EXIT_NEEDS_* bits) tuple.
+Exit = Tuple[Direction, int, int]
+
+
+class LevelGraph():
+  """How the rooms of a level connect to each other.
+
+  This only depends on the level layout, which never changes while generating seeds, so it's
+  worked out once and then walked by both the item randomizer and the validator.  Exits are worked
+  out the first time they're asked for, since which ones can be taken depends on the direction a
+  room was entered from.
+  """
+
+  def __init__(self, level_num: LevelNum, rooms: List[Room], start_room_num: RoomNum,
+               staircase_room_nums: List[RoomNum], visited_room_nums: Set[RoomNum]) -> None:
+    """rooms is the whole grid the level is in, indexed by room number.
+
+    visited_room_nums is shared between the levels of a grid, so that a room only belongs to the
+    first of them to reach it.
+    """
+    self.level_num = level_num
+    self.rooms = rooms
+    self.staircase_room_nums = staircase_room_nums
+    # The staircase room (item or transport) reached by going down the stairs in each room.
+    self.room_staircases: Dict[RoomNum, RoomNum] = {}
+    for staircase_room_num in staircase_room_nums:
+      self._ParseStaircaseRoom(staircase_room_num)
+    # Every room in the level, in the order that a depth-first search from the entrance finds them.
+    self.room_nums: List[RoomNum] = []
+    self._FindRoomsRecursively(start_room_num, visited_room_nums)
+    self.neighbors: Dict[RoomNum, List[Exit]] = {}
+    self.exits: Dict[Tuple[RoomNum, Direction], List[Exit]] = {}
+    self.stairways: Dict[RoomNum, Tuple[List[RoomNum], Optional[RoomNum]]] = {}
+
+  def _ParseStaircaseRoom(self, staircase_room_num: RoomNum) -> None:
+    staircase_room = self.rooms[staircase_room_num]
+    if staircase_room.GetType() == RoomType.ITEM_STAIRCASE:
+      log.debug("  Found item staircase %x in L%d ", staircase_room_num, self.level_num)
+      assert staircase_room.GetLeftExit() == staircase_room.GetRightExit()
+      self.room_staircases[staircase_room.GetLeftExit()] = staircase_room_num
+    elif staircase_room.GetType() == RoomType.TRANSPORT_STAIRCASE:
+      log.debug("  Found transport staircase %x in L%d ", staircase_room_num, self.level_num)
+      assert staircase_room.GetLeftExit() != staircase_room.GetRightExit()
+      for associated_room_num in [staircase_room.GetLeftExit(), staircase_room.GetRightExit()]:
+        self.room_staircases[associated_room_num] = staircase_room_num
+    else:
+      log.fatal("Room in staircase room number list (%x) didn't have staircase type (%x).",
+                staircase_room_num, staircase_room.GetType())
+
+  def _FindRoomsRecursively(self, room_num: int, visited_room_nums: Set[RoomNum]) -> None:
+    if room_num not in Range.VALID_ROOM_NUMBERS:
+      return  # No escaping back into the overworld! :)
+    if room_num in visited_room_nums:
+      return
+    visited_room_nums.add(RoomNum(room_num))
+    self.room_nums.append(RoomNum(room_num))
+
+    room = self.rooms[room_num]
+    # Staircase cases (bad pun intended)
+    if room.GetType() == RoomType.ITEM_STAIRCASE:
+      return  # Dead end, no need to traverse further.
+    elif room.GetType() == RoomType.TRANSPORT_STAIRCASE:
+      for upstairs_room in [room.GetLeftExit(), room.GetRightExit()]:
+        self._FindRoomsRecursively(upstairs_room, visited_room_nums)
+      return
+    # Regular (non-staircase) room case.  Check all four cardinal directions, plus "down".
+    for direction in (Direction.WEST, Direction.NORTH, Direction.EAST, Direction.SOUTH):
+      if room.GetWallType(direction) != WallType.SOLID_WALL:
+        self._FindRoomsRecursively(room_num + direction, visited_room_nums)
+    if room_num in self.room_staircases:
+      self._FindRoomsRecursively(self.room_staircases[room_num], visited_room_nums)
+
+  def GetRoomNums(self) -> List[RoomNum]:
+    return self.room_nums
+
+  def GetRoomStaircases(self) -> Dict[RoomNum, RoomNum]:
+    return self.room_staircases
+
+  def GetNeighbors(self, room_num: RoomNum) -> List[Exit]:
+    """Returns the exits out of a room that aren't walled off, ignoring anything inside the room."""
+    if room_num not in self.neighbors:
+      self.neighbors[room_num] = self._FindNeighbors(room_num)
+    return self.neighbors[room_num]
+
+  def _FindNeighbors(self, room_num: RoomNum) -> List[Exit]:
+    room = self.rooms[room_num]
+    neighbors: List[Exit] = []
+    for direction in (Direction.WEST, Direction.NORTH, Direction.EAST, Direction.SOUTH):
+      wall_type = room.GetWallType(direction)
+      next_room_num = room_num + direction
+      needs = 0
+      # Hungry goriya room doesn't have a closed shutter door.  So need a special check to similate
+      # how it's not possible to move up in the room until the goriya has been properly fed.
+      if direction == Direction.NORTH and room.HasHungryGoriya():
+        needs |= EXIT_NEEDS_BAIT
+      if (wall_type == WallType.SHUTTER_DOOR and self.level_num == 9 and
+          next_room_num in Range.VALID_ROOM_NUMBERS and
+          self.rooms[next_room_num].GetEnemy() == Enemy.THE_KIDNAPPED):
+        needs |= EXIT_NEEDS_BEAST_DEFEATED
+      elif wall_type == WallType.SOLID_WALL:
+        continue
+      elif wall_type == WallType.SHUTTER_DOOR:
+        needs |= EXIT_NEEDS_ENEMIES_DEFEATED
+      neighbors.append((direction, next_room_num, needs))
+    return neighbors
+
+  def GetExits(self, room_num: RoomNum, entry_direction: Direction) -> List[Exit]:
+    """Returns the exits that might be taken after entering a room from the given direction."""
+    key = (room_num, entry_direction)
+    if key not in self.exits:
+      room = self.rooms[room_num]
+      exits: List[Exit] = []
+      for (direction, next_room_num, needs) in self.GetNeighbors(room_num):
+        if room.PathUnconditionallyObstructed(entry_direction, direction):
+          continue
+        if room.PathObstructedByWater(entry_direction, direction, False):
+          needs |= EXIT_NEEDS_LADDER
+        exits.append((direction, next_room_num, needs))
+      self.exits[key] = exits
+    return self.exits[key]
+
+  def GetStairways(self, room_num: RoomNum) -> Tuple[List[RoomNum], Optional[RoomNum]]:
+    """Returns where the stairs in a room lead, if it has any.
+
+    That's the item staircases whose items can be picked up from the room, and the room that a
+    transport staircase leads to (or None).
+    """
+    if room_num not in self.stairways:
+      self.stairways[room_num] = self._FindStairways(room_num)
+    return self.stairways[room_num]
+
+  def _FindStairways(self, room_num: RoomNum) -> Tuple[List[RoomNum], Optional[RoomNum]]:
+    item_staircase_room_nums: List[RoomNum] = []
+    if not self._HasStairway(self.rooms[room_num]):
+      return (item_staircase_room_nums, None)
+    for stairway_room_num in self.staircase_room_nums:
+      stairway_room = self.rooms[stairway_room_num]
+      left_exit = stairway_room.GetLeftExit()
+      right_exit = stairway_room.GetRightExit()
+      if left_exit == room_num and right_exit == room_num:
+        item_staircase_room_nums.append(stairway_room_num)
+      # Stop looking for additional staircases after finding a transport staircase.
+      elif left_exit == room_num and right_exit != room_num:
+        return (item_staircase_room_nums, right_exit)
+      elif right_exit == room_num and left_exit != room_num:
+        return (item_staircase_room_nums, left_exit)
+    return (item_staircase_room_nums, None)
+
+  def _HasStairway(self, room: Room) -> bool:
+    room_type = room.GetType()
+
+    # Spiral Stair, Narrow Stair, and Diamond Stair rooms always have a staircase
+    if room_type.HasOpenStaircase():
+      return True
+
+    # Check if there are any shutter doors in this room. If so, they'll open when a middle
+    # row pushblock is pushed instead of a stairway appearing
+    for direction in [Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST]:
+      if room.GetWallType(direction) == WallType.SHUTTER_DOOR:
+        return False
+
+    # Check if "Movable block" bit is set in a room_type that has a middle row pushblock
+    if room_type.CanHavePushBlock() and room.HasMovableBlockBitSet():
+      return True
+    return False
@@ -1,13 +1,60 @@
 # Taken with love from Dorkmaster Flek's SMRPG Randomizer
 
-from typing import List, Dict
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Tuple, Union
 import hashlib
+import zlib
+
+IPS_HEADER = b'PATCH'
+IPS_FOOTER = b'EOF'
+IPS_MAX_ADDRESS = 0xFFFFFF
+IPS_MAX_RECORD_SIZE = 0xFFFF
+BPS_HEADER = b'BPS1'
+BPS_SOURCE_READ = 0
+BPS_TARGET_READ = 1
+BPS_SOURCE_COPY = 2
+BPS_TARGET_COPY = 3
+BINARY_HEADER = b'ZRP1'
+
+
+def _EncodeVarint(value: int) -> bytes:
+  """Encodes a number the way BPS does: 7 bits per byte, with the high bit marking the last byte."""
+  encoded = bytearray()
+  while True:
+    low_bits = value & 0x7F
+    value >>= 7
+    if value == 0:
+      encoded.append(0x80 | low_bits)
+      return bytes(encoded)
+    encoded.append(low_bits)
+    value -= 1
+
+
+def _DecodeVarint(data: bytes, offset: int) -> Tuple[int, int]:
+  """Returns the number encoded at offset along with the offset just past it."""
+  value = 0
+  shift = 1
+  while True:
+    if offset >= len(data):
+      raise ValueError("Truncated number in patch data")
+    byte = data[offset]
+    offset += 1
+    value += (byte & 0x7F) * shift
+    if byte & 0x80:
+      return (value, offset)
+    shift <<= 7
+    value += shift
 
 
 class Patch:
-  """Class representing a patch for a specific seed that can be added to as we build it."""
+  """Class representing a patch for a specific seed that can be added to as we build it.
+
+  The patch is stored as non-overlapping runs of contiguous bytes keyed by their start address.
+  Writes that touch or overlap an existing run are merged into it, with the newest data winning.
+  """
 
   def __init__(self) -> None:
+    self._starts: List[int] = []
     self._data: Dict[int, bytes] = {}
 
   def __add__(self, other):
@@ -26,33 +73,29 @@ class Patch:
       raise TypeError("Other object is not Patch type")
 
     for addr in other.addresses:
-      self.AddData(addr, other.GetData(addr))
+      self.AddData(addr, other._data[addr])
 
     return self
 
   @property
   def addresses(self):
     """
-        :return: List of all addresses in the patch.
+        :return: List of the start addresses of all runs in the patch.
         :rtype: list[int]
         """
-    return list(self._data.keys())
+    return list(self._starts)
 
   def GetAddresses(self) -> List[int]:
-    """Returns a List of all addresses in the patch."""
-    return list(self._data.keys())
+    """Returns a sorted List of the start addresses of all runs in the patch."""
+    return list(self._starts)
 
   def GetData(self, addr: int) -> List[int]:
-    """Get data in the patch for this address.  
-       If the address is not present in the patch, returns empty bytes.
+    """Get data in the patch for the run starting at this address.
         :param addr: Address for the start of the data.
         :type addr: int
-        :rtype: bytearray|bytes|list[int]
+        :rtype: list[int]
         """
-    int_data: List[int] = []
-    for byte in self._data[addr]:
-      int_data.append(byte)
-    return int_data
+    return list(self._data[addr])
 
   def AddData(self, addr: int, data: List[int]) -> None:
     """Add data to the patch.
@@ -61,15 +104,46 @@ class Patch:
         :param data: Patch data as raw bytes.
         :type data: bytearray|bytes|list[int]|int|str
         """
-    self._data[addr] = bytes(data)
+    data = bytes(data)
+    if not data:
+      return
+    end = addr + len(data)
+
+    # Find the runs that overlap or are adjacent to the new data.
+    first = bisect_right(self._starts, addr) - 1
+    if first < 0 or self._starts[first] + len(self._data[self._starts[first]]) < addr:
+      first += 1
+    last = bisect_right(self._starts, end)
+    if first == last:
+      self._starts.insert(first, addr)
+      self._data[addr] = data
+      return
+
+    merged_start = min(addr, self._starts[first])
+    last_start = self._starts[last - 1]
+    merged_end = max(end, last_start + len(self._data[last_start]))
+    merged_data = bytearray(merged_end - merged_start)
+    for start in self._starts[first:last]:
+      run = self._data.pop(start)
+      merged_data[start - merged_start:start - merged_start + len(run)] = run
+    merged_data[addr - merged_start:end - merged_start] = data
+    self._starts[first:last] = [merged_start]
+    self._data[merged_start] = bytes(merged_data)
 
   def RemoveData(self, addr: int) -> None:
-    """Remove data from the patch.
-        :param addr: Address the data was added to.
+    """Remove the run of data starting at an address from the patch.
+        :param addr: Start address of the run.
         :type addr: int
         """
     if addr in self._data:
       del self._data[addr]
+      del self._starts[bisect_left(self._starts, addr)]
+
+  def Apply(self, rom: Union[bytearray, memoryview]) -> None:
+    """Write the patch into a ROM image in place, with one slice assignment per run."""
+    for addr in self._starts:
+      data = self._data[addr]
+      rom[addr:addr + len(data)] = data
 
   def for_json(self):
     """Return patch as a JSON serializable object.
@@ -77,21 +151,184 @@ class Patch:
         :rtype: list[dict]
         """
     patch = []
-    addrs = list(self._data.keys())
-    addrs.sort()
-
-    for addr in addrs:
+    for addr in self._starts:
       patch.append({addr: self._data[addr]})
 
     return patch
 
+  def ToIps(self) -> bytes:
+    """Returns the patch in IPS format."""
+    ips = bytearray(IPS_HEADER)
+    for addr in self._starts:
+      data = self._data[addr]
+      for offset in range(0, len(data), IPS_MAX_RECORD_SIZE):
+        record_addr = addr + offset
+        if record_addr > IPS_MAX_ADDRESS:
+          raise ValueError("Address %x is too large for an IPS patch" % record_addr)
+        if record_addr.to_bytes(3, 'big') == IPS_FOOTER:
+          raise ValueError("Address %x can't be written in an IPS patch" % record_addr)
+        record_data = data[offset:offset + IPS_MAX_RECORD_SIZE]
+        ips += record_addr.to_bytes(3, 'big')
+        ips += len(record_data).to_bytes(2, 'big')
+        ips += record_data
+    ips += IPS_FOOTER
+    return bytes(ips)
+
+  @classmethod
+  def FromIps(cls, ips: bytes) -> 'Patch':
+    """Reads a patch in IPS format, including run-length encoded records."""
+    if ips[:len(IPS_HEADER)] != IPS_HEADER:
+      raise ValueError("Not an IPS patch")
+    patch = cls()
+    offset = len(IPS_HEADER)
+    while ips[offset:offset + len(IPS_FOOTER)] != IPS_FOOTER:
+      if offset + 5 > len(ips):
+        raise ValueError("Truncated IPS patch")
+      addr = int.from_bytes(ips[offset:offset + 3], 'big')
+      size = int.from_bytes(ips[offset + 3:offset + 5], 'big')
+      offset += 5
+      if size == 0:
+        if offset + 3 > len(ips):
+          raise ValueError("Truncated IPS patch")
+        run_length = int.from_bytes(ips[offset:offset + 2], 'big')
+        patch.AddData(addr, bytes([ips[offset + 2]]) * run_length)
+        offset += 3
+      else:
+        if offset + size > len(ips):
+          raise ValueError("Truncated IPS patch")
+        patch.AddData(addr, ips[offset:offset + size])
+        offset += size
+    return patch
+
+  def ToBps(self, source: bytes) -> bytes:
+    """Returns the patch in BPS format, which needs the ROM it will be applied to."""
+    source = bytes(source)
+    if self._starts:
+      last_start = self._starts[-1]
+      if last_start + len(self._data[last_start]) > len(source):
+        raise ValueError("Patch writes past the end of the source ROM")
+    target = bytearray(source)
+    self.Apply(target)
+
+    bps = bytearray(BPS_HEADER)
+    bps += _EncodeVarint(len(source))
+    bps += _EncodeVarint(len(target))
+    bps += _EncodeVarint(0)  # No metadata
+    output_offset = 0
+    for addr in self._starts + [len(target)]:
+      if addr > output_offset:
+        bps += _EncodeVarint(((addr - output_offset - 1) << 2) | BPS_SOURCE_READ)
+        output_offset = addr
+      if addr < len(target):
+        data = self._data[addr]
+        bps += _EncodeVarint(((len(data) - 1) << 2) | BPS_TARGET_READ)
+        bps += data
+        output_offset += len(data)
+    bps += zlib.crc32(source).to_bytes(4, 'little')
+    bps += zlib.crc32(target).to_bytes(4, 'little')
+    bps += zlib.crc32(bps).to_bytes(4, 'little')
+    return bytes(bps)
+
+  @classmethod
+  def FromBps(cls, bps: bytes, source: bytes) -> 'Patch':
+    """Reads a patch in BPS format, given the ROM it applies to.
+
+    The returned patch contains the runs of bytes that differ between the source and the target.
+    """
+    bps = bytes(bps)
+    source = bytes(source)
+    if bps[:len(BPS_HEADER)] != BPS_HEADER or len(bps) < len(BPS_HEADER) + 12:
+      raise ValueError("Not a BPS patch")
+    if zlib.crc32(bps[:-4]) != int.from_bytes(bps[-4:], 'little'):
+      raise ValueError("BPS patch is corrupt")
+    if zlib.crc32(source) != int.from_bytes(bps[-12:-8], 'little'):
+      raise ValueError("BPS patch is for a different ROM")
+
+    offset = len(BPS_HEADER)
+    (source_size, offset) = _DecodeVarint(bps, offset)
+    (target_size, offset) = _DecodeVarint(bps, offset)
+    (metadata_size, offset) = _DecodeVarint(bps, offset)
+    offset += metadata_size
+    if source_size != len(source):
+      raise ValueError("BPS patch is for a different ROM")
+    if target_size < source_size:
+      raise ValueError("BPS patches that shrink the ROM aren't supported")
+
+    target = bytearray()
+    source_relative_offset = 0
+    target_relative_offset = 0
+    while offset < len(bps) - 12:
+      (command, offset) = _DecodeVarint(bps, offset)
+      action = command & 0x03
+      length = (command >> 2) + 1
+      if action == BPS_SOURCE_READ:
+        target += source[len(target):len(target) + length]
+      elif action == BPS_TARGET_READ:
+        target += bps[offset:offset + length]
+        offset += length
+      else:
+        (relative_offset, offset) = _DecodeVarint(bps, offset)
+        relative_offset = (-1 if relative_offset & 1 else 1) * (relative_offset >> 1)
+        if action == BPS_SOURCE_COPY:
+          source_relative_offset += relative_offset
+          target += source[source_relative_offset:source_relative_offset + length]
+          source_relative_offset += length
+        else:
+          target_relative_offset += relative_offset
+          # The copied region can overlap the bytes being written, so copy one byte at a time.
+          for _ in range(length):
+            target.append(target[target_relative_offset])
+            target_relative_offset += 1
+    if len(target) != target_size or zlib.crc32(target) != int.from_bytes(bps[-8:-4], 'little'):
+      raise ValueError("BPS patch produced the wrong output")
+
+    patch = cls()
+    run_start = None
+    for addr in range(0, target_size + 1):
+      is_changed = addr < target_size and (addr >= source_size or target[addr] != source[addr])
+      if is_changed and run_start is None:
+        run_start = addr
+      elif not is_changed and run_start is not None:
+        patch.AddData(run_start, target[run_start:addr])
+        run_start = None
+    return patch
+
+  def ToBytes(self) -> bytes:
+    """Returns a compact binary form of the patch's runs, readable with FromBytes."""
+    data = bytearray(BINARY_HEADER)
+    previous_end = 0
+    for addr in self._starts:
+      run = self._data[addr]
+      data += _EncodeVarint(addr - previous_end)
+      data += _EncodeVarint(len(run))
+      data += run
+      previous_end = addr + len(run)
+    return bytes(data)
+
+  @classmethod
+  def FromBytes(cls, data: bytes) -> 'Patch':
+    if data[:len(BINARY_HEADER)] != BINARY_HEADER:
+      raise ValueError("Not a binary patch")
+    patch = cls()
+    offset = len(BINARY_HEADER)
+    previous_end = 0
+    while offset < len(data):
+      (gap, offset) = _DecodeVarint(data, offset)
+      (length, offset) = _DecodeVarint(data, offset)
+      if offset + length > len(data):
+        raise ValueError("Truncated binary patch")
+      addr = previous_end + gap
+      patch.AddData(addr, data[offset:offset + length])
+      offset += length
+      previous_end = addr + length
+    return patch
+
   def GetHashCode(self) -> bytes:
     to_be_returned = b''
     hash_string = hashlib.sha224()
-    for address in self._data.keys():
+    for address in self._starts:
       hash_string.update(str(address).encode('utf-8'))
       hash_string.update(self._data[address])
     for int_of_hash in hash_string.digest()[0:4]:
       to_be_returned += bytes([int_of_hash & 0x1F])
     return to_be_returned
-
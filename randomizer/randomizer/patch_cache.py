@@ -0,0 +1,124 @@
+import abc
+from collections import OrderedDict
+import hashlib
+import logging as log
+import os
+import tempfile
+from typing import Optional
+
+from .flags import Flags
+from .patch import Patch
+
+PATCH_FILE_EXTENSION = '.zrp'
+# Part of every cache and seed pool key, so that patches made by older code aren't handed out.
+# Bump this whenever a change to item placement, validation or patch building changes the patch
+# generated for a (ROM, seed, flags).
+LOGIC_VERSION = 1
+
+
+class PatchCache(abc.ABC):
+  """Stores generated patches so that the same (ROM, seed, flags) never has to be generated twice.
+
+  Patches are looked up by the key returned by GetKey.  Subclasses provide the storage.
+  """
+
+  @staticmethod
+  def GetKey(rom_sha1: str, seed: int, flags: Flags, placement: str = 'sampler') -> str:
+    key = 'v%d-%s-%d-%s' % (LOGIC_VERSION, rom_sha1, seed, flags.ToFlagString())
+    # Other ways of placing items give different results for the same seed.
+    if placement != 'sampler':
+      key += '-' + placement
+    return key
+
+  @staticmethod
+  def GetRomSha1(rom_data: bytes) -> str:
+    return hashlib.sha1(rom_data).hexdigest()
+
+  @abc.abstractmethod
+  def Get(self, key: str) -> Optional[Patch]:
+    """Returns the patch stored under the key, or None if there isn't one."""
+
+  @abc.abstractmethod
+  def Put(self, key: str, patch: Patch) -> None:
+    """Stores the patch under the key, replacing any patch already there."""
+
+
+class MemoryPatchCache(PatchCache):
+  """Keeps up to max_entries patches in memory, evicting the least recently used."""
+
+  def __init__(self, max_entries: int = 256) -> None:
+    self.max_entries = max_entries
+    self.patches: OrderedDict = OrderedDict()
+
+  def Get(self, key: str) -> Optional[Patch]:
+    if key not in self.patches:
+      return None
+    self.patches.move_to_end(key)
+    # Hand out a copy so callers adding to the patch don't change the cached one.
+    return Patch() + self.patches[key]
+
+  def Put(self, key: str, patch: Patch) -> None:
+    self.patches[key] = Patch() + patch
+    self.patches.move_to_end(key)
+    while len(self.patches) > self.max_entries:
+      self.patches.popitem(last=False)
+
+
+class DiskPatchCache(PatchCache):
+  """Keeps patches as files in a directory, evicting the least recently used past max_bytes.
+
+  A file's modification time is bumped whenever it's read, so it doubles as the last use time.
+  """
+
+  def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024) -> None:
+    self.directory = directory
+    self.max_bytes = max_bytes
+    os.makedirs(directory, exist_ok=True)
+
+  def _GetFilename(self, key: str) -> str:
+    return os.path.join(self.directory, key + PATCH_FILE_EXTENSION)
+
+  def Get(self, key: str) -> Optional[Patch]:
+    filename = self._GetFilename(key)
+    try:
+      with open(filename, 'rb') as f:
+        data = f.read()
+      os.utime(filename)
+    except FileNotFoundError:
+      return None
+    try:
+      return Patch.FromBytes(data)
+    except ValueError:
+      log.warning("Ignoring corrupt cached patch %s" % filename)
+      return None
+
+  def Put(self, key: str, patch: Patch) -> None:
+    # Write to a temporary file first so that other processes never see a partial patch.
+    (fd, temp_filename) = tempfile.mkstemp(dir=self.directory)
+    with os.fdopen(fd, 'wb') as f:
+      f.write(patch.ToBytes())
+    os.replace(temp_filename, self._GetFilename(key))
+    self._EvictOldPatches()
+
+  def _EvictOldPatches(self) -> None:
+    entries = []
+    total_bytes = 0
+    with os.scandir(self.directory) as dir_entries:
+      for entry in dir_entries:
+        if not entry.name.endswith(PATCH_FILE_EXTENSION):
+          continue
+        try:
+          stat = entry.stat()
+        except FileNotFoundError:
+          continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_bytes += stat.st_size
+    entries.sort()
+    for (_, size, path) in entries:
+      if total_bytes <= self.max_bytes:
+        break
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+      total_bytes -= size
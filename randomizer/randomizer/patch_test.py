@@ -0,0 +1,146 @@
+import zlib
+
+from absl.testing import absltest
+
+from .patch import (BPS_HEADER, BPS_TARGET_READ, IPS_FOOTER, IPS_HEADER, IPS_MAX_RECORD_SIZE,
+                    Patch, _EncodeVarint)
+
+
+def _MakePatch(runs):
+  patch = Patch()
+  for (addr, data) in runs:
+    patch.AddData(addr, data)
+  return patch
+
+
+def _GetRuns(patch):
+  return [(addr, patch.GetData(addr)) for addr in patch.GetAddresses()]
+
+
+class AddDataTest(absltest.TestCase):
+
+  def testSeparateRunsStaySeparate(self):
+    patch = _MakePatch([(0x20, [4]), (0x10, [1, 2])])
+    self.assertEqual([(0x10, [1, 2]), (0x20, [4])], _GetRuns(patch))
+
+  def testAdjacentRunsAreMerged(self):
+    patch = _MakePatch([(0x10, [1, 2]), (0x12, [3]), (0x0F, [0])])
+    self.assertEqual([(0x0F, [0, 1, 2, 3])], _GetRuns(patch))
+
+  def testOverlappingWriteWins(self):
+    patch = _MakePatch([(0x10, [1, 2, 3, 4]), (0x11, [9, 9])])
+    self.assertEqual([(0x10, [1, 9, 9, 4])], _GetRuns(patch))
+
+  def testWriteBridgesSeveralRuns(self):
+    patch = _MakePatch([(0x10, [1]), (0x13, [2]), (0x16, [3]), (0x30, [4]), (0x11, [5] * 5)])
+    self.assertEqual([(0x10, [1, 5, 5, 5, 5, 5, 3]), (0x30, [4])], _GetRuns(patch))
+
+  def testEmptyWriteIsIgnored(self):
+    patch = _MakePatch([(0x10, [])])
+    self.assertEqual([], _GetRuns(patch))
+
+
+class IpsTest(absltest.TestCase):
+
+  def testRoundTrip(self):
+    patch = _MakePatch([(0x0, [1]), (0x1234, [2, 3, 4]), (0x10000, bytes(range(256)) * 300)])
+    ips = patch.ToIps()
+    self.assertEqual(IPS_HEADER, ips[:len(IPS_HEADER)])
+    self.assertEqual(IPS_FOOTER, ips[-len(IPS_FOOTER):])
+    self.assertEqual(_GetRuns(patch), _GetRuns(Patch.FromIps(ips)))
+
+  def testLongRunIsSplitIntoRecords(self):
+    patch = _MakePatch([(0x100, [7] * (IPS_MAX_RECORD_SIZE + 10))])
+    ips = patch.ToIps()
+    second_record = len(IPS_HEADER) + 5 + IPS_MAX_RECORD_SIZE
+    self.assertEqual((0x100 + IPS_MAX_RECORD_SIZE).to_bytes(3, 'big'),
+                     ips[second_record:second_record + 3])
+    self.assertEqual(_GetRuns(patch), _GetRuns(Patch.FromIps(ips)))
+
+  def testReadsRunLengthEncodedRecord(self):
+    ips = (IPS_HEADER + (0x20).to_bytes(3, 'big') + (2).to_bytes(2, 'big') + bytes([1, 2]) +
+           (0x22).to_bytes(3, 'big') + (0).to_bytes(2, 'big') + (5).to_bytes(2, 'big') +
+           bytes([0xAB]) + IPS_FOOTER)
+    patch = Patch.FromIps(ips)
+    self.assertEqual([(0x20, [1, 2] + [0xAB] * 5)], _GetRuns(patch))
+    self.assertEqual(_GetRuns(patch), _GetRuns(Patch.FromIps(patch.ToIps())))
+
+  def testRunStartingBeforeEofAddressRoundTrips(self):
+    eof_address = int.from_bytes(IPS_FOOTER, 'big')
+    patch = _MakePatch([(eof_address - 1, [1, 2, 3])])
+    self.assertEqual(_GetRuns(patch), _GetRuns(Patch.FromIps(patch.ToIps())))
+
+  def testWriteAtEofAddressIsRejected(self):
+    patch = _MakePatch([(int.from_bytes(IPS_FOOTER, 'big'), [1])])
+    with self.assertRaises(ValueError):
+      patch.ToIps()
+
+  def testTruncatedPatchIsRejected(self):
+    ips = _MakePatch([(0x10, [1, 2, 3])]).ToIps()
+    with self.assertRaises(ValueError):
+      Patch.FromIps(ips[:-len(IPS_FOOTER) - 1])
+
+
+class BpsTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.source = bytes(range(256)) * 16
+
+  def testRoundTrip(self):
+    patch = _MakePatch([(0x0, [0xFF]), (0x10, [0xEE, 0xDD]), (len(self.source) - 1, [0x00])])
+    bps = patch.ToBps(self.source)
+    self.assertEqual(_GetRuns(patch), _GetRuns(Patch.FromBps(bps, self.source)))
+
+  def testEmptyPatchRoundTrips(self):
+    self.assertEqual([], _GetRuns(Patch.FromBps(Patch().ToBps(self.source), self.source)))
+
+  def testUnchangedBytesAreDropped(self):
+    patch = _MakePatch([(0x10, [0x10, 0x99, 0x12])])
+    self.assertEqual([(0x11, [0x99])],
+                     _GetRuns(Patch.FromBps(patch.ToBps(self.source), self.source)))
+
+  def testWriteBeyondSourceIsRejected(self):
+    with self.assertRaises(ValueError):
+      _MakePatch([(len(self.source), [1])]).ToBps(self.source)
+
+  def testReadsPatchThatGrowsTarget(self):
+    source = bytes([1, 2, 3, 4])
+    target = bytes([1, 9, 3, 4, 5, 6])
+    bps = bytearray(BPS_HEADER)
+    bps += _EncodeVarint(len(source)) + _EncodeVarint(len(target)) + _EncodeVarint(0)
+    bps += _EncodeVarint(((len(target) - 1) << 2) | BPS_TARGET_READ) + target
+    bps += zlib.crc32(source).to_bytes(4, 'little') + zlib.crc32(target).to_bytes(4, 'little')
+    bps += zlib.crc32(bps).to_bytes(4, 'little')
+    patch = Patch.FromBps(bytes(bps), source)
+    self.assertEqual([(0x1, [9]), (0x4, [5, 6])], _GetRuns(patch))
+
+  def testWrongSourceIsRejected(self):
+    bps = _MakePatch([(0x10, [0])]).ToBps(self.source)
+    with self.assertRaises(ValueError):
+      Patch.FromBps(bps, bytes(len(self.source)))
+
+  def testCorruptPatchIsRejected(self):
+    bps = bytearray(_MakePatch([(0x10, [0])]).ToBps(self.source))
+    bps[len(BPS_HEADER) + 4] ^= 0xFF
+    with self.assertRaises(ValueError):
+      Patch.FromBps(bytes(bps), self.source)
+
+
+class BytesTest(absltest.TestCase):
+
+  def testRoundTrip(self):
+    patch = _MakePatch([(0x0, [1]), (0x7F, [2, 3]), (0x454F46, [4]), (0x1000000, [5] * 200)])
+    self.assertEqual(_GetRuns(patch), _GetRuns(Patch.FromBytes(patch.ToBytes())))
+
+  def testEmptyPatchRoundTrips(self):
+    self.assertEqual([], _GetRuns(Patch.FromBytes(Patch().ToBytes())))
+
+  def testTruncatedPatchIsRejected(self):
+    data = _MakePatch([(0x10, [1, 2, 3])]).ToBytes()
+    with self.assertRaises(ValueError):
+      Patch.FromBytes(data[:-1])
+
+
+if __name__ == '__main__':
+  absltest.main()
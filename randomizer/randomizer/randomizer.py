@@ -2,15 +2,59 @@ import io
 import os
 import random
 
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from .batch_validator import BatchValidator
 from .data_table import DataTable
+from .generation_stats import (GenerationStats, STAGE_BUILD_PATCH, STAGE_READ_DATA, STAGE_SHUFFLE,
+                               STAGE_VALIDATE, STAGE_WRITE_ITEMS)
 from .item_randomizer import ItemRandomizer
 from .patch import Patch
+from .patch_cache import PatchCache
+from .rejection_profile import RejectionProfile
 from rom_reader import RomReader
 from .text_data_table import TextDataTable
 from .validator import Validator
 from .flags import Flags
 
+# Ways of placing items.  The sampler shuffles items blindly and tries again until the validator
+# accepts the result, while assumed fill only makes placements that keep the seed beatable.
+SAMPLER_PLACEMENT = 'sampler'
+ASSUMED_FILL_PLACEMENT = 'assumed_fill'
+PLACEMENTS = [SAMPLER_PLACEMENT, ASSUMED_FILL_PLACEMENT]
+
+# Rejection reasons for placements that aren't checked by the validator itself.
+REJECTION_ASSUMED_FILL_STUCK = 'assumed_fill_stuck'
+REJECTION_BATCH_VALIDATOR = 'batch_validator'
+
+
+class GenerationBudgetExceeded(Exception):
+  """Raised when a seed isn't found within the number of attempts or seconds it was given.
+
+  Carries how far generation got, including how many shuffles and placements were rejected for
+  each reason, so that whatever is running the seed can tell a stuck one from an unlucky one.
+  """
+
+  def __init__(self, seed: int, num_attempts: int, num_shuffle_retries: int,
+               elapsed_seconds: float, rejection_reasons: Dict[str, int]) -> None:
+    # Passed to Exception so that it can be pickled, e.g. out of a worker process.
+    super().__init__(seed, num_attempts, num_shuffle_retries, elapsed_seconds, rejection_reasons)
+    self.seed = seed
+    self.num_attempts = num_attempts
+    self.num_shuffle_retries = num_shuffle_retries
+    self.elapsed_seconds = elapsed_seconds
+    self.rejection_reasons = rejection_reasons
+
+  def GetMostCommonRejections(self, num_reasons: int = 3) -> List[Tuple[str, int]]:
+    return sorted(self.rejection_reasons.items(), key=lambda item: -item[1])[:num_reasons]
+
+  def __str__(self) -> str:
+    return ("Gave up on seed %d after %d attempts and %d shuffle retries in %.1f seconds. "
+            "Most common rejections: %s" %
+            (self.seed, self.num_attempts, self.num_shuffle_retries, self.elapsed_seconds,
+             ', '.join('%s (%d)' % rejection for rejection in self.GetMostCommonRejections())
+             or 'none'))
+
+
 class Z1Randomizer():
 #  def __init__(self) -> None:
 #    self.rom: Rom
@@ -22,36 +66,179 @@ class Z1Randomizer():
 #    self.seed = seed
 #    self.settings = settings
 
-  def __init__(self, rom_bytes: io.BytesIO, seed: int, flags: Flags) -> None:
+  def __init__(self,
+               rom_bytes: Union[io.BytesIO, bytes],
+               seed: int,
+               flags: Flags,
+               cache: Optional[PatchCache] = None,
+               quiet: bool = False,
+               placement: str = SAMPLER_PLACEMENT,
+               validation_batch_size: int = 1,
+               max_attempts: Optional[int] = None,
+               max_seconds: Optional[float] = None,
+               rejection_profile: Optional[RejectionProfile] = None) -> None:
+    assert placement in PLACEMENTS
+    assert validation_batch_size >= 1
     self.rom_reader = RomReader(rom_bytes)
     self.seed = seed
     self.flags = flags
+    self.cache = cache
+    # Quiet mode skips all of the per-room and per-item logging done while generating a seed.
+    self.quiet = quiet
+    self.placement = placement
+    # With the sampler, shuffles are checked this many at a time with a BatchValidator.  This
+    # doesn't change the patch, only how long it takes to find.
+    self.validation_batch_size = validation_batch_size
+    # Budgets for generating the seed, after which GenerationBudgetExceeded is raised.  Unlike the
+    # time budget, the attempt budget gives up at the same point every time for the same seed.
+    self.max_attempts = max_attempts
+    self.max_seconds = max_seconds
+    # If given, every rejected shuffle and placement is classified and counted in the profile.
+    # Placements rejected by the batch validator aren't, so profile with a batch size of 1.
+    self.rejection_profile = rejection_profile
+
+  def GenerateRom(self, patch: Optional[Patch] = None) -> bytearray:
+    """Returns a copy of the input ROM with this seed's patch applied.
+
+    The patch is generated unless one from an earlier call to GetPatch is passed in.
+    """
+    if patch is None:
+      patch = self.GetPatch()
+    rom = bytearray(self.rom_reader.GetRom())
+    patch.Apply(rom)
+    return rom
 
   def GetPatch(self) -> Patch:
-    random.seed(self.seed)
-    data_table = DataTable(self.rom_reader)
-    item_randomizer = ItemRandomizer(data_table, self.flags)
-    validator = Validator(data_table, self.flags)
-
-    # Main loop: Try a seed, if it isn't valid, try another one until it is valid.
-    is_valid_seed = False
-
-    num_iterations = 0
-    while not is_valid_seed:
-      seed = random.randint(0, 9999999999)
-      num_iterations += 1
+    """Raises GenerationBudgetExceeded if max_attempts or max_seconds run out first."""
+    return self.GetPatchWithStats()[0]
+
+  def GetPatchWithStats(
+      self,
+      stage_callback: Optional[Callable[[str, GenerationStats], None]] = None
+  ) -> Tuple[Patch, GenerationStats]:
+    """Returns the patch along with stats about how it was generated.
+
+    stage_callback, if given, is called with the stage name and the stats so far each time one of
+    the stages in generation_stats finishes.
+    """
+    stats = GenerationStats(stage_callback)
+    if self.cache is None:
+      return (self._GeneratePatch(stats), stats)
+    cache_key = PatchCache.GetKey(
+        PatchCache.GetRomSha1(self.rom_reader.GetRom()), self.seed, self.flags, self.placement)
+    patch = self.cache.Get(cache_key)
+    if patch is not None:
+      stats.cache_hit = True
+      return (patch, stats)
+    patch = self._GeneratePatch(stats)
+    self.cache.Put(cache_key, patch)
+    return (patch, stats)
+
+  def _GeneratePatch(self, stats: GenerationStats) -> Patch:
+    # Use a generator local to this call rather than the global one in the random module so that
+    # seeds can be generated concurrently and other code using random can't change the output.
+    rng = random.Random(self.seed)
+    with stats.TimeStage(STAGE_READ_DATA):
+      data_table = DataTable(self.rom_reader)
+      item_randomizer = ItemRandomizer(data_table, self.flags, rng, self.quiet)
+      validator = Validator(data_table, self.flags, self.quiet)
+
+    if self.placement == SAMPLER_PLACEMENT and self.validation_batch_size > 1:
+      self._PlaceItemsInBatches(rng, data_table, item_randomizer, validator, stats)
+    else:
+      # Main loop: Try a seed, if it isn't valid, try another one until it is valid.
+      is_valid_seed = False
+      while not is_valid_seed:
+        self._CheckBudget(stats)
+        self._PlaceItems(rng, data_table, item_randomizer, validator, stats)
+        stats.num_attempts += 1
+        is_valid_seed = self._WriteAndValidateItems(item_randomizer, validator, stats)
+    if not self.quiet:
+      print("Number of iterations: %d" % stats.num_attempts)
+    with stats.TimeStage(STAGE_BUILD_PATCH):
+      return self._BuildPatch(data_table, rng)
+
+  def _CheckBudget(self, stats: GenerationStats) -> None:
+    """Raises GenerationBudgetExceeded if there's no budget left for another attempt."""
+    if ((self.max_attempts is not None and stats.num_attempts >= self.max_attempts) or
+        (self.max_seconds is not None and stats.GetElapsedSeconds() > self.max_seconds)):
+      raise GenerationBudgetExceeded(self.seed, stats.num_attempts, stats.num_shuffle_retries,
+                                     stats.GetElapsedSeconds(), dict(stats.rejection_reasons))
+
+  def _PlaceItems(self, rng: random.Random, data_table: DataTable, item_randomizer: ItemRandomizer,
+                  validator: Validator, stats: GenerationStats) -> None:
+    seed = rng.randint(0, 9999999999)
+    with stats.TimeStage(STAGE_SHUFFLE):
       while True:
         data_table.ResetToVanilla()
         item_randomizer.ResetState()
         item_randomizer.ReadItemsAndLocationsFromTable()
-        item_randomizer.ShuffleItems()
-        if item_randomizer.HasValidItemConfiguration():
-          break
-      
+        if self.placement == ASSUMED_FILL_PLACEMENT:
+          if item_randomizer.PlaceItemsWithAssumedFill(validator):
+            break
+          stats.AddRejection(REJECTION_ASSUMED_FILL_STUCK)
+        else:
+          item_randomizer.ShuffleItems()
+          if item_randomizer.HasValidItemConfiguration():
+            break
+          stats.AddRejection(item_randomizer.GetRejectionReason())
+          if self.rejection_profile is not None:
+            self.rejection_profile.AddShuffleRejection(item_randomizer)
+        stats.num_shuffle_retries += 1
+        # Shuffles that always get rejected would otherwise never get as far as another attempt.
+        self._CheckBudget(stats)
+
+  def _WriteAndValidateItems(self, item_randomizer: ItemRandomizer, validator: Validator,
+                             stats: GenerationStats) -> bool:
+    with stats.TimeStage(STAGE_WRITE_ITEMS):
       item_randomizer.WriteItemsAndLocationsToTable()
+    with stats.TimeStage(STAGE_VALIDATE):
       is_valid_seed = validator.IsSeedValid()
+    stats.num_validator_iterations += validator.GetNumIterations()
+    if not is_valid_seed:
+      stats.AddRejection(validator.GetRejectionReason())
+      if self.rejection_profile is not None:
+        self.rejection_profile.AddValidatorRejection(validator)
+    return is_valid_seed
+
+  def _PlaceItemsInBatches(self, rng: random.Random, data_table: DataTable,
+                           item_randomizer: ItemRandomizer, validator: Validator,
+                           stats: GenerationStats) -> None:
+    """Does the same as the main loop in _GeneratePatch, but screens the shuffles in batches.
+
+    Only shuffles that the batch validator accepts go through the validator.  The random number
+    generator is wound back to before each of those, and the shuffle is redone, so the items end up
+    wherever checking the shuffles one at a time would have put them.
+    """
+    batch_validator: Optional[BatchValidator] = None
+    while True:
+      rng_states = []
+      placements = []
+      for _ in range(self.validation_batch_size):
+        self._CheckBudget(stats)
+        rng_states.append(rng.getstate())
+        self._PlaceItems(rng, data_table, item_randomizer, validator, stats)
+        placements.append(item_randomizer.GetPlacement())
+      next_batch_rng_state = rng.getstate()
+      if batch_validator is None:
+        # Nothing has been written to the data table yet, so it's still vanilla.
+        batch_validator = BatchValidator(data_table, self.flags, item_randomizer.GetLocations())
+      with stats.TimeStage(STAGE_VALIDATE):
+        are_valid = batch_validator.AreSeedsValid(placements)
+      for (rng_state, is_valid) in zip(rng_states, are_valid):
+        self._CheckBudget(stats)
+        stats.num_attempts += 1
+        if not is_valid:
+          stats.AddRejection(REJECTION_BATCH_VALIDATOR)
+          continue
+        rng.setstate(rng_state)
+        self._PlaceItems(rng, data_table, item_randomizer, validator, GenerationStats())
+        if self._WriteAndValidateItems(item_randomizer, validator, stats):
+          return
+      rng.setstate(next_batch_rng_state)
+
+  def _BuildPatch(self, data_table: DataTable, rng: random.Random) -> Patch:
     patch = data_table.GetPatch()
-    print("Number of iterations: %d" % num_iterations)
 
     if self.flags.progressive_items: # New progressive item code 
       patch.AddData(0x6D06, [0x18, 0x79, 0x57, 0x06, 0xEA])
@@ -113,7 +300,7 @@ class Z1Randomizer():
       ])
 
     if self.flags.randomize_level_text or self.flags.speed_up_text:
-      random_level_text = random.choice(
+      random_level_text = rng.choice(
           ['palace', 'house-', 'block-', 'random', 'cage_-', 'home_-', 'castle'])
       text_data_table = TextDataTable(
           "very_fast" if self.flags.speed_up_text else "normal", random_level_text
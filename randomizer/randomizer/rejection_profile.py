@@ -0,0 +1,84 @@
+import statistics
+from typing import Dict, List, Optional, Tuple
+
+from .generation_stats import GenerationStats
+from .item_randomizer import ItemRandomizer
+from .validator import Blocker, Validator
+
+# Number of rows to show in each section of the report.
+NUM_REPORT_ROWS = 10
+
+
+class RejectionProfile():
+  """Counts why item placements get rejected over a run of seeds.
+
+  Pass it to Z1Randomizer for each seed, then call AddSeed with the stats from GetPatchWithStats.
+  Each rejected placement is broken down into blockers (see Validator.GetBlockers): the check
+  type, the items that would get past it, and where it is.  A placement counts once towards each
+  check type, item and place that blocked it, so those counts show which constraints most often
+  stand in the way.  Working out the blockers takes a full traversal, so profiling is slow.
+  """
+
+  def __init__(self) -> None:
+    self.attempts_per_seed: List[int] = []
+    self.num_shuffle_retries = 0
+    self.rejection_reasons: Dict[str, int] = {}
+    # Number of rejected placements that each blocker, check type, item and place were behind.
+    self.num_rejections = 0
+    self.blocker_counts: Dict[Blocker, int] = {}
+    self.check_counts: Dict[str, int] = {}
+    self.item_counts: Dict[str, int] = {}
+    self.where_counts: Dict[str, int] = {}
+
+  def AddShuffleRejection(self, item_randomizer: ItemRandomizer) -> None:
+    """Counts a shuffle that HasValidItemConfiguration just rejected."""
+    location_and_item = item_randomizer.GetRejectedLocationAndItem()
+    if location_and_item is None:
+      return
+    (location, item) = location_and_item
+    self._AddBlockers([(item_randomizer.GetRejectionReason() or '', item.name,
+                        'cave 0x%x' % location.GetCaveNum())])
+
+  def AddValidatorRejection(self, validator: Validator) -> None:
+    """Counts a placement that IsSeedValid just rejected, while it's still in the data table."""
+    self._AddBlockers(validator.GetBlockers())
+
+  def _AddBlockers(self, blockers: List[Blocker]) -> None:
+    self.num_rejections += 1
+    for blocker in blockers:
+      self.blocker_counts[blocker] = self.blocker_counts.get(blocker, 0) + 1
+    for (counts, index) in ((self.check_counts, 0), (self.item_counts, 1),
+                            (self.where_counts, 2)):
+      for key in set(blocker[index] for blocker in blockers):
+        counts[key] = counts.get(key, 0) + 1
+
+  def AddSeed(self, stats: GenerationStats) -> None:
+    self.attempts_per_seed.append(stats.num_attempts)
+    self.num_shuffle_retries += stats.num_shuffle_retries
+    for (reason, count) in stats.rejection_reasons.items():
+      self.rejection_reasons[reason] = self.rejection_reasons.get(reason, 0) + count
+
+  def GetReport(self, flag_string: Optional[str] = None) -> str:
+    lines = ['Rejections over %d seeds%s' %
+             (len(self.attempts_per_seed), ' (flags %s)' % flag_string if flag_string else '')]
+    if self.attempts_per_seed:
+      lines.append('Attempts per seed: mean %.1f, median %g, max %d' %
+                   (statistics.mean(self.attempts_per_seed),
+                    statistics.median(self.attempts_per_seed), max(self.attempts_per_seed)))
+    lines.append('Shuffle retries: %d' % self.num_shuffle_retries)
+    lines.append('Rejected shuffles and placements: %d' % self.num_rejections)
+    sections: List[Tuple[str, Dict]] = [
+        ('By reason', self.rejection_reasons),
+        ('By check type', self.check_counts),
+        ('By item', self.item_counts),
+        ('By place', self.where_counts),
+        ('By blocker', {' '.join(blocker): count
+                        for (blocker, count) in self.blocker_counts.items()}),
+    ]
+    num_rejections = max(self.num_rejections, 1)
+    for (title, counts) in sections:
+      lines.append('')
+      lines.append('%s:' % title)
+      for (key, count) in sorted(counts.items(), key=lambda item: -item[1])[:NUM_REPORT_ROWS]:
+        lines.append('  %-50s %6d  %5.1f%%' % (key, count, 100.0 * count / num_rejections))
+    return '\n'.join(lines)
@@ -0,0 +1,61 @@
+from typing import Tuple
+from .constants import Item
+
+# A Requirement is a tuple of item masks, each meaning "at least one of these items".  It is
+# satisfied by an inventory when every one of its masks overlaps the inventory's item mask, so
+# checking one is just a few integer ANDs.  The empty tuple is always satisfied, and a mask of 0
+# can never be satisfied.
+Requirement = Tuple[int, ...]
+
+NO_REQUIREMENT: Requirement = ()
+IMPOSSIBLE: Requirement = (0,)
+
+# Virtual items have values well above the real ones, so they get the bits right after them.
+VIRTUAL_ITEM_BIT_OFFSET = 0x40
+
+
+def ItemBit(item: Item) -> int:
+  if item >= Item.BEAST_DEFEATED_VIRTUAL_ITEM:
+    return 1 << (item - Item.BEAST_DEFEATED_VIRTUAL_ITEM + VIRTUAL_ITEM_BIT_OFFSET)
+  return 1 << item
+
+
+def ItemMask(*items: Item) -> int:
+  mask = 0
+  for item in items:
+    mask |= ItemBit(item)
+  return mask
+
+
+def IsSatisfied(requirement: Requirement, item_mask: int) -> bool:
+  for mask in requirement:
+    if not mask & item_mask:
+      return False
+  return True
+
+
+def GetMissingItems(requirement: Requirement, item_mask: int) -> int:
+  """Returns a mask of the items that could help satisfy the parts of the requirement that aren't.
+
+  A result of 0 means that either the requirement is satisfied or no item will ever satisfy it.
+  """
+  missing_items = 0
+  for mask in requirement:
+    if not mask & item_mask:
+      missing_items |= mask
+  return missing_items
+
+
+def GetItemNames(mask: int) -> str:
+  """Returns the names of the items in a mask, e.g. 'WOOD_SWORD/WHITE_SWORD', for reports."""
+  return '/'.join(item.name for item in Item if mask & ItemBit(item))
+
+
+# Masks for groups of items that the logic treats as interchangeable.
+SWORD = ItemMask(Item.WOOD_SWORD, Item.WHITE_SWORD)
+SWORD_OR_WAND = SWORD | ItemMask(Item.WAND)
+REUSABLE_WEAPON = SWORD_OR_WAND | ItemMask(Item.RED_CANDLE)
+BOOMERANG = ItemMask(Item.WOODEN_BOOMERANG, Item.MAGICAL_BOOMERANG)
+CANDLE = ItemMask(Item.BLUE_CANDLE, Item.RED_CANDLE)
+RING = ItemMask(Item.BLUE_RING, Item.RED_RING)
+ARROWS = ItemMask(Item.WOOD_ARROWS, Item.SILVER_ARROWS)
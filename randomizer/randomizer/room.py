@@ -1,26 +1,13 @@
 from typing import Dict, List
 import logging
-from .constants import Direction, Enemy, Item, Range, RoomNum, RoomType, WallType
+from .constants import Direction, Enemy, Item, RoomNum, RoomType, WallType
+from .room_table import RoomTable
 
 log = logging.getLogger(__name__)
 
 
 class Room():
-  # According to http://www.bwass.org/romhack/zelda1/zelda1bank6.txt:
-  # Bytes in table 0 represent:
-  # xxx. ....	Type of Door on Top Wall
-  # ...x xx..	Type of Door on Bottom Wall
-  # .... ..xx	Code for Palette 0 (Outer Border)
-  # Bytes in table 1 represent:
-  # xxx. ....	Type of Door on Left Wall
-  # ...x xx..	Type of Door on Right Wall
-  # .... ..xx	Code for Palette 1 (Inner Section)
-  WALL_TYPE_TABLE_NUMBERS_AND_OFFSETS = {
-      Direction.WEST: (1, 5),  # Bits 5-8 of table 1
-      Direction.NORTH: (0, 5),  # Bits 5-8 of table 0
-      Direction.EAST: (1, 2),  # Bits 2-5 of table 1
-      Direction.SOUTH: (0, 2)  # Bits 2-5 of table 0
-  }
+  """A handle to a single room in a RoomTable, which is where the room's data is actually kept."""
 
   # Rooms where mobility is restricted without a ladder.
   # Note that while the player can exit and enter through any door in a CIRCLE_MOAT_ROOM, we keep
@@ -41,50 +28,42 @@ class Room():
   }
   MOVEMENT_CONSTRAINED_ROOMS = MOVEMENT_CONSTRAINED_ROOMS_VALID_TRAVEL_DIRECTIONS.keys()
 
-  def __init__(self, rom_data: List[int]) -> None:
-    if rom_data[4] & 0x1F == 0x03:
-      stuff_not_to_change = rom_data[4] & 0xE0
-      new_value = stuff_not_to_change + 0x0E
-      rom_data[4] = new_value
-    self.rom_data = rom_data
-
-    self.marked_as_visited = False
-    # -1 is used as a sentinal value indicating a lack of stairway room
-    self.staircase_room_num = RoomNum(-1)
+  def __init__(self, room_table: RoomTable, room_num: RoomNum) -> None:
+    self.room_table = room_table
+    self.room_num = room_num
 
   def GetRomData(self) -> List[int]:
-    return self.rom_data
+    return self.room_table.GetRomData(self.room_num)
 
   def IsMarkedAsVisited(self) -> bool:
-    return self.marked_as_visited
+    return self.room_table.IsMarkedAsVisited(self.room_num)
 
   def MarkAsVisited(self) -> None:
-    self.marked_as_visited = True
+    self.room_table.MarkAsVisited(self.room_num)
 
   def ClearVisitMark(self) -> None:
-    self.marked_as_visited = False
+    self.room_table.ClearVisitMark(self.room_num)
 
   def GetWallType(self, direction: Direction) -> WallType:
     assert self.GetType() not in [RoomType.ITEM_STAIRCASE, RoomType.TRANSPORT_STAIRCASE]
-    (table_num, offset) = self.WALL_TYPE_TABLE_NUMBERS_AND_OFFSETS[direction]
-    return WallType(self.rom_data[table_num] >> offset & 0x07)
+    return self.room_table.GetWallType(self.room_num, direction)
 
   ### Staircase room methods ###
   def GetLeftExit(self) -> RoomNum:
-    return RoomNum(self.rom_data[0] & 0x7F)
+    return self.room_table.GetLeftExit(self.room_num)
 
   def GetRightExit(self) -> RoomNum:
-    return RoomNum(self.rom_data[1] & 0x7F)
+    return self.room_table.GetRightExit(self.room_num)
 
   def HasStaircase(self) -> bool:
     # -1 is used as a sentinal value indicating a lack of stairway room
-    return self.staircase_room_num != RoomNum(-1)
+    return self.GetStaircaseRoomNumber() != RoomNum(-1)
 
   def GetStaircaseRoomNumber(self) -> RoomNum:
-    return self.staircase_room_num
+    return self.room_table.GetStaircaseRoomNumber(self.room_num)
 
   def SetStaircaseRoomNumber(self, staircase_room_num: RoomNum) -> None:
-    self.staircase_room_num = staircase_room_num
+    self.room_table.SetStaircaseRoomNumber(self.room_num, staircase_room_num)
   
     
   ### Room type-related methods ###
@@ -108,7 +87,7 @@ class Room():
     return False
 
   def GetType(self) -> RoomType:
-    return RoomType(self.rom_data[3] & 0x3F)
+    return self.room_table.GetType(self.room_num)
 
   def HasPotentialLadderBlock(self) -> bool:
     return self.GetType() in self.POTENTIAL_LADDER_BLOCK_ROOMS
@@ -124,30 +103,17 @@ class Room():
 
   ### Item-related methods ###
   def SetItem(self, item_num_param: Item) -> None:
-    item_num = int(item_num_param)
-    old_item_num = self.rom_data[4] & 0x1F
-    assert old_item_num in Range.VALID_ITEM_NUMBERS
-    assert item_num in Range.VALID_ITEM_NUMBERS
-
-    part_that_shouldnt_be_modified = self.rom_data[4] & 0xE0
-
-    new_value = part_that_shouldnt_be_modified + int(item_num)
-    assert new_value & 0xE0 == part_that_shouldnt_be_modified
-    assert new_value & 0x1F == item_num
-    self.rom_data[4] = new_value
-    logging.debug("Changed item %x to %x" % (old_item_num, item_num))
+    self.room_table.SetItem(self.room_num, item_num_param)
 
   def GetItem(self) -> Item:
-    return Item(self.rom_data[4] & 0x1F)
+    return self.room_table.GetItem(self.room_num)
 
   def HasDropBitSet(self) -> bool:
-    assert self.rom_data[5] & 0x04 in [0, 4]
-    assert self.rom_data[5] & 0x01 in [0, 1]
-    return self.rom_data[5] & 0x04 > 0 and self.rom_data[5] & 0x01 > 0
+    return self.room_table.HasDropBitSet(self.room_num)
 
   def HasMovableBlockBitSet(self) -> bool:
-      return ((self.rom_data[3] >> 6) & 0x01) > 0
-      
+    return self.room_table.HasMovableBlockBitSet(self.room_num)
+
   def HasItem(self) -> bool:
     if self.GetItem() == Item.MAGICAL_SWORD and (self.HasStaircase() or not self.HasDropBitSet()):
       return False
@@ -155,10 +121,7 @@ class Room():
 
   ### Enemy-related methods ###
   def GetEnemy(self) -> Enemy:
-    enemy_code = self.rom_data[2] & 0x3F
-    if self.rom_data[3] & 0x80 > 0:
-      enemy_code += 0x40
-    return Enemy(enemy_code)
+    return self.room_table.GetEnemy(self.room_num)
 
   def HasTheBeast(self) -> bool:
     return self.GetEnemy() == Enemy.THE_BEAST
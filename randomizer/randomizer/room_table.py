@@ -0,0 +1,124 @@
+from array import array
+from typing import List
+import logging
+from .constants import Direction, Enemy, Item, Range, RoomNum, RoomType, WallType
+
+LEVEL_TABLE_SIZE = 0x80
+NUM_TABLES = 6
+
+
+class RoomTable():
+  """The rooms of a level block, stored as the six 0x80-byte tables in the same layout as the ROM.
+
+  Room-level accessors take a room number and read directly out of the tables, so there's no
+  per-room object or data to allocate.  The Room class is a thin wrapper around these.
+  """
+  # According to http://www.bwass.org/romhack/zelda1/zelda1bank6.txt:
+  # Bytes in table 0 represent:
+  # xxx. ....	Type of Door on Top Wall
+  # ...x xx..	Type of Door on Bottom Wall
+  # .... ..xx	Code for Palette 0 (Outer Border)
+  # Bytes in table 1 represent:
+  # xxx. ....	Type of Door on Left Wall
+  # ...x xx..	Type of Door on Right Wall
+  # .... ..xx	Code for Palette 1 (Inner Section)
+  WALL_TYPE_TABLE_NUMBERS_AND_OFFSETS = {
+      Direction.WEST: (1, 5),  # Bits 5-8 of table 1
+      Direction.NORTH: (0, 5),  # Bits 5-8 of table 0
+      Direction.EAST: (1, 2),  # Bits 2-5 of table 1
+      Direction.SOUTH: (0, 2)  # Bits 2-5 of table 0
+  }
+
+  def __init__(self, level_data: List[int]) -> None:
+    self.data = bytearray(level_data)
+    data_view = memoryview(self.data)
+    self.tables = [
+        data_view[table_num * LEVEL_TABLE_SIZE:(table_num + 1) * LEVEL_TABLE_SIZE]
+        for table_num in range(0, NUM_TABLES)
+    ]
+    # Vanilla rooms with item 0x03 actually have no item.  Use the Triforce of Power to
+    # represent that instead since 0x03 is also the Magical Sword.
+    item_table = self.tables[4]
+    for room_num in Range.VALID_ROOM_NUMBERS:
+      if item_table[room_num] & 0x1F == 0x03:
+        item_table[room_num] = (item_table[room_num] & 0xE0) + 0x0E
+    self.vanilla_data = bytes(self.data)
+
+    self.visit_marks = bytearray(LEVEL_TABLE_SIZE)
+    # -1 is used as a sentinal value indicating a lack of stairway room
+    self.staircase_room_nums = array('b', [-1] * LEVEL_TABLE_SIZE)
+
+  def ResetToVanilla(self) -> None:
+    self.data[:] = self.vanilla_data
+    self.ClearVisitMarks()
+
+  def GetData(self) -> bytearray:
+    return self.data
+
+  def GetRomData(self, room_num: RoomNum) -> List[int]:
+    return [table[room_num] for table in self.tables]
+
+  ### Traversal state ###
+  def IsMarkedAsVisited(self, room_num: RoomNum) -> bool:
+    return self.visit_marks[room_num] != 0
+
+  def MarkAsVisited(self, room_num: RoomNum) -> None:
+    self.visit_marks[room_num] = 1
+
+  def ClearVisitMark(self, room_num: RoomNum) -> None:
+    self.visit_marks[room_num] = 0
+
+  def ClearVisitMarks(self) -> None:
+    self.visit_marks[:] = bytes(LEVEL_TABLE_SIZE)
+
+  def GetStaircaseRoomNumber(self, room_num: RoomNum) -> RoomNum:
+    return RoomNum(self.staircase_room_nums[room_num])
+
+  def SetStaircaseRoomNumber(self, room_num: RoomNum, staircase_room_num: RoomNum) -> None:
+    self.staircase_room_nums[room_num] = staircase_room_num
+
+  ### Accessors for the raw room data ###
+  def GetType(self, room_num: RoomNum) -> RoomType:
+    return RoomType(self.tables[3][room_num] & 0x3F)
+
+  def GetWallType(self, room_num: RoomNum, direction: Direction) -> WallType:
+    (table_num, offset) = self.WALL_TYPE_TABLE_NUMBERS_AND_OFFSETS[direction]
+    return WallType(self.tables[table_num][room_num] >> offset & 0x07)
+
+  def GetLeftExit(self, room_num: RoomNum) -> RoomNum:
+    return RoomNum(self.tables[0][room_num] & 0x7F)
+
+  def GetRightExit(self, room_num: RoomNum) -> RoomNum:
+    return RoomNum(self.tables[1][room_num] & 0x7F)
+
+  def GetEnemy(self, room_num: RoomNum) -> Enemy:
+    enemy_code = self.tables[2][room_num] & 0x3F
+    if self.tables[3][room_num] & 0x80 > 0:
+      enemy_code += 0x40
+    return Enemy(enemy_code)
+
+  def GetItem(self, room_num: RoomNum) -> Item:
+    return Item(self.tables[4][room_num] & 0x1F)
+
+  def SetItem(self, room_num: RoomNum, item_num_param: Item) -> None:
+    item_num = int(item_num_param)
+    old_item_num = self.tables[4][room_num] & 0x1F
+    assert old_item_num in Range.VALID_ITEM_NUMBERS
+    assert item_num in Range.VALID_ITEM_NUMBERS
+
+    part_that_shouldnt_be_modified = self.tables[4][room_num] & 0xE0
+
+    new_value = part_that_shouldnt_be_modified + int(item_num)
+    assert new_value & 0xE0 == part_that_shouldnt_be_modified
+    assert new_value & 0x1F == item_num
+    self.tables[4][room_num] = new_value
+    logging.debug("Changed item %x to %x", old_item_num, item_num)
+
+  def HasDropBitSet(self, room_num: RoomNum) -> bool:
+    value = self.tables[5][room_num]
+    assert value & 0x04 in [0, 4]
+    assert value & 0x01 in [0, 1]
+    return value & 0x04 > 0 and value & 0x01 > 0
+
+  def HasMovableBlockBitSet(self, room_num: RoomNum) -> bool:
+    return ((self.tables[3][room_num] >> 6) & 0x01) > 0
@@ -0,0 +1,130 @@
+from contextlib import closing
+import logging as log
+import random
+import sqlite3
+import time
+from typing import Callable, List, Optional, Tuple
+
+from .batch import GeneratePatches
+from .flags import Flags
+from .patch import Patch
+from .patch_cache import LOGIC_VERSION, PatchCache
+
+# Pooled seeds are picked at random from the same range as the web app's "Generate Random Seed".
+MIN_POOL_SEED = 1000000
+MAX_POOL_SEED = 999999999
+
+
+class SeedPool():
+  """Keeps already generated patches for random seeds in an SQLite database, ready to hand out.
+
+  Patches are pooled separately for each (ROM, flags), and Take hands out the oldest one.  Refill
+  (or RunRefillLoop, for a long-running worker) tops each pool back up to pool_size, generating
+  the patches across a pool of processes and adding each one as soon as it's done.  Several
+  processes can share the same database file, e.g. a refill worker and the web app.
+  """
+
+  def __init__(self,
+               filename: str,
+               pool_size: int = 100,
+               max_attempts: Optional[int] = None,
+               max_seconds: Optional[float] = None) -> None:
+    """max_attempts and max_seconds are the budget for generating each seed (see Z1Randomizer).
+
+    Seeds that run out of budget are skipped, so that flags that never validate can't hang the
+    refill worker.
+    """
+    self.filename = filename
+    self.pool_size = pool_size
+    self.max_attempts = max_attempts
+    self.max_seconds = max_seconds
+    with closing(self._Connect()) as connection:
+      # Write-ahead logging lets seeds be taken while the refill worker is adding more.
+      connection.execute('PRAGMA journal_mode=WAL')
+      with connection:
+        connection.execute('CREATE TABLE IF NOT EXISTS seeds ('
+                           'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                           'pool_key TEXT NOT NULL, '
+                           'seed INTEGER NOT NULL, '
+                           'patch BLOB NOT NULL, '
+                           'UNIQUE (pool_key, seed))')
+        connection.execute('CREATE INDEX IF NOT EXISTS seeds_by_pool ON seeds (pool_key, id)')
+
+  @staticmethod
+  def GetPoolKey(rom_sha1: str, flags: Flags) -> str:
+    return 'v%d-%s-%s' % (LOGIC_VERSION, rom_sha1, flags.ToFlagString())
+
+  def _Connect(self) -> sqlite3.Connection:
+    # A connection per call, so that a SeedPool can be shared between threads.
+    return sqlite3.connect(self.filename, timeout=30, isolation_level=None)
+
+  def Count(self, rom_data: bytes, flags: Flags) -> int:
+    pool_key = self.GetPoolKey(PatchCache.GetRomSha1(rom_data), flags)
+    with closing(self._Connect()) as connection:
+      return connection.execute('SELECT COUNT(*) FROM seeds WHERE pool_key = ?',
+                                (pool_key,)).fetchone()[0]
+
+  def Take(self, rom_data: bytes, flags: Flags) -> Optional[Tuple[int, Patch]]:
+    """Removes the oldest pooled seed for the ROM and flags and returns it with its patch.
+
+    Returns None if the pool is empty.
+    """
+    pool_key = self.GetPoolKey(PatchCache.GetRomSha1(rom_data), flags)
+    with closing(self._Connect()) as connection:
+      # Take the write lock up front so that two callers can't both take the same seed.
+      connection.execute('BEGIN IMMEDIATE')
+      try:
+        row = connection.execute(
+            'SELECT id, seed, patch FROM seeds WHERE pool_key = ? ORDER BY id LIMIT 1',
+            (pool_key,)).fetchone()
+        if row is not None:
+          connection.execute('DELETE FROM seeds WHERE id = ?', (row[0],))
+        connection.execute('COMMIT')
+      except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    if row is None:
+      return None
+    (_, seed, patch_data) = row
+    return (seed, Patch.FromBytes(patch_data))
+
+  def Add(self, rom_data: bytes, flags: Flags, seed: int, patch: Patch) -> None:
+    pool_key = self.GetPoolKey(PatchCache.GetRomSha1(rom_data), flags)
+    with closing(self._Connect()) as connection:
+      connection.execute('INSERT OR IGNORE INTO seeds (pool_key, seed, patch) VALUES (?, ?, ?)',
+                         (pool_key, seed, patch.ToBytes()))
+
+  def Refill(self, rom_data: bytes, flags: Flags, max_workers: Optional[int] = None) -> int:
+    """Generates patches until there are pool_size for the ROM and flags.
+
+    Returns how many were added, which is fewer than asked for if some ran out of budget.
+    """
+    num_seeds = self.pool_size - self.Count(rom_data, flags)
+    if num_seeds <= 0:
+      return 0
+    log.info("Generating %d seeds for the %s pool", num_seeds, flags.ToFlagString())
+    rng = random.SystemRandom()
+    seeds = [rng.randint(MIN_POOL_SEED, MAX_POOL_SEED) for _ in range(num_seeds)]
+    num_added = 0
+    for (seed, patch) in GeneratePatches(rom_data, seeds, flags, max_workers=max_workers,
+                                         max_attempts=self.max_attempts,
+                                         max_seconds=self.max_seconds):
+      if patch is None:
+        continue
+      self.Add(rom_data, flags, seed, patch)
+      num_added += 1
+    return num_added
+
+  def RunRefillLoop(self,
+                    rom_data: bytes,
+                    flags_list: List[Flags],
+                    max_workers: Optional[int] = None,
+                    poll_seconds: float = 5.0,
+                    should_stop: Callable[[], bool] = lambda: False) -> None:
+    """Keeps the pools for each of the flags topped up until should_stop returns True."""
+    while not should_stop():
+      num_generated = 0
+      for flags in flags_list:
+        num_generated += self.Refill(rom_data, flags, max_workers)
+      if not num_generated:
+        time.sleep(poll_seconds)
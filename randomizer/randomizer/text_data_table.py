@@ -1,5 +1,4 @@
 import logging
-import random
 from typing import List
 
 from .patch import Patch
@@ -1,17 +1,55 @@
 #8192192025 ice's seed
-from typing import List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import logging
 from constants import Direction
 from .constants import CaveNum, Item, LevelNum, Enemy
-from .constants import Range, RoomNum, RoomType, WallType
-from .data_table import DataTable
+from .constants import Range, RoomNum, RoomType
+from .data_table import DataTable, OVERWORLD_BLOCK_TYPE_BITS
+from .level_graph import (EXIT_NEEDS_BAIT, EXIT_NEEDS_BEAST_DEFEATED, EXIT_NEEDS_ENEMIES_DEFEATED,
+                          EXIT_NEEDS_LADDER)
 from .inventory import Inventory
 from .location import Location
 from .room import Room
 from .flags import Flags
+from .requirement import (ARROWS, BOOMERANG, CANDLE, IMPOSSIBLE, NO_REQUIREMENT, REUSABLE_WEAPON,
+                          RING, SWORD, SWORD_OR_WAND, GetItemNames, GetMissingItems, ItemMask,
+                          Requirement)
 
 import logging as log
 
+# A (level number, room number, entry direction) tuple describing a visit to a room.
+RoomState = Tuple[int, int, Direction]
+# A (room number, requirement, is item staircase) tuple for a room that _CanPossiblyBeBeaten
+# might get an item from, along with what it takes to get to the room.
+RelaxedRoom = Tuple[RoomNum, Requirement, bool]
+
+# Why IsSeedValid rejected a seed (see GetRejectionReason).
+REJECTION_UNBEATABLE_IGNORING_LEVEL_OBSTACLES = 'unbeatable_ignoring_level_obstacles'
+REJECTION_UNBEATABLE = 'unbeatable'
+
+# What it takes to get past each type of overworld block (see GetAccessibleDestinations).
+BLOCK_TYPE_REQUIREMENTS: Dict[str, Requirement] = {
+    "Open": NO_REQUIREMENT,
+    "Bomb": (SWORD_OR_WAND,),
+    "Ladder+Bomb": (SWORD_OR_WAND, ItemMask(Item.LADDER)),
+    "Candle": (CANDLE,),
+    "Recorder": (ItemMask(Item.RECORDER),),
+    "Raft": (ItemMask(Item.RAFT),),
+    "Power Bracelet": (ItemMask(Item.POWER_BRACELET),),
+}
+
+# Kinds of checks that can stop a seed from being beaten (see GetBlockers).
+CHECK_WATER_LADDER = 'water_ladder'
+CHECK_ENEMY_REQUIREMENT = 'enemy_requirement'
+CHECK_HEART_REQUIREMENT = 'heart_requirement'
+CHECK_CAVE_ITEM_REQUIREMENT = 'cave_item_requirement'
+CHECK_OVERWORLD_OBSTACLE = 'overworld_obstacle'
+CHECK_TRIFORCE_COUNT = 'triforce_count'
+
+# A (check type, items that would get past it, where it is) tuple, e.g.
+# ('enemy_requirement', 'BOW', 'level 9').  Items are separated by '/' if any of them would do.
+Blocker = Tuple[str, str, str]
+
 
 class Validator(object):
   WHITE_SWORD_CAVE_NUMBER = 2
@@ -21,119 +59,395 @@ class Validator(object):
   POTION_SHOP_NUMBER = 10
   ARMOS_VIRTUAL_CAVE_NUMBER = 0x14
   COAST_VIRTUAL_CAVE_NUMBER = 0x15
+  CAVE_HEART_REQUIREMENTS: Dict[CaveNum, int] = {
+      WHITE_SWORD_CAVE_NUMBER: NUM_HEARTS_FOR_WHITE_SWORD_ITEM,
+      MAGICAL_SWORD_CAVE_NUMBER: NUM_HEARTS_FOR_MAGICAL_SWORD_ITEM,
+  }
+  CAVE_ITEM_REQUIREMENTS: Dict[CaveNum, Requirement] = {
+      POTION_SHOP_NUMBER: (ItemMask(Item.LETTER),),
+      COAST_VIRTUAL_CAVE_NUMBER: (ItemMask(Item.LADDER),),
+  }
 
-  def __init__(self, data_table: DataTable, flags: Flags) -> None:
+  def __init__(self, data_table: DataTable, flags: Flags, quiet: bool = False) -> None:
     self.data_table = data_table
     self.flags = flags
-    self.inventory = Inventory()
+    # In quiet mode, nothing is logged per iteration, room or item, even at debug level.
+    self.quiet = quiet
+    self.inventory = Inventory(quiet)
+    self.num_iterations = 0
+    self.rejection_reason: Optional[str] = None
+    # What it takes to do things in each room, compiled to item masks the first time they're
+    # needed.  These only depend on the level layout and flags, so they never need to be reset.
+    self.defeat_enemies_requirements: Dict[Room, Requirement] = {}
+    self.room_item_requirements: Dict[Tuple[Room, Direction], Requirement] = {}
+    self.move_requirements: Dict[Tuple[Room, int], Requirement] = {}
+    # For each level, the rooms and item staircases that might be reachable, with what it takes to
+    # get to them (see _GetRelaxedLevelRooms).  These only depend on the level layout, too.
+    self.relaxed_level_rooms: Dict[LevelNum, List[RelaxedRoom]] = {}
+    self._ResetTraversalState()
+
+  def _ResetTraversalState(self) -> None:
+    # Each (level, room) is visited once, from whichever direction it's first entered.
+    self.visited_rooms: Set[Tuple[int, int]] = set()
+    # Room states and caves where something was blocked by a missing item.  Once a room or cave
+    # has been fully explored there's no need to look at it again, so these are the only places
+    # that get re-examined after new items are found.  Each room state is kept along with a mask of
+    # the items that would unblock it, and is only re-examined once one of them has been found.
+    self.blocked_room_states: List[Tuple[RoomState, int]] = []
+    self.blocked_cave_nums: List[CaveNum] = []
+    self.entered_destinations: Set[int] = set()
+    # Unique identifiers of every item location whose item was picked up.
+    self.reachable_location_ids: Set[int] = set()
 
-  def GetAccessibleDestinations(self):
-    tbr = []
-    tbr.extend(self.data_table.GetAvailableOverworldCaves("Open"))
+  def GetAccessibleDestinations(self) -> List[int]:
+    block_type_mask = OVERWORLD_BLOCK_TYPE_BITS["Open"]
     if self.inventory.HasSwordOrWand():
-      tbr.extend(self.data_table.GetAvailableOverworldCaves("Bomb"))
+      block_type_mask |= OVERWORLD_BLOCK_TYPE_BITS["Bomb"]
       if self.inventory.Has(Item.LADDER):
-        tbr.extend(self.data_table.GetAvailableOverworldCaves("Ladder+Bomb"))
+        block_type_mask |= OVERWORLD_BLOCK_TYPE_BITS["Ladder+Bomb"]
     if self.inventory.HasCandle():
-      tbr.extend(self.data_table.GetAvailableOverworldCaves("Candle"))
+      block_type_mask |= OVERWORLD_BLOCK_TYPE_BITS["Candle"]
     if self.inventory.Has(Item.RECORDER):
-      tbr.extend(self.data_table.GetAvailableOverworldCaves("Recorder"))
+      block_type_mask |= OVERWORLD_BLOCK_TYPE_BITS["Recorder"]
     if self.inventory.Has(Item.RAFT):
-      tbr.extend(self.data_table.GetAvailableOverworldCaves("Raft"))
+      block_type_mask |= OVERWORLD_BLOCK_TYPE_BITS["Raft"]
     if self.inventory.Has(Item.POWER_BRACELET):
-      tbr.extend(self.data_table.GetAvailableOverworldCaves("Power Bracelet"))
-    return list(set(tbr))
+      block_type_mask |= OVERWORLD_BLOCK_TYPE_BITS["Power Bracelet"]
+    return self.data_table.GetOverworldDestinationsForBlockTypes(block_type_mask)
 
 
   def IsSeedValid(self) -> bool:
     log.info("Starting check of whether the seed is valid or not")
+    self.num_iterations = 0
+    self.rejection_reason = None
+    if not self._CanPossiblyBeBeaten():
+      log.info("Seed can't be beaten even ignoring obstacles inside of levels. :(")
+      self.rejection_reason = REJECTION_UNBEATABLE_IGNORING_LEVEL_OBSTACLES
+      return False
+    self.inventory.Reset()
+    if self._Traverse(stop_when_rescued=True):
+      log.info("Seed appears to be beatable. :)")
+      return True
+    log.info("Seed doesn't appear to be beatable. :(")
+    self.rejection_reason = REJECTION_UNBEATABLE
+    return False
+
+  def GetRejectionReason(self) -> Optional[str]:
+    """Returns why the last call to IsSeedValid returned False, if it did."""
+    return self.rejection_reason
+
+  def GetBlockers(self) -> List[Blocker]:
+    """Returns what's in the way of beating the seed, for profiling why seeds get rejected.
+
+    This does a full traversal no matter how IsSeedValid rejected the seed, so it's only meant to
+    be called after IsSeedValid returns False.  Everything still blocked when the traversal gets
+    stuck is returned, so the real culprit is in there along with anything stuck behind it.
+    """
+    self.inventory.Reset()
+    self._Traverse(stop_when_rescued=True)
+    item_mask = self.inventory.GetItemMask()
+    blockers: Set[Blocker] = set()
+    for ((level_num, room_num, entry_direction), _) in self.blocked_room_states:
+      room = self.data_table.GetRoom(level_num, room_num)
+      requirements = [
+          self._GetMoveRequirement(room, needs) for (_, _, needs) in
+          self.data_table.GetLevelGraph(level_num).GetExits(room_num, entry_direction)
+      ]
+      if room.HasItem() or room.GetEnemy() == Enemy.THE_BEAST:
+        requirements.append(self._GetRoomItemRequirement(entry_direction, room))
+      for requirement in requirements:
+        for mask in requirement:
+          # Nothing gets past a mask of 0, and the beast's shutter is blocked by the beast's room.
+          if mask & item_mask or mask in (0, ItemMask(Item.BEAST_DEFEATED_VIRTUAL_ITEM)):
+            continue
+          check = (CHECK_WATER_LADDER
+                   if mask == ItemMask(Item.LADDER) else CHECK_ENEMY_REQUIREMENT)
+          blockers.add((check, GetItemNames(mask), 'level %d' % level_num))
+    for cave_num in self.blocked_cave_nums:
+      where = 'cave 0x%x' % cave_num
+      if self.inventory.GetHeartCount() < self.CAVE_HEART_REQUIREMENTS.get(cave_num, 0):
+        blockers.add((CHECK_HEART_REQUIREMENT, Item.HEART_CONTAINER.name, where))
+      for mask in self.CAVE_ITEM_REQUIREMENTS.get(cave_num, NO_REQUIREMENT):
+        if not mask & item_mask:
+          check = (CHECK_WATER_LADDER
+                   if mask == ItemMask(Item.LADDER) else CHECK_CAVE_ITEM_REQUIREMENT)
+          blockers.add((check, GetItemNames(mask), where))
+    accessible_destinations = self.GetAccessibleDestinations()
+    for (block_type, bit) in OVERWORLD_BLOCK_TYPE_BITS.items():
+      if all(destination in accessible_destinations
+             for destination in self.data_table.GetOverworldDestinationsForBlockTypes(bit)):
+        continue
+      for mask in BLOCK_TYPE_REQUIREMENTS[block_type]:
+        if not mask & item_mask:
+          blockers.add((CHECK_OVERWORLD_OBSTACLE, GetItemNames(mask),
+                        'overworld (%s)' % block_type))
+    if 9 in accessible_destinations and 9 not in self.entered_destinations:
+      blockers.add((CHECK_TRIFORCE_COUNT, Item.TRIFORCE.name, 'level 9'))
+    return sorted(blockers)
+
+  def GetReachableLocationIds(self, assumed_items: List[Item]) -> Set[int]:
+    """Returns the unique identifiers of the item locations that can be reached.
+
+    Items in assumed_items are treated as already being in the inventory, as if they'd been found
+    somewhere that's reachable.
+    """
+    self.inventory.Reset()
+    for item in assumed_items:
+      self.inventory.AddAssumedItem(item)
+    self._Traverse(stop_when_rescued=False)
+    return self.reachable_location_ids
+
+  def _Traverse(self, stop_when_rescued: bool) -> bool:
+    self._ResetTraversalState()
+    self.num_iterations = 0
+    previous_item_mask = 0
+    while True:
+      self.num_iterations += 1
+      if not self.quiet and log.getLogger().isEnabledFor(log.INFO):
+        log.info("Iteration %d of checking", self.num_iterations)
+        log.info("Inventory contains: %s", self.inventory.ToString())
+      self.inventory.ClearMakingProgressBit()
+      item_mask = self.inventory.GetItemMask()
+      room_states_to_visit = self._TakeBlockedRoomStates(item_mask & ~previous_item_mask)
+      previous_item_mask = item_mask
+      for destination in self.GetAccessibleDestinations():
+        if destination in self.entered_destinations:
+          continue
+        if destination in Range.VALID_LEVEL_NUMBERS:
+          level_num = destination
+          if level_num == 9 and self.inventory.GetTriforceCount() < 8:
+            continue
+          if not self.quiet:
+            log.debug("Can access level %d", level_num)
+          self.entered_destinations.add(destination)
+          room_states_to_visit.append((level_num,
+                                       self.data_table.GetLevelStartRoomNumber(level_num),
+                                       self.data_table.GetLevelEntranceDirection(level_num)))
+        else:
+          cave_num = destination - 0x10
+          if not self.quiet:
+            log.debug("Can access cave type %x", cave_num)
+          self.entered_destinations.add(destination)
+          self.blocked_cave_nums.append(cave_num)
+      self._ProcessCaves()
+      self._ProcessRoomStates(room_states_to_visit)
+      if stop_when_rescued and self.inventory.Has(Item.KIDNAPPED_RESCUED_VIRTUAL_ITEM):
+        return True
+      elif not self.inventory.StillMakingProgress():
+        break
+      elif self.num_iterations > 100:
+        break
+    return self.inventory.Has(Item.KIDNAPPED_RESCUED_VIRTUAL_ITEM)
+
+  def _CanPossiblyBeBeaten(self) -> bool:
+    """A quick check that rejects most seeds that can't be beaten before doing a full traversal.
+
+    This is the same search as _Traverse, except that inside of a level only solid walls and the
+    shutter in front of the kidnapped are treated as obstacles, and an item can be picked up if
+    what's needed in its own room is in hand.  It can only find more than _Traverse does, so a seed
+    it rejects is never beatable.  An item locked behind itself, directly or through a cycle of
+    other items (e.g. the ladder in a room needing the ladder, or the recorder in level 7), is
+    simply never found, so the seed gets rejected here.
+    """
     self.inventory.Reset()
-    self.inventory.SetStillMakingProgressBit()
-    num_iterations = 0
-    while self.inventory.StillMakingProgress():
-      num_iterations += 1
-      log.info("Iteration %d of checking" % num_iterations)
-      log.info("Inventory contains: " + self.inventory.ToString())
+    # Rooms whose items haven't been picked up yet in each level that's been entered.
+    remaining_level_rooms: Dict[LevelNum, List[RelaxedRoom]] = {}
+    emptied_cave_nums: Set[CaveNum] = set()
+    while True:
       self.inventory.ClearMakingProgressBit()
-      self.data_table.ClearAllVisitMarkers()
-      log.debug("Checking caves")
       for destination in self.GetAccessibleDestinations():
         if destination in Range.VALID_LEVEL_NUMBERS:
           level_num = destination
           if level_num == 9 and self.inventory.GetTriforceCount() < 8:
             continue
-          log.debug("Can access level %d" % level_num)
-          self.ProcessLevel(level_num)
+          if level_num not in remaining_level_rooms:
+            remaining_level_rooms[level_num] = self._GetRelaxedLevelRooms(level_num)
+          remaining_level_rooms[level_num] = self._CollectRelaxedRoomItems(
+              level_num, remaining_level_rooms[level_num])
         else:
           cave_num = destination - 0x10
-          log.debug("Can access cave type %x" % cave_num)
-          if self.CanGetItemsFromCave(cave_num):
-            for position_num in Range.VALID_CAVE_POSITION_NUMBERS:
-              location = Location(cave_num=cave_num, position_num=position_num)
-              self.inventory.AddItem(self.data_table.GetCaveItem(location), location)
-      if self.CanEnterLevel(9):
-        pass
+          if cave_num in emptied_cave_nums or not self.CanGetItemsFromCave(cave_num):
+            continue
+          emptied_cave_nums.add(cave_num)
+          for position_num in Range.VALID_CAVE_POSITION_NUMBERS:
+            location = Location(cave_num=cave_num, position_num=position_num)
+            self.inventory.AddItem(self.data_table.GetCaveItem(location), location)
       if self.inventory.Has(Item.KIDNAPPED_RESCUED_VIRTUAL_ITEM):
-        log.info("Seed appears to be beatable. :)")
         return True
-      elif num_iterations > 100:
+      if not self.inventory.StillMakingProgress():
         return False
-    log.info("Seed doesn't appear to be beatable. :(")
-    return False
+
+  def _CollectRelaxedRoomItems(self, level_num: LevelNum,
+                               rooms: List[RelaxedRoom]) -> List[RelaxedRoom]:
+    """Picks up what can be picked up in the given rooms, and returns the rooms that are left."""
+    remaining_rooms: List[RelaxedRoom] = []
+    for (room_num, requirement, is_item_staircase) in rooms:
+      if not self.inventory.Satisfies(requirement):
+        remaining_rooms.append((room_num, requirement, is_item_staircase))
+        continue
+      room = self.data_table.GetRoom(level_num, room_num)
+      location = Location.LevelRoom(level_num, room_num)
+      if is_item_staircase:
+        self.inventory.AddItem(room.GetItem(), location)
+        continue
+      if room.GetEnemy() == Enemy.THE_KIDNAPPED:
+        self.inventory.AddItem(Item.KIDNAPPED_RESCUED_VIRTUAL_ITEM, location)
+      # Entering from a staircase gets around the chute room restrictions, leaving only what's
+      # needed no matter which way the room is entered.
+      item_requirement = self._GetRoomItemRequirement(Direction.NO_DIRECTION, room)
+      if not self.inventory.Satisfies(item_requirement):
+        remaining_rooms.append((room_num, requirement + item_requirement, False))
+        continue
+      if room.HasItem():
+        self.inventory.AddItem(room.GetItem(), location)
+      if room.GetEnemy() == Enemy.THE_BEAST:
+        self.inventory.AddItem(Item.BEAST_DEFEATED_VIRTUAL_ITEM, location)
+    return remaining_rooms
+
+  def _GetRelaxedLevelRooms(self, level_num: LevelNum) -> List[RelaxedRoom]:
+    """Returns the rooms and item staircases of a level that might be reachable.
+
+    Each comes with what it takes to get to it, which is nothing except for anything behind the
+    shutter in front of the kidnapped, which needs the beast defeated.
+    """
+    if level_num in self.relaxed_level_rooms:
+      return self.relaxed_level_rooms[level_num]
+    rooms: List[RelaxedRoom] = []
+    seen_room_nums: Set[RoomNum] = set()
+    rooms_to_visit: List[Tuple[RoomNum, Requirement]] = [
+        (self.data_table.GetLevelStartRoomNumber(level_num), NO_REQUIREMENT)
+    ]
+    # Rooms past the kidnapped's shutter are only looked at once the rest of the level has been,
+    # so that the rooms that don't need the beast defeated are found without it.
+    rooms_behind_shutter: List[RoomNum] = []
+    while rooms_to_visit or rooms_behind_shutter:
+      if not rooms_to_visit:
+        rooms_to_visit = [(room_num, (ItemMask(Item.BEAST_DEFEATED_VIRTUAL_ITEM),))
+                          for room_num in rooms_behind_shutter]
+        rooms_behind_shutter = []
+      (room_num, requirement) = rooms_to_visit.pop()
+      if room_num not in Range.VALID_ROOM_NUMBERS or room_num in seen_room_nums:
+        continue
+      seen_room_nums.add(room_num)
+      room = self.data_table.GetRoom(level_num, room_num)
+      if room.IsItemStaircase() or room.IsTransportStaircase():
+        continue
+      rooms.append((room_num, requirement, False))
+      level_graph = self.data_table.GetLevelGraph(level_num)
+      for (_, next_room_num, needs) in level_graph.GetNeighbors(room_num):
+        if needs & EXIT_NEEDS_BEAST_DEFEATED:
+          rooms_behind_shutter.append(next_room_num)
+        else:
+          rooms_to_visit.append((next_room_num, requirement))
+      (item_staircase_room_nums, transport_room_num) = level_graph.GetStairways(room_num)
+      for stairway_room_num in item_staircase_room_nums:
+        if stairway_room_num not in seen_room_nums:
+          seen_room_nums.add(stairway_room_num)
+          rooms.append((stairway_room_num, requirement, True))
+      if transport_room_num is not None:
+        rooms_to_visit.append((transport_room_num, requirement))
+    self.relaxed_level_rooms[level_num] = rooms
+    return rooms
+
+  def _CollectItem(self, item: Item, location: Location) -> None:
+    self.reachable_location_ids.add(location.GetUniqueIdentifier())
+    self.inventory.AddItem(item, location)
+
+  def GetNumIterations(self) -> int:
+    """Returns the number of sweeps the last call to IsSeedValid made."""
+    return self.num_iterations
+
+  def _TakeBlockedRoomStates(self, new_items: int) -> List[RoomState]:
+    room_states: List[RoomState] = []
+    still_blocked_room_states: List[Tuple[RoomState, int]] = []
+    for room_state, missing_items in self.blocked_room_states:
+      if missing_items & new_items:
+        self.visited_rooms.discard(room_state[:2])
+        room_states.append(room_state)
+      else:
+        still_blocked_room_states.append((room_state, missing_items))
+    self.blocked_room_states = still_blocked_room_states
+    return room_states
+
+  def _ProcessCaves(self) -> None:
+    cave_nums = self.blocked_cave_nums
+    self.blocked_cave_nums = []
+    for cave_num in cave_nums:
+      if not self.CanGetItemsFromCave(cave_num):
+        self.blocked_cave_nums.append(cave_num)
+        continue
+      for position_num in Range.VALID_CAVE_POSITION_NUMBERS:
+        location = Location(cave_num=cave_num, position_num=position_num)
+        self._CollectItem(self.data_table.GetCaveItem(location), location)
 
   def CanGetRoomItem(self, entry_direction: Direction, room: Room) -> bool:
-    # Can't pick up a room in any rooms with water/moats without a ladder.
-    # TODO: Make a better determination here based on the drop location and the entry direction.
-    if room.HasPotentialLadderBlock() and not self.inventory.Has(Item.LADDER):
-      return False
-    if room.GetEnemy() == Enemy.THE_BEAST and not self.CanDefeatEnemies(room):
-      return False
-    if room.HasDropBitSet() and not self.CanDefeatEnemies(room):
-      return False
+    return self.inventory.Satisfies(self._GetRoomItemRequirement(entry_direction, room))
+
+  def _GetRoomItemRequirement(self, entry_direction: Direction, room: Room) -> Requirement:
+    key = (room, entry_direction)
+    if key not in self.room_item_requirements:
+      self.room_item_requirements[key] = self._CompileRoomItemRequirement(entry_direction, room)
+    return self.room_item_requirements[key]
+
+  def _CompileRoomItemRequirement(self, entry_direction: Direction, room: Room) -> Requirement:
     if (room.GetType() == RoomType.HORIZONTAL_CHUTE_ROOM
         and entry_direction in [Direction.NORTH, Direction.SOUTH]):
-      return False
+      return IMPOSSIBLE
     if (room.GetType() == RoomType.VERTICAL_CHUTE_ROOM
         and entry_direction in [Direction.EAST, Direction.WEST]):
-      return False
+      return IMPOSSIBLE
     if room.GetType() == RoomType.T_ROOM:
-      return False
-    return True
+      return IMPOSSIBLE
+    requirement: List[int] = []
+    # Can't pick up a room in any rooms with water/moats without a ladder.
+    # TODO: Make a better determination here based on the drop location and the entry direction.
+    if room.HasPotentialLadderBlock():
+      requirement.append(ItemMask(Item.LADDER))
+    if room.GetEnemy() == Enemy.THE_BEAST or room.HasDropBitSet():
+      requirement.extend(self._GetDefeatEnemiesRequirement(room))
+    return tuple(requirement)
 
   def CanDefeatEnemies(self, room: Room) -> bool:
+    return self.inventory.Satisfies(self._GetDefeatEnemiesRequirement(room))
+
+  def _GetDefeatEnemiesRequirement(self, room: Room) -> Requirement:
+    if room not in self.defeat_enemies_requirements:
+      self.defeat_enemies_requirements[room] = self._CompileDefeatEnemiesRequirement(room)
+    return self.defeat_enemies_requirements[room]
+
+  def _CompileDefeatEnemiesRequirement(self, room: Room) -> Requirement:
     if room.HasNoEnemiesToKill():
-      return True
-    if ((room.HasTheBeast() and not self.inventory.HasBowSilverArrowsAndSword())
-        or (room.HasDigdogger() and not self.inventory.HasRecorderAndReusableWeapon())
-        or (room.HasGohma() and not self.inventory.HasBowAndArrows())
-        or (room.HasWizzrobes() and not self.inventory.HasSword())
-        or (room.GetEnemy().IsGleeokOrPatra() and not self.inventory.HasSwordOrWand())
-        or (room.HasOnlyZeroHPEnemies() and not self.inventory.HasReusableWeaponOrBoomerang())
-        or (room.HasHungryGoriya() and not self.inventory.Has(Item.BAIT))):
-      return False
-    if (room.HasPolsVoice()
-        and not (self.inventory.HasSwordOrWand() or self.inventory.HasBowAndArrows())):
-      return False
-    if (self.flags.avoid_required_hard_combat and room.HasHardCombatEnemies()
-        and not (self.inventory.HasRing() and self.inventory.Has(Item.WHITE_SWORD))):
-      return False
+      return NO_REQUIREMENT
+    requirement: List[int] = []
+    if room.HasTheBeast():
+      requirement.extend([SWORD, ItemMask(Item.BOW), ItemMask(Item.SILVER_ARROWS)])
+    if room.HasDigdogger():
+      requirement.extend([ItemMask(Item.RECORDER), REUSABLE_WEAPON])
+    if room.HasGohma():
+      requirement.extend([ItemMask(Item.BOW), ARROWS])
+    if room.HasWizzrobes():
+      requirement.append(SWORD)
+    if room.GetEnemy().IsGleeokOrPatra():
+      requirement.append(SWORD_OR_WAND)
+    if room.HasOnlyZeroHPEnemies():
+      requirement.append(REUSABLE_WEAPON | BOOMERANG)
+    if room.HasHungryGoriya():
+      requirement.append(ItemMask(Item.BAIT))
+    if room.HasPolsVoice():
+      # A sword or wand, or else a bow and arrows.
+      requirement.extend([SWORD_OR_WAND | ItemMask(Item.BOW), SWORD_OR_WAND | ARROWS])
+    if self.flags.avoid_required_hard_combat and room.HasHardCombatEnemies():
+      requirement.extend([RING, ItemMask(Item.WHITE_SWORD)])
 
     # At this point, assume regular enemies
-    return self.inventory.HasReusableWeapon()
+    requirement.append(REUSABLE_WEAPON)
+    return tuple(requirement)
 
   #TODO: Need to update WS and MS caves with actual heart requirements
   def CanGetItemsFromCave(self, cave_num: CaveNum) -> bool:
-    if (cave_num == self.WHITE_SWORD_CAVE_NUMBER
-        and self.inventory.GetHeartCount() < self.NUM_HEARTS_FOR_WHITE_SWORD_ITEM):
-      return False
-    if (cave_num == self.MAGICAL_SWORD_CAVE_NUMBER
-        and self.inventory.GetHeartCount() < self.NUM_HEARTS_FOR_MAGICAL_SWORD_ITEM):
+    if self.inventory.GetHeartCount() < self.CAVE_HEART_REQUIREMENTS.get(cave_num, 0):
       return False
-    if cave_num == self.POTION_SHOP_NUMBER and not self.inventory.Has(Item.LETTER):
-      return False
-    if cave_num == self.COAST_VIRTUAL_CAVE_NUMBER and not self.inventory.Has(Item.LADDER):
-      return False
-    return True
+    return self.inventory.Satisfies(self.CAVE_ITEM_REQUIREMENTS.get(cave_num, NO_REQUIREMENT))
 
   def CanEnterLevel(self, level_num: LevelNum) -> bool:
     if level_num == 4 and not self.inventory.Has(Item.RAFT):
@@ -147,105 +461,86 @@ class Validator(object):
     return True
 
   def ProcessLevel(self, level_num: int) -> None:
-      rooms_to_visit = [(self.data_table.GetLevelStartRoomNumber(level_num), 
-                         self.data_table.GetLevelEntranceDirection(level_num))]
-      while True:
-          room_num, direction = rooms_to_visit.pop()
-          new_rooms = self._VisitRoom(level_num, room_num, direction)
-          if new_rooms:
-              rooms_to_visit.extend(new_rooms)
-          if not rooms_to_visit:
-              break
-      
+      self._ProcessRoomStates([(level_num, self.data_table.GetLevelStartRoomNumber(level_num),
+                                self.data_table.GetLevelEntranceDirection(level_num))])
+
+  def _ProcessRoomStates(self, room_states_to_visit: List[RoomState]) -> None:
+      while room_states_to_visit:
+          level_num, room_num, direction = room_states_to_visit.pop()
+          room_states_to_visit.extend(self._VisitRoom(level_num, room_num, direction))
+
   def _VisitRoom(self,
                  level_num: int,
                  room_num: int,
-                 entry_direction: Direction) -> List[Tuple[int, Direction]]:
+                 entry_direction: Direction) -> List[RoomState]:
       if room_num not in range(0, 0x80):
-        return
+        return []
+      if (level_num, room_num) in self.visited_rooms:
+        return []
+      if not self.quiet:
+        log.debug("Visiting level %d room %x", level_num, room_num)
+      self.visited_rooms.add((level_num, room_num))
+      room_state = (level_num, room_num, entry_direction)
       room = self.data_table.GetRoom(level_num, room_num)
-      if room.IsMarkedAsVisited():
-        return
-      log.debug("Visiting level %d room %x" % (level_num, room_num))
-      room.MarkAsVisited()
       tbr = []
+      # Items that would let more be done in this room than can be done now.
+      missing_items = 0
 
-      if self.CanGetRoomItem(entry_direction, room) and room.HasItem():
-          self.inventory.AddItem(room.GetItem(), Location.LevelRoom(level_num, room_num))
-      if room.GetEnemy() == Enemy.THE_BEAST and self.CanGetRoomItem(entry_direction, room):
+      item_requirement = self._GetRoomItemRequirement(entry_direction, room)
+      can_get_room_item = self.inventory.Satisfies(item_requirement)
+      if not can_get_room_item and (room.HasItem() or room.GetEnemy() == Enemy.THE_BEAST):
+          missing_items |= GetMissingItems(item_requirement, self.inventory.GetItemMask())
+      if can_get_room_item and room.HasItem():
+          self._CollectItem(room.GetItem(), Location.LevelRoom(level_num, room_num))
+      if room.GetEnemy() == Enemy.THE_BEAST and can_get_room_item:
           self.inventory.AddItem(Item.BEAST_DEFEATED_VIRTUAL_ITEM, Location.LevelRoom(level_num, room_num))
       if room.GetEnemy() == Enemy.THE_KIDNAPPED:
           self.inventory.AddItem(Item.KIDNAPPED_RESCUED_VIRTUAL_ITEM, Location.LevelRoom(level_num, room_num))
 
-      for direction in (Direction.WEST, Direction.NORTH, Direction.EAST, Direction.SOUTH):
-        if self.CanMove(entry_direction, direction, level_num, room_num, room):
-          tbr.append((room_num + direction, Direction(-1 * entry_direction)))
-
-      # Only check for stairways if this room is configured to have a stairway entrance
-      if not self._HasStairway(room):
-          return tbr      
-      
-      for stairway_room_num in self.data_table.GetLevelStaircaseRoomNumberList(level_num):
-          stairway_room = self.data_table.GetRoom(level_num, stairway_room_num)
-          left_exit = stairway_room.GetLeftExit()
-          right_exit = stairway_room.GetRightExit()
-
-          # Item staircase. Add the item to our inventory.
-          if left_exit == room_num and right_exit == room_num:
-              self.inventory.AddItem(
-                  stairway_room.GetItem(), Location.LevelRoom(level_num, stairway_room_num))
-          # Transport stairway cases. Add the connecting room to be checked.
-          elif left_exit == room_num and right_exit != room_num:
-                tbr.append((right_exit, direction.NO_DIRECTION))
-                # Stop looking for additional staircases after finding one
-                break
-          elif right_exit == room_num and left_exit != room_num:
-                tbr.append((left_exit, direction.NO_DIRECTION))
-                # Stop looking for additional staircases after finding one
-                break
-      return tbr
-
-  def _HasStairway(self, room: Room) -> bool:
-        room_type = room.GetType()
-
-        # Spiral Stair, Narrow Stair, and Diamond Stair rooms always have a staircase
-        if room_type.HasOpenStaircase():
-            return True
-
-        # Check if there are any shutter doors in this room. If so, they'll open when a middle
-        # row pushblock is pushed instead of a stairway appearing
-        for direction in [Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST]:
-            if room.GetWallType(direction) == WallType.SHUTTER_DOOR:
-                return False
-
-        # Check if "Movable block" bit is set in a room_type that has a middle row pushblock
-        if room_type.CanHavePushBlock() and room.HasMovableBlockBitSet():
-            return True
-        return False
+      level_graph = self.data_table.GetLevelGraph(level_num)
+      for (direction, next_room_num, needs) in level_graph.GetExits(room_num, entry_direction):
+        move_requirement = self._GetMoveRequirement(room, needs)
+        if self.inventory.Satisfies(move_requirement):
+          tbr.append((level_num, next_room_num, Direction(-1 * entry_direction)))
+        else:
+          missing_items |= GetMissingItems(move_requirement, self.inventory.GetItemMask())
+      if missing_items:
+          self.blocked_room_states.append((room_state, missing_items))
 
+      (item_staircase_room_nums, transport_room_num) = level_graph.GetStairways(room_num)
+      # Item staircase. Add the item to our inventory.
+      for stairway_room_num in item_staircase_room_nums:
+          self._CollectItem(self.data_table.GetRoom(level_num, stairway_room_num).GetItem(),
+                            Location.LevelRoom(level_num, stairway_room_num))
+      # Transport stairway case. Add the connecting room to be checked.
+      if transport_room_num is not None:
+          tbr.append((level_num, transport_room_num, Direction.NO_DIRECTION))
+      return tbr
 
   def CanMove(self, entry_direction: Direction, exit_direction: Direction, level_num: LevelNum,
               room_num: RoomNum, room: Room) -> bool:
-    if (room.PathUnconditionallyObstructed(entry_direction, exit_direction)
-        or room.PathObstructedByWater(entry_direction, exit_direction,
-                                      self.inventory.Has(Item.LADDER))):
-      return False
+    for (direction, _, needs) in self.data_table.GetLevelGraph(level_num).GetExits(
+        room_num, entry_direction):
+      if direction == exit_direction:
+        return self.inventory.Satisfies(self._GetMoveRequirement(room, needs))
+    return False
 
-    # Hungry goriya room doesn't have a closed shutter door.  So need a special check to similate how
-    # it's not possible to move up in the room until the goriya has been properly fed.
-    if (exit_direction == Direction.NORTH and room.HasHungryGoriya() and not self.inventory.Has(Item.BAIT)):
-      log.debug("Hungry goriya is still hungry :(")
-      return False
+  def _GetMoveRequirement(self, room: Room, needs: int) -> Requirement:
+    key = (room, needs)
+    if key not in self.move_requirements:
+      self.move_requirements[key] = self._CompileMoveRequirement(room, needs)
+    return self.move_requirements[key]
 
-    wall_type = room.GetWallType(exit_direction)
-    if wall_type == WallType.SHUTTER_DOOR and level_num == 9:
-      next_room = self.data_table.GetRoom(level_num, room_num + exit_direction)
-      if next_room.GetEnemy() == Enemy.THE_KIDNAPPED:
-        return self.inventory.Has(Item.BEAST_DEFEATED_VIRTUAL_ITEM)
-     
-    if (wall_type == WallType.SOLID_WALL
-        or (wall_type == WallType.SHUTTER_DOOR and not self.CanDefeatEnemies(room))):
-      return False
+  def _CompileMoveRequirement(self, room: Room, needs: int) -> Requirement:
+    requirement: List[int] = []
+    if needs & EXIT_NEEDS_LADDER:
+      requirement.append(ItemMask(Item.LADDER))
+    if needs & EXIT_NEEDS_BAIT:
+      requirement.append(ItemMask(Item.BAIT))
+    if needs & EXIT_NEEDS_BEAST_DEFEATED:
+      requirement.append(ItemMask(Item.BEAST_DEFEATED_VIRTUAL_ITEM))
+    elif needs & EXIT_NEEDS_ENEMIES_DEFEATED:
+      requirement.extend(self._GetDefeatEnemiesRequirement(room))
 
     # Disable key checking for now
     #if wall_type in [WallType.LOCKED_DOOR_1, WallType.LOCKED_DOOR_2]:
@@ -253,4 +548,4 @@ class Validator(object):
     #    self.inventory.UseKey(level_num, room_num, exit_direction)
     #  else:
     #    return False
-    return True
+    return tuple(requirement)
@@ -0,0 +1,158 @@
+import hashlib
+import random
+from typing import Dict
+
+from absl.testing import absltest
+
+from benchmarks.synthetic_rom import BuildSyntheticRom
+from rom_reader import RomReader
+from .batch_validator import BatchValidator
+from .data_table import DataTable
+from .flags import Flags, FlagsEnum
+from .item_randomizer import ItemRandomizer
+from .randomizer import Z1Randomizer
+from .validator import Validator
+
+# The synthetic ROMs to check, by the obstacle seed they're built with (see synthetic_rom.py).
+ROM_OBSTACLE_SEEDS = {'plain': None, 'obstacles': 1}
+# Flag settings to check, on top of the defaults.
+FLAG_PRESETS: Dict[str, Dict[str, bool]] = {
+    'default': {},
+    'few_shuffles': dict({flag.value: False for flag in FlagsEnum}, shuffle_coast_item=True),
+    'no_progressive': {
+        'progressive_items': False,
+        'shuffle_minor_dungeon_items': False,
+        'avoid_required_hard_combat': False,
+    },
+}
+
+# What the original validator and randomizer (before any of the speedups) gave for each ROM and
+# preset.  These must only change along with LOGIC_VERSION in patch_cache.py.
+#
+# SHA-1 of the randomized ROM for seeds 1 to 4.
+EXPECTED_ROM_SHA1S = {
+    'plain': {
+        'default': [
+            '0bef85d448585dd28654ff6f1cf1f9d35c78dad5',
+            '995ce1e68c2448dbd37b1e465d86b0fb20fcd7d6',
+            'e290e37d109f72cdcd855c3b358cc2bd1a9bb3a9',
+            '6d740c2fa44e0bdf8041b89b43803c66acf2063e',
+        ],
+        'few_shuffles': [
+            'ff5876ff0b74b63efe617bca0680e7ddc6886b6b',
+            '9c0a906cd5bd5ce5c02c3b65758026213ebac828',
+            'cfbd6298f205a3895dc7c773e04e0906a66633dc',
+            'f90c9a50fe3df7bb3662b7a08ef1f2ee8ea532af',
+        ],
+        'no_progressive': [
+            'b4449105f958710006eff0029d8389252666ad2f',
+            '69162a9f8b6dda22456d9907d634205200646d1f',
+            'c951a190fa27e89de97541357413cce7d8c393da',
+            '0199780cc5dc3ad6624a8c9fdfb464d29696d4cf',
+        ],
+    },
+    'obstacles': {
+        'default': [
+            '7548607924a8a57647d411b74d9c8b250dc5df57',
+            'e7fca1fbbdcb3c633d256ff31e7536c3967e8f8e',
+            '243189b5714f41a3b2cd79a3e07c766ff5b1451a',
+            '1fb2dbc5513c854ed2928ba3e8597214503c59dd',
+        ],
+        'few_shuffles': [
+            '92b96d2339364aa9e2bc01d86d34fc072da83fc9',
+            '7e85e52f9533205fd11ddb0444b9257f6c6935c5',
+            'cb999440efad752113a5a2be6f28f5a38cb878b2',
+            'd4d38d56037f395474f3d519f8adcc4efca82919',
+        ],
+        'no_progressive': [
+            'd0a78cf901acadafac59e517e2a7dbe3c21f7bd4',
+            'b8a543183df9120a462119709da852dc12d7183f',
+            '7921a06c1ee8a5ee1f2ddd6009869b64359a5e1c',
+            '5e9cdae1a5fb1b418c4bad347791dbb581e08168',
+        ],
+    },
+}
+# IsSeedValid for each of the first 60 shuffles made with random.Random(SHUFFLE_SEED), 1 if valid.
+SHUFFLE_SEED = 7
+EXPECTED_IS_SEED_VALID = {
+    'plain': {
+        'default': '100100011010110010001110100010101011010100101001110010110110',
+        'few_shuffles': '001010101000100011110011000100000111000001100110000100110010',
+        'no_progressive': '110000000101011011000000010000100001010110010000010100000111',
+    },
+    'obstacles': {
+        'default': '000100000000100000001000100000100000000000000000000000100000',
+        'few_shuffles': '000000000000100001000000000000000010000001000010000000000000',
+        'no_progressive': '000000000001011010000000000000100001000010000000010100000111',
+    },
+}
+
+
+def _GetFlags(preset: str) -> Flags:
+  flags = Flags()
+  for (flag_value, value) in FLAG_PRESETS[preset].items():
+    flags.set(flag_value, value)
+  return flags
+
+
+class IsSeedValidTest(absltest.TestCase):
+
+  def testMatchesOriginalValidator(self):
+    for (rom_name, obstacle_seed) in ROM_OBSTACLE_SEEDS.items():
+      rom_data = BuildSyntheticRom(obstacle_seed)
+      for (preset, expected_results) in EXPECTED_IS_SEED_VALID[rom_name].items():
+        with self.subTest(rom=rom_name, preset=preset):
+          flags = _GetFlags(preset)
+          data_table = DataTable(RomReader(rom_data))
+          item_randomizer = ItemRandomizer(data_table, flags, random.Random(SHUFFLE_SEED),
+                                           quiet=True)
+          validator = Validator(data_table, flags, quiet=True)
+          placements = []
+          results = ''
+          for _ in range(len(expected_results)):
+            while True:
+              data_table.ResetToVanilla()
+              item_randomizer.ResetState()
+              item_randomizer.ReadItemsAndLocationsFromTable()
+              item_randomizer.ShuffleItems()
+              if item_randomizer.HasValidItemConfiguration():
+                break
+            item_randomizer.WriteItemsAndLocationsToTable()
+            placements.append(item_randomizer.GetPlacement())
+            results += '1' if validator.IsSeedValid() else '0'
+          self.assertEqual(expected_results, results)
+
+          # The batch validator is only used to screen placements, so it has to accept every one
+          # that the validator accepts.
+          data_table.ResetToVanilla()
+          batch_validator = BatchValidator(data_table, flags, item_randomizer.GetLocations())
+          for (result, is_valid) in zip(results, batch_validator.AreSeedsValid(placements)):
+            if result == '1':
+              self.assertTrue(is_valid)
+
+
+class SeedOutputTest(absltest.TestCase):
+
+  def _GetRomSha1(self, rom_data: bytes, seed: int, preset: str, **kwargs) -> str:
+    z1randomizer = Z1Randomizer(rom_data, seed, _GetFlags(preset), quiet=True, **kwargs)
+    return hashlib.sha1(z1randomizer.GenerateRom()).hexdigest()
+
+  def testMatchesOriginalRandomizer(self):
+    for (rom_name, obstacle_seed) in ROM_OBSTACLE_SEEDS.items():
+      rom_data = BuildSyntheticRom(obstacle_seed)
+      for (preset, expected_sha1s) in EXPECTED_ROM_SHA1S[rom_name].items():
+        for (seed, expected_sha1) in enumerate(expected_sha1s, start=1):
+          with self.subTest(rom=rom_name, preset=preset, seed=seed):
+            self.assertEqual(expected_sha1, self._GetRomSha1(rom_data, seed, preset))
+
+  def testValidatingOneAtATimeGivesTheSameRom(self):
+    for (rom_name, obstacle_seed) in ROM_OBSTACLE_SEEDS.items():
+      rom_data = BuildSyntheticRom(obstacle_seed)
+      for (preset, expected_sha1s) in EXPECTED_ROM_SHA1S[rom_name].items():
+        with self.subTest(rom=rom_name, preset=preset):
+          self.assertEqual(expected_sha1s[0],
+                           self._GetRomSha1(rom_data, 1, preset, validation_batch_size=1))
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -1,6 +1,6 @@
 from enum import IntEnum
 import io
-from typing import IO, List
+from typing import IO, Dict, List, Optional, Union
 from constants import CHAR_MAP
 
 OVERWORLD_DATA_LOCATION = 0x18400
@@ -25,22 +25,37 @@ DOOR_REPAIR_CHARGE_ADDRESS = 0x4890
 
 class RomReader:
   
-    def __init__(self, rom: io.BytesIO) -> None:
-        self.rom = rom
+    def __init__(self, rom: Union[io.BytesIO, bytes, bytearray, memoryview]) -> None:
+        # Reads are slices of a memoryview over the whole ROM, so no bytes are copied or converted
+        # one at a time.  The cached values below are at fixed addresses and never change.
+        if isinstance(rom, io.BytesIO):
+            rom = rom.getvalue()
+        self.rom = memoryview(rom)
+        self.overworld_item_data: Optional[List[int]] = None
+        self.requirements: Optional[Dict[str, int]] = None
 
-    def _ReadMemory(self, address: int, num_bytes: int = 1) -> List[int]:
+    @classmethod
+    def FromFile(cls, filename: str) -> 'RomReader':
+        # An NES ROM is small enough to just read in, which leaves nothing open afterwards.
+        with open(filename, 'rb') as rom_file:
+            return cls(rom_file.read())
+
+    def GetRom(self) -> memoryview:
+        return self.rom
+
+    def _ReadMemory(self, address: int, num_bytes: int = 1) -> memoryview:
         assert num_bytes > 0, "num_bytes shouldn't be negative"
-        self.rom.seek(NES_HEADER_OFFSET + address)
-        data = []  # type: List[int]
-        for raw_byte in self.rom.read(num_bytes):
-            data.append(int(raw_byte))
-        return data
+        start = NES_HEADER_OFFSET + address
+        return self.rom[start:start + num_bytes]
+
+    def _ReadByte(self, address: int) -> int:
+        return self.rom[NES_HEADER_OFFSET + address]
 
-    def _GetLevelBlockPointer(self, addr: int) -> List[int]:
+    def _GetLevelBlockPointer(self, addr: int) -> int:
        val = self._ReadMemory(addr, 0x02)
        return val[1]*0x100 + val[0]
 
-    def GetLevelBlock(self, level_num: int) -> List[int]:
+    def GetLevelBlock(self, level_num: int) -> memoryview:
         if level_num == 0:
             if self._GetLevelBlockPointer(OVERWORLD_POINTER_LOCATION) == 0x8400:
                 return self._ReadMemory(OVERWORLD_DATA_LOCATION, 0x300)
@@ -54,31 +69,35 @@ class RomReader:
               return self._ReadMemory(LEVEL_7_TO_9_FIRST_QUEST_DATA_LOCATION, 0x300)
             elif self._GetLevelBlockPointer(LEVEL_7_TO_9_POINTER_LOCATION) == 0x9000:
               return self._ReadMemory(LEVEL_7_TO_9_SECOND_QUEST_DATA_LOCATION, 0x300)
-        return []
+        return memoryview(b'')
 
-    def GetLevelInfo(self, level_num: int) -> List[int]:
+    def GetLevelInfo(self, level_num: int) -> memoryview:
         start = VARIOUS_DATA_LOCATION + level_num * 0xFC
         return self._ReadMemory(start, 0xFC)
         
     def GetOverworldItemData(self) -> List[int]:
-        return [
-            self._ReadMemory(ARMOS_ITEM_ADDRESS, 0x01)[0],
-            self._ReadMemory(COAST_ITEM_ADDRESS, 0x01)[0],
-        ]
+        if self.overworld_item_data is None:
+            self.overworld_item_data = [
+                self._ReadByte(ARMOS_ITEM_ADDRESS),
+                self._ReadByte(COAST_ITEM_ADDRESS),
+            ]
+        return self.overworld_item_data
 
-    def GetRequirements(self) -> int:
-        return {
-            "triforce": self._ReadMemory(TRIFORCE_REQUIREMENT_ADDRESS, 0x01)[0],
-            "white_sword": int(self._ReadMemory(WHITE_SWORD_REQUIREMENT_ADDRESS, 0x01)[0] / 0x10) + 1,
-            "magical_sword": int(self._ReadMemory(MAGICAL_SWORD_REQUIREMENT_ADDRESS, 0x01)[0] / 0x10) + 1,
-            "door_repair": self._ReadMemory(DOOR_REPAIR_CHARGE_ADDRESS, 0x01)[0],
-        }
+    def GetRequirements(self) -> Dict[str, int]:
+        if self.requirements is None:
+            self.requirements = {
+                "triforce": self._ReadByte(TRIFORCE_REQUIREMENT_ADDRESS),
+                "white_sword": int(self._ReadByte(WHITE_SWORD_REQUIREMENT_ADDRESS) / 0x10) + 1,
+                "magical_sword": int(self._ReadByte(MAGICAL_SWORD_REQUIREMENT_ADDRESS) / 0x10) + 1,
+                "door_repair": self._ReadByte(DOOR_REPAIR_CHARGE_ADDRESS),
+            }
+        return self.requirements
           
         
     def GetQuote(self, num: int) -> str:
       assert num in range(0, 38)
-      low_byte = self._ReadMemory(0x4000 + 2*num, 0x01)[0]
-      high_byte =  self._ReadMemory(0x4000 + 2*num + 1, 0x01)[0] - 0x40
+      low_byte = self._ReadByte(0x4000 + 2*num)
+      high_byte =  self._ReadByte(0x4000 + 2*num + 1) - 0x40
       addr = high_byte * 0x100 + low_byte
       raw_quote = self._ReadMemory(addr, 0x40)
       out_quote = ""
@@ -3,8 +3,13 @@ import io
 import logging
 import sys
 
-from randomizer.randomizer.randomizer import Z1Randomizer
+from randomizer.randomizer.batch import GeneratePatches
+from randomizer.randomizer.randomizer import (PLACEMENTS, SAMPLER_PLACEMENT,
+                                              GenerationBudgetExceeded, Z1Randomizer)
 from randomizer.randomizer.flags import Flags
+from randomizer.randomizer.patch_cache import DiskPatchCache
+from randomizer.randomizer.rejection_profile import RejectionProfile
+from randomizer.randomizer.seed_pool import SeedPool
 
 def setup_logging(debug=False):
     log_level = logging.DEBUG if debug else logging.INFO
@@ -12,14 +17,53 @@ def setup_logging(debug=False):
         level=log_level,
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
-    
+
+def write_rom(output_rom_data: bytearray, output_filename: str) -> None:
+  logging.debug("Output filename is %s" % output_filename)
+  with open(output_filename, 'wb') as f:
+      f.write(output_rom_data)
+
 def main() -> None:
   parser = argparse.ArgumentParser()
   parser.add_argument('--input_filename', type=str, required=True, help='Rom to randomize')
   parser.add_argument('--output_location', type=str, required=True, help='Where to put the thing')
-  parser.add_argument('--seed', type=int, required=True, help='RNG seed')
+  parser.add_argument('--seed', type=int, default=None,
+                      help='RNG seed (required unless a seed is taken from --seed_pool)')
+  parser.add_argument('--num_seeds', type=int, default=1,
+                      help='Number of consecutive seeds to generate, starting with --seed')
+  parser.add_argument('--num_workers', type=int, default=None,
+                      help='Number of worker processes to use when generating multiple seeds')
+  parser.add_argument('--flags', type=str, default=None,
+                      help='Flag string to use (see Flags.ToFlagString) instead of the defaults')
+  parser.add_argument('--cache_dir', type=str, default=None,
+                      help='Directory to cache generated patches in, so repeat seeds are instant')
   parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+  parser.add_argument('--placement', choices=PLACEMENTS, default=SAMPLER_PLACEMENT,
+                      help='How to place items: shuffle and retry, or only make beatable placements')
+  parser.add_argument('--quiet', action='store_true',
+                      help='Skip all per-room and per-item logging while generating')
+  parser.add_argument('--max_attempts', type=int, default=None,
+                      help='Give up on a seed (with a non-zero exit status, or skipping it when '
+                      'filling --seed_pool) after this many item placements')
+  parser.add_argument('--max_seconds', type=float, default=None,
+                      help='Give up on a seed (as with --max_attempts) after this many seconds')
+  parser.add_argument('--profile_rejections', action='store_true',
+                      help='Instead of randomizing, generate --num_seeds seeds starting with --seed '
+                      'and print a report of why item placements were rejected')
+  parser.add_argument('--seed_pool', type=str, default=None,
+                      help='SQLite file of pre-generated seeds to take a random seed from')
+  parser.add_argument('--fill_seed_pool', action='store_true',
+                      help='Keep --seed_pool filled for --flags (or --seed_pool_flags) until '
+                      'interrupted, instead of randomizing')
+  parser.add_argument('--seed_pool_size', type=int, default=100,
+                      help='Number of seeds to keep in --seed_pool for each set of flags')
+  parser.add_argument('--seed_pool_flags', type=str, nargs='+', default=None,
+                      help='Flag strings to keep --seed_pool filled for, instead of just --flags')
   args = parser.parse_args()
+  if args.seed is None and args.seed_pool is None:
+    parser.error('--seed is required unless taking a seed from --seed_pool')
+  if args.fill_seed_pool and args.seed_pool is None:
+    parser.error('--fill_seed_pool requires --seed_pool')
   
   setup_logging(args.debug)
   
@@ -31,22 +75,81 @@ def main() -> None:
   with open(args.input_filename, 'rb') as f:
       input_rom_data = io.BytesIO(f.read())
 
-  flags = Flags()
-  flags.set("shuffle_minor_dungeon_items", False)
-  flags.set("avoid_required_hard_combat", False)
-  flags.set("randomize_level_text", False)
-  flags.set("select_swap", False)
-  
-  z1randomizer = Z1Randomizer(input_rom_data, args.seed, flags)
-  
-  patch = z1randomizer.GetPatch()
-  output_rom_data = io.BytesIO(input_rom_data.getvalue())
-  for address in patch.GetAddresses():
-    output_rom_data.seek(address)
-    output_rom_data.write(bytes(patch.GetData(address)))
-  logging.debug("Output filename is %s" % output_filename)
-  with open(output_filename, 'wb') as f:
-      f.write(output_rom_data.getvalue())
+  if args.flags:
+    try:
+      flags = Flags.FromFlagString(args.flags)
+    except ValueError as e:
+      print(e)
+      exit()
+  else:
+    flags = Flags()
+    flags.set("shuffle_minor_dungeon_items", False)
+    flags.set("avoid_required_hard_combat", False)
+    flags.set("randomize_level_text", False)
+    flags.set("select_swap", False)
+  logging.debug("Flag string is %s" % flags.ToFlagString())
+
+  if args.seed_pool:
+    seed_pool = SeedPool(args.seed_pool, args.seed_pool_size, args.max_attempts, args.max_seconds)
+    if args.fill_seed_pool:
+      flags_list = [flags]
+      if args.seed_pool_flags:
+        try:
+          flags_list = [Flags.FromFlagString(flag_string) for flag_string in args.seed_pool_flags]
+        except ValueError as e:
+          print(e)
+          exit()
+      try:
+        seed_pool.RunRefillLoop(input_rom_data.getvalue(), flags_list, args.num_workers)
+      except KeyboardInterrupt:
+        pass
+      return
+    pooled_seed = seed_pool.Take(input_rom_data.getvalue(), flags)
+    if pooled_seed is not None:
+      (seed, patch) = pooled_seed
+      print("Using seed %d from the seed pool" % seed)
+      output_rom_data = bytearray(input_rom_data.getvalue())
+      patch.Apply(output_rom_data)
+      write_rom(output_rom_data, output_filename)
+      return
+    if args.seed is None:
+      print("The seed pool is empty for these flags, so please give a --seed")
+      exit()
+
+  if args.profile_rejections:
+    rejection_profile = RejectionProfile()
+    for seed in range(args.seed, args.seed + args.num_seeds):
+      z1randomizer = Z1Randomizer(input_rom_data.getvalue(), seed, flags, quiet=True,
+                                  placement=args.placement, rejection_profile=rejection_profile)
+      rejection_profile.AddSeed(z1randomizer.GetPatchWithStats()[1])
+    print(rejection_profile.GetReport(flags.ToFlagString()))
+    return
+
+  cache = DiskPatchCache(args.cache_dir) if args.cache_dir else None
+  if args.num_seeds > 1:
+    seeds = range(args.seed, args.seed + args.num_seeds)
+    failed_seeds = []
+    for seed, patch in GeneratePatches(input_rom_data.getvalue(), seeds, flags,
+                                       max_workers=args.num_workers, placement=args.placement,
+                                       cache=cache, max_attempts=args.max_attempts,
+                                       max_seconds=args.max_seconds):
+      if patch is None:
+        failed_seeds.append(seed)
+        continue
+      output_rom_data = bytearray(input_rom_data.getvalue())
+      patch.Apply(output_rom_data)
+      write_rom(output_rom_data, args.input_filename[:-4] + '_zora_%d.nes' % seed)
+    if failed_seeds:
+      sys.exit("Gave up on seeds %s" % ', '.join(str(seed) for seed in sorted(failed_seeds)))
+    return
+
+  z1randomizer = Z1Randomizer(input_rom_data, args.seed, flags, cache, args.quiet, args.placement,
+                              max_attempts=args.max_attempts, max_seconds=args.max_seconds)
+  try:
+    output_rom_data = z1randomizer.GenerateRom()
+  except GenerationBudgetExceeded as e:
+    sys.exit(str(e))
+  write_rom(output_rom_data, output_filename)
 
 if __name__ == '__main__':
   main()